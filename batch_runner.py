@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from staged_pipeline import DEFAULT_QUEUE_SIZE, Stage, StagedPipeline
+
+# --videos-dir で対象にする拡張子
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v", ".mkv", ".webm", ".avi")
+
+
+@dataclass
+class BatchJob:
+    video: str
+    output_dir: str = ""  # load_batch_jobs が動画ごとに決める（manifest で指定がなければ <動画のディレクトリ>/<動画名>）
+    pdf_output: str = ""  # 空なら Markdown と同じ場所に同名 .pdf
+    resp_text: str = ""
+    markdown_path: str = ""
+    pdf_path: str = ""
+    image_paths: List[str] = field(default_factory=list)
+    state: Dict[str, Any] = field(default_factory=dict)  # ステージ間で受け渡す任意の値
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    llm: Dict[str, Any] = field(default_factory=dict)  # LLM 呼び出しの回数・リトライ・待ち時間
+    error: str = ""
+    failed_stage: str = ""
+    started_at: float = 0.0  # 最初のステージが取り出した時刻（キュー待ちは含めない）
+    finished_at: float = 0.0
+
+    def result(self) -> Dict[str, Any]:
+        """結果 JSONL の 1 行分。"""
+        return {
+            "video": self.video,
+            "status": "failed" if self.error else "succeeded",
+            "markdown_path": self.markdown_path or None,
+            "pdf_path": self.pdf_path or None,
+            "image_paths": self.image_paths,
+            "error": self.error or None,
+            "failed_stage": self.failed_stage or None,
+            "seconds": round(self.finished_at - self.started_at, 3),
+            "stage_seconds": self.stage_seconds,
+            "llm": self.llm or None,
+        }
+
+
+def load_batch_jobs(videos_dir: str = "", manifest: str = "") -> List[BatchJob]:
+    """--videos-dir（直下の動画ファイル）または --manifest（JSONL）から処理対象を読み込む。
+
+    manifest の各行は {"video": "...", "output_dir": "...", "pdf_output": "..."}（video 以外は任意）
+    または動画パスの文字列。空行と # で始まる行は無視する。
+    output_dir を指定しない動画は <動画のディレクトリ>/<動画名（拡張子なし）> に出力する
+    （LLM の spec の output_dir は動画によらず同じことが多く、並行して処理すると画像・Markdown・manifest.json が上書きされるため）。
+    """
+    jobs: List[BatchJob] = []
+    if videos_dir:
+        root = Path(videos_dir)
+        if not root.is_dir():
+            raise FileNotFoundError(f"動画ディレクトリが見つかりません: {root}")
+        for path in sorted(root.iterdir()):
+            if path.is_file() and path.suffix.lower() in VIDEO_EXTENSIONS:
+                jobs.append(BatchJob(video=str(path)))
+    if manifest:
+        for lineno, line in enumerate(Path(manifest).read_text(encoding="utf-8").splitlines(), 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"manifest の {lineno} 行目が JSON として不正です: {e}")
+            if isinstance(entry, str):
+                entry = {"video": entry}
+            if not isinstance(entry, dict) or not entry.get("video"):
+                raise ValueError(f"manifest の {lineno} 行目に video がありません")
+            jobs.append(
+                BatchJob(
+                    video=str(entry["video"]),
+                    output_dir=str(entry.get("output_dir") or ""),
+                    pdf_output=str(entry.get("pdf_output") or ""),
+                )
+            )
+    used = {str(Path(job.output_dir).resolve()) for job in jobs if job.output_dir}
+    for job in jobs:
+        if not job.output_dir:
+            job.output_dir = _default_output_dir(Path(job.video), used)
+    return jobs
+
+
+def _default_output_dir(video: Path, used: Set[str]) -> str:
+    """<動画のディレクトリ>/<動画名> を返す（a.mp4 と a.mov のように重なる場合は拡張子・連番を付ける）。"""
+    candidates = [video.with_suffix(""), video.with_name(f"{video.stem}_{video.suffix.lstrip('.')}")]
+    candidates += [video.with_name(f"{video.stem}_{n}") for n in range(2, 1000)]
+    for candidate in candidates:
+        key = str(candidate.resolve())
+        if key not in used:
+            used.add(key)
+            return str(candidate)
+    raise ValueError(f"出力先を決められませんでした: {video}")
+
+
+def run_batch(
+    jobs: List[BatchJob],
+    stages: List[Stage],
+    on_result: Callable[[BatchJob], None],
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    on_metrics: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+) -> int:
+    """ステージ（LLM / ffmpeg / PDF など）を StagedPipeline で流し、失敗件数を返す。
+
+    ある動画のステージが終わると次のステージのキューへ渡るため、動画 N の抽出と動画 N+1 の LLM 呼び出しが重なる。
+    ステージで例外が出た動画はそこで打ち切って結果を報告し、他の動画の処理は続ける。
+    on_result は各動画の完了（成功・失敗）ごとに 1 回呼ばれる。on_metrics には終了時のステージ別メトリクスを渡す。
+    """
+    if not jobs:
+        return 0
+    failures = [0]
+
+    def timed(name: str, fn: Callable[[BatchJob], None]) -> Callable[[BatchJob], None]:
+        def run(job: BatchJob) -> None:
+            if not job.started_at:
+                job.started_at = time.time()
+            started = time.perf_counter()
+            try:
+                fn(job)
+            finally:
+                job.stage_seconds[name] = round(time.perf_counter() - started, 3)
+
+        return run
+
+    def done(job: BatchJob, stage: Optional[str], error: Optional[BaseException]) -> None:
+        job.finished_at = time.time()
+        job.started_at = job.started_at or job.finished_at
+        if error is not None:
+            job.error = str(error)
+            job.failed_stage = stage or ""
+            failures[0] += 1
+        on_result(job)
+
+    pipeline = StagedPipeline([(name, timed(name, fn), workers) for name, fn, workers in stages], queue_size)
+    pipeline.run(jobs, done)
+    if on_metrics is not None:
+        on_metrics(pipeline.metrics())
+    return failures[0]
+
+
+@contextmanager
+def jsonl_writer(path: Optional[str]) -> Iterator[Callable[[BatchJob], None]]:
+    """結果を 1 動画 1 行の JSONL で書き出す関数を返す（path が空なら標準出力。ファイルには追記）。"""
+    if path:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        stream = open(path, "a", encoding="utf-8")
+    else:
+        # redirect_stdout 等の影響を受けないよう、元の標準出力へ直接書く
+        stream = sys.__stdout__
+
+    def write(job: BatchJob) -> None:
+        stream.write(json.dumps(job.result(), ensure_ascii=False) + "\n")
+        stream.flush()
+
+    try:
+        yield write
+    finally:
+        if path:
+            stream.close()
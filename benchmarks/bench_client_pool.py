@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM クライアント共有（接続プール）ベンチマーク
+
+機能概要:
+- ローカルに OpenAI 互換の最小スタブ（/v1/chat/completions）を立て、chat.completions.create を N 回呼ぶ
+  (1) 呼び出しごとに OpenAI クライアントを作る（従来の create_openai_compatible_client）
+  (2) llm_clients.ClientRegistry の共有クライアントを使う（keep-alive 接続を再利用）
+- スタブは新しい TCP 接続ごとに --connect-delay 秒待つ（TLS ハンドシェイク・RTT の模擬）
+- --threads で並行呼び出し数、MOVIE2MANUAL_HTTP_MAX_CONNECTIONS で接続数上限の影響も確認できる
+- API キー・ネットワーク不要（openai / httpx パッケージは必要）
+
+使い方:
+  python benchmarks/bench_client_pool.py --calls 200 --connect-delay 0.03
+  python benchmarks/bench_client_pool.py --calls 200 --threads 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, List
+
+from openai import OpenAI
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from llm_clients import ClientRegistry  # noqa: E402
+
+RESPONSE = {
+    "id": "chatcmpl-stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "stub",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "{}"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+def start_stub(connect_delay: float) -> ThreadingHTTPServer:
+    connections = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive を有効にする
+
+        def setup(self) -> None:
+            super().setup()
+            connections[0] += 1
+            time.sleep(connect_delay)
+
+        def do_POST(self) -> None:
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            body = json.dumps(RESPONSE).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.connections = connections  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(label: str, server: ThreadingHTTPServer, calls: int, threads: int, get: Callable[[], OpenAI]) -> None:
+    latencies: List[float] = []
+    lock = threading.Lock()
+    before = server.connections[0]  # type: ignore[attr-defined]
+
+    def call(_: int) -> None:
+        started = time.perf_counter()
+        get().chat.completions.create(model="stub", messages=[{"role": "user", "content": "hi"}])
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        list(pool.map(call, range(calls)))
+    total = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{label:>10}: total {total:6.2f}s, p50 {statistics.median(latencies) * 1000:6.1f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:6.1f} ms, "
+        f"TCP connections {server.connections[0] - before}"  # type: ignore[attr-defined]
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="LLM クライアント共有のベンチマーク")
+    parser.add_argument("--calls", type=int, default=100, help="呼び出し回数")
+    parser.add_argument("--threads", type=int, default=1, help="並行呼び出し数")
+    parser.add_argument("--connect-delay", type=float, default=0.02, help="新規接続ごとの遅延（秒、TLS 等の模擬）")
+    args = parser.parse_args()
+
+    server = start_stub(args.connect_delay)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    print(f"calls={args.calls} threads={args.threads} connect_delay={args.connect_delay}s")
+
+    measure("per-call", server, args.calls, args.threads, lambda: OpenAI(api_key="stub", base_url=base_url))
+    registry = ClientRegistry()
+    measure("pooled", server, args.calls, args.threads, lambda: registry.get("openai", "stub", base_url))
+    print(f"pooled clients created: {registry.created}")
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静止画抽出ベンチマーク
+
+機能概要:
+- extract_screenshots の抽出方式（seek / batch / accurate）ごとの所要時間を比較する
+- 先頭から順にデコードする出力シーク（-ss を -i の後に置く。シーク誤差なし）の出力を正解とし、各方式の一致率（フレーム精度）を表示する
+- --video 指定時は ffprobe で長さを取得し、抽出時刻を動画の範囲内に収める
+- --video 未指定時は ffmpeg の testsrc で合成動画を生成して使用する
+
+使い方:
+  python benchmarks/bench_extract.py --shots 40
+  python benchmarks/bench_extract.py --video ./input.mp4 --shots 18 --repeat 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from extract_screenshot import (  # noqa: E402
+    EXTRACT_METHODS,
+    ScreenshotSpec,
+    ensure_dir,
+    extract_screenshots,
+    format_timecode,
+    output_codec_args,
+    run,
+)
+from video_frames import probe_video  # noqa: E402
+
+
+def make_synthetic_video(path: Path, duration: float) -> None:
+    # 1080p / 30fps / GOP 250 の画面収録に近い合成動画
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=30:duration={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-g", "250", "-pix_fmt", "yuv420p",
+        str(path),
+    ]
+    if run(cmd) != 0:
+        raise RuntimeError("合成動画の生成に失敗しました")
+
+
+def extract_reference(video: Path, out_dir: Path, shots: List[ScreenshotSpec]) -> List[Path]:
+    """正解フレーム: 1 回の ffmpeg で先頭から連続デコードし、出力ごとの -ss（出力シーク）で各時刻のフレームを書き出す。"""
+    ensure_dir(out_dir)
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-i", str(video)]
+    paths: List[Path] = []
+    for shot in shots:
+        path = out_dir / shot.filename
+        cmd += ["-ss", format_timecode(shot.time), "-frames:v", "1", *output_codec_args(path, None), str(path)]
+        paths.append(path)
+    if run(cmd) != 0:
+        raise RuntimeError("正解フレームの抽出に失敗しました")
+    return paths
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="静止画抽出方式のベンチマーク")
+    parser.add_argument("--video", default="", help="入力動画（未指定なら合成動画を生成）")
+    parser.add_argument("--duration", type=float, default=120.0, help="合成動画の長さ（秒）")
+    parser.add_argument("--shots", type=int, default=18, help="抽出枚数")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数")
+    parser.add_argument("--max-workers", type=int, default=1, help="extract_screenshots の並列数")
+    parser.add_argument("--methods", nargs="+", default=list(EXTRACT_METHODS), choices=EXTRACT_METHODS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        if args.video:
+            video = Path(args.video)
+            duration = probe_video(str(video)).duration
+            if duration <= 0:
+                raise RuntimeError(f"動画の長さを取得できませんでした: {video}")
+        else:
+            video = tmp / "synthetic.mp4"
+            duration = args.duration
+            make_synthetic_video(video, duration)
+
+        step = duration / (args.shots + 1)
+        shots = [
+            ScreenshotSpec(time=round(step * (i + 1), 3), filename=f"step{i + 1:02d}.png")
+            for i in range(args.shots)
+        ]
+
+        # 正解フレーム: 出力シークによる連続デコード（batch も入力シークのため正解には使わない）
+        with redirect_stdout(sys.stderr):
+            reference = extract_reference(video, tmp / "reference", shots)
+
+        print(f"video={video} shots={len(shots)} repeat={args.repeat} max_workers={args.max_workers}")
+        for method in args.methods:
+            samples = []
+            for r in range(args.repeat):
+                out_dir = tmp / f"{method}_{r}"
+                started = time.perf_counter()
+                with redirect_stdout(sys.stderr):
+                    extract_screenshots(
+                        str(video), str(out_dir), shots, method=method, max_workers=args.max_workers
+                    )
+                samples.append(time.perf_counter() - started)
+            matched = sum(
+                (out_dir / ref.name).read_bytes() == ref.read_bytes() for ref in reference
+            )
+            print(
+                f"{method:>8}: median {statistics.median(samples):.3f}s "
+                f"(min {min(samples):.3f}s, {statistics.median(samples) / len(shots) * 1000:.1f} ms/shot), "
+                f"accuracy {matched}/{len(reference)}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+プロバイダのフォールバック・ヘッジのベンチマーク
+
+機能概要:
+- 先頭プロバイダの応答時間を「通常は --primary-seconds、--tail-rate の割合で --tail-seconds」、
+  フォールバック先を --fallback-seconds（一定）として time.sleep で模擬する
+- provider_fallback.generate_with_fallback を (1) ヘッジなし (2) ヘッジあり で --requests 回ずつ呼び、
+  応答時間の p50 / p95 / p99 / 最大と、フォールバック先の応答を採用した件数を比較する（API キー不要）
+- ヘッジの期限は直近の応答時間の p95（計測が揃うまでは LLM_HEDGE_AFTER_SECONDS）
+
+使い方:
+  python benchmarks/bench_hedge.py --requests 200 --tail-rate 0.03
+  python benchmarks/bench_hedge.py --primary-seconds 0.05 --tail-seconds 1.0 --fallback-seconds 0.15
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from provider_fallback import LatencyTracker, generate_with_fallback  # noqa: E402
+
+SPEC = '{"video": "v.mp4", "body_markdown": "# x", "screenshots": []}'
+
+
+@dataclass
+class FakeConfig:
+    provider: str
+    model_name: str
+    base_url: Optional[str] = None
+    api_key: Optional[str] = None
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="フォールバック・ヘッジのベンチマーク")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--primary-seconds", type=float, default=0.05, help="先頭プロバイダの通常の応答時間")
+    parser.add_argument("--tail-seconds", type=float, default=0.8, help="先頭プロバイダが遅いときの応答時間")
+    parser.add_argument("--tail-rate", type=float, default=0.03, help="先頭プロバイダが遅くなる割合")
+    parser.add_argument("--fallback-seconds", type=float, default=0.15, help="フォールバック先の応答時間")
+    args = parser.parse_args()
+
+    primary = FakeConfig("gemini", "primary")
+    fallback = FakeConfig("ollama", "fallback")
+
+    def generate(cfg: FakeConfig) -> str:
+        if cfg is primary:
+            slow = random.random() < args.tail_rate
+            time.sleep((args.tail_seconds if slow else args.primary_seconds) * random.uniform(0.9, 1.1))
+        else:
+            time.sleep(args.fallback_seconds)
+        return SPEC
+
+    print(
+        f"requests={args.requests} primary={args.primary_seconds}s (tail {args.tail_seconds}s x {args.tail_rate:.0%}) "
+        f"fallback={args.fallback_seconds}s"
+    )
+    for hedge in (False, True):
+        tracker = LatencyTracker()
+        latencies: List[float] = []
+        answered_by_fallback = 0
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            _, cfg = generate_with_fallback([primary, fallback], generate, hedge=hedge, tracker=tracker)
+            latencies.append(time.perf_counter() - started)
+            answered_by_fallback += cfg is fallback
+        print(
+            f"{'hedged' if hedge else 'no hedge':>9}: p50 {percentile(latencies, 0.5) * 1000:6.1f} ms, "
+            f"p95 {percentile(latencies, 0.95) * 1000:6.1f} ms, p99 {percentile(latencies, 0.99) * 1000:6.1f} ms, "
+            f"max {max(latencies) * 1000:6.1f} ms, fallback answers {answered_by_fallback}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
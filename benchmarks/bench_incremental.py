@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+増分抽出ベンチマーク
+
+機能概要:
+- --shots 枚の spec を一度すべて抽出したあと、--edits 枚の時刻だけを変えて再抽出する
+- 再抽出を (1) 全件抽出（incremental=False。CLI の既定） (2) 増分抽出（incremental=True。CLI の --incremental。出力先 manifest.json の画像の記録を使う） で比較し、所要時間を表示する
+- 参考として 1 枚だけを抽出する時間も計測する
+- --video 未指定時は ffmpeg の testsrc で合成動画を生成して使用する
+
+使い方:
+  python benchmarks/bench_incremental.py --shots 60 --edits 1
+  python benchmarks/bench_incremental.py --video ./input.mp4 --shots 60 --edits 3 --method batch
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from extract_screenshot import EXTRACT_METHODS, ScreenshotSpec, extract_screenshots, file_sha256  # noqa: E402
+from bench_extract import make_synthetic_video  # noqa: E402
+
+
+def timed(video: Path, out_dir: Path, shots, method: str, incremental: bool) -> float:
+    started = time.perf_counter()
+    with redirect_stdout(sys.stderr):
+        extract_screenshots(str(video), str(out_dir), shots, method=method, incremental=incremental)
+    return time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="増分抽出のベンチマーク")
+    parser.add_argument("--video", default="", help="入力動画（未指定なら合成動画を生成）")
+    parser.add_argument("--duration", type=float, default=120.0, help="合成動画の長さ（秒）")
+    parser.add_argument("--shots", type=int, default=60, help="spec の枚数")
+    parser.add_argument("--edits", type=int, default=1, help="再抽出前に時刻を変える枚数")
+    parser.add_argument("--method", choices=EXTRACT_METHODS, default="seek")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        video = Path(args.video) if args.video else tmp / "synthetic.mp4"
+        if not args.video:
+            make_synthetic_video(video, args.duration)
+        file_sha256(video)  # 動画のハッシュは初回の抽出に含める（プロセス内で再利用される）
+
+        step = args.duration / (args.shots + 1)
+        shots = [
+            ScreenshotSpec(time=round(step * (i + 1), 3), filename=f"step{i + 1:02d}.png")
+            for i in range(args.shots)
+        ]
+        edited = list(shots)
+        for i in range(min(args.edits, len(shots))):
+            k = i * len(shots) // max(1, args.edits)
+            edited[k] = dataclasses.replace(shots[k], time=round(step * (k + 1) + step / 2, 3))
+
+        print(f"video={video} shots={len(shots)} edits={args.edits} method={args.method}")
+        one = timed(video, tmp / "one", shots[:1], args.method, incremental=False)
+        print(f"{'1 shot':>12}: {one:.3f}s")
+        for incremental in (False, True):
+            out_dir = tmp / ("incremental" if incremental else "full")
+            initial = timed(video, out_dir, shots, args.method, incremental)
+            rerun = timed(video, out_dir, edited, args.method, incremental)
+            label = "incremental" if incremental else "full"
+            print(f"{label:>12}: initial {initial:.3f}s, rerun after {args.edits} edit(s) {rerun:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
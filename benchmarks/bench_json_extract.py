@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON 抽出マイクロベンチマーク
+
+機能概要:
+- LLM 応答でよく見られる崩れた出力（生改行・CRLF・フェンス・前置き文・説明文中の波括弧など）を用意し、
+  旧実装（候補列挙 + 1 文字ずつの改行エスケープ）と json_extract.extract_json_object を比較する
+- 両者の抽出結果が一致するかも確認する
+
+使い方:
+  python benchmarks/bench_json_extract.py --number 200 --body-kb 64
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import timeit
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from json_extract import extract_json_object  # noqa: E402
+
+
+def legacy_extract(text: str):
+    """変更前の main._extract_json_from_text（比較用）。"""
+
+    def escape_newlines_in_json_strings(s: str) -> str:
+        result_chars = []
+        in_string = False
+        escape = False
+        for ch in s:
+            if in_string:
+                if escape:
+                    result_chars.append(ch)
+                    escape = False
+                    continue
+                if ch == "\\":
+                    result_chars.append(ch)
+                    escape = True
+                    continue
+                if ch == "\n":
+                    result_chars.append("\\n")
+                    continue
+                if ch == "\r":
+                    continue
+                if ch == '"':
+                    in_string = False
+                    result_chars.append(ch)
+                    continue
+                result_chars.append(ch)
+            else:
+                if ch == '"':
+                    in_string = True
+                result_chars.append(ch)
+        return "".join(result_chars)
+
+    def try_load(candidate: str):
+        try:
+            return json.loads(candidate)
+        except Exception:
+            pass
+        try:
+            return json.loads(escape_newlines_in_json_strings(candidate))
+        except Exception:
+            return None
+
+    candidates = [text]
+    candidates += re.findall(r"```json\s*(\{[\s\S]*?\})\s*```", text, re.IGNORECASE)
+    candidates += re.findall(r"```\s*(\{[\s\S]*?\})\s*```", text, re.IGNORECASE)
+    first = text.find("{")
+    last = text.rfind("}")
+    if first != -1 and last != -1 and last > first:
+        candidates.append(text[first:last + 1])
+    for cand in candidates:
+        obj = try_load(cand)
+        if obj is not None:
+            return obj
+    return None
+
+
+def build_cases(body_kb: int):
+    step = "## 手順 {i}\n1. 画面右上の「保存」をクリックします。\n![step{i:02d}](step{i:02d}.png)\n\n"
+    body = ""
+    i = 0
+    while len(body.encode("utf-8")) < body_kb * 1024:
+        i += 1
+        body += step.format(i=i)
+    shots = ",\n    ".join(
+        f'{{ "time": "00:00:{k % 60:02d}.000", "filename": "step{k:02d}.png", "caption": "手順 {k}" }}'
+        for k in range(1, 19)
+    )
+    raw_body = body.replace('"', '\\"')  # 生改行のまま（エスケープされていない）
+    spec = (
+        '{\n  "video": "/tmp/input.mp4",\n  "output_dir": "./manual_assets",\n'
+        '  "markdown_output": "manual.md",\n  "title": "n8n 操作マニュアル",\n'
+        f'  "body_markdown": "{raw_body}",\n  "screenshots": [\n    {shots}\n  ]\n}}'
+    )
+    valid = json.dumps(json.loads(spec, strict=False), ensure_ascii=False, indent=2)
+    return {
+        "valid_json": valid,
+        "raw_newlines": spec,
+        "crlf": spec.replace("\n", "\r\n"),
+        "fenced_with_prose": f"以下が出力です。\n\n```json\n{spec}\n```\n\n以上です。",
+        "prose_braces_then_fence": f"テンプレート {{video_file_name}} を置換しました。\n```\n{spec}\n```\n補足: {{注意}}",
+        "truncated": spec[: len(spec) * 2 // 3],
+        "unbalanced_prose_fence": f"Use the {{ key to open.\n```json\n{spec}\n```",
+        "unbalanced_small": 'Use the { key to open.\n```json\n{"a": 1}\n```',
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="JSON 抽出のマイクロベンチマーク")
+    parser.add_argument("--number", type=int, default=50, help="1 ケースあたりの実行回数")
+    parser.add_argument("--body-kb", type=int, default=32, help="body_markdown のおおよそのサイズ（KB）")
+    args = parser.parse_args()
+
+    cases = build_cases(args.body_kb)
+    print(f"{'case':<26}{'legacy ms':>12}{'new ms':>10}{'speedup':>10}  same")
+    for name, text in cases.items():
+        legacy = timeit.timeit(lambda: legacy_extract(text), number=args.number) / args.number * 1000
+        new = timeit.timeit(lambda: extract_json_object(text), number=args.number) / args.number * 1000
+        same = legacy_extract(text) == extract_json_object(text)
+        print(f"{name:<26}{legacy:>12.3f}{new:>10.3f}{legacy / new:>9.1f}x  {same}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
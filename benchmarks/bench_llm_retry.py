@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM 呼び出しのリトライ・レート制限ベンチマーク
+
+機能概要:
+- ローカルに OpenAI 互換の最小スタブ（/v1/chat/completions）を立て、一定割合で 429（Retry-After 付き）と 503 を返す
+- --calls 件を --threads 並行で呼び、(1) リトライなし（1 回だけ呼ぶ）と (2) llm_scheduler 経由 を比較する
+- 成功件数・リトライ回数・待ち時間（バックオフ / レート制限）・スタブが受けた最大同時リクエスト数を表示する
+- API キー・ネットワーク不要（openai / httpx パッケージは必要）
+
+使い方:
+  python benchmarks/bench_llm_retry.py --calls 50 --threads 8 --fail-429 0.2 --fail-503 0.1
+  python benchmarks/bench_llm_retry.py --calls 50 --threads 8 --rpm 600 --max-in-flight 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from llm_clients import ClientRegistry  # noqa: E402
+from llm_scheduler import LLMCallStats, LLMScheduler, SchedulerSettings  # noqa: E402
+
+RESPONSE = {
+    "id": "chatcmpl-stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "stub",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "{}"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+class FlakyStub:
+    """一定割合で 429 / 503 を返す OpenAI 互換スタブ。"""
+
+    def __init__(self, fail_429: float, fail_503: float, retry_after: float, latency: float):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    time.sleep(latency)
+                    roll = random.random()
+                    if roll < fail_429:
+                        self._reply(429, {"error": {"message": "rate limited"}}, {"Retry-After": f"{retry_after:g}"})
+                    elif roll < fail_429 + fail_503:
+                        self._reply(503, {"error": {"message": "unavailable"}})
+                    else:
+                        self._reply(200, RESPONSE)
+                finally:
+                    with lock:
+                        stub.in_flight -= 1
+
+            def _reply(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def reset(self) -> None:
+        self.max_in_flight = 0
+        self.requests = 0
+
+
+def run(label: str, stub: FlakyStub, calls: int, threads: int, scheduler: Optional[LLMScheduler]) -> None:
+    client = ClientRegistry().get("openai", "stub", stub.base_url)
+    stats = LLMCallStats()
+    succeeded = [0]
+    lock = threading.Lock()
+
+    def request() -> Any:
+        return client.chat.completions.create(model="stub", messages=[{"role": "user", "content": "hi"}])
+
+    def call(_: int) -> None:
+        try:
+            if scheduler is None:
+                request()
+            else:
+                scheduler.call("openai", "stub", request, stats)
+        except Exception:
+            return
+        with lock:
+            succeeded[0] += 1
+
+    stub.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        list(pool.map(call, range(calls)))
+    total = time.perf_counter() - started
+    d = stats.as_dict()
+    print(
+        f"{label:>10}: {succeeded[0]}/{calls} succeeded in {total:5.2f}s, requests {stub.requests}, "
+        f"retries {d['retries']}, backoff {d['backoff_seconds']:.1f}s, throttle {d['throttle_seconds']:.1f}s, "
+        f"max in-flight at stub {stub.max_in_flight}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="LLM 呼び出しのリトライ・レート制限のベンチマーク")
+    parser.add_argument("--calls", type=int, default=40, help="呼び出し回数")
+    parser.add_argument("--threads", type=int, default=8, help="並行呼び出し数")
+    parser.add_argument("--fail-429", type=float, default=0.2, help="429 を返す割合")
+    parser.add_argument("--fail-503", type=float, default=0.1, help="503 を返す割合")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="429 に付ける Retry-After（秒）")
+    parser.add_argument("--latency", type=float, default=0.05, help="スタブの応答時間（秒）")
+    parser.add_argument("--rpm", type=float, default=0.0, help="スケジューラのレート制限（件/分、0 で無効）")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="スケジューラの同時実行数の上限")
+    parser.add_argument("--max-retries", type=int, default=6)
+    args = parser.parse_args()
+
+    stub = FlakyStub(args.fail_429, args.fail_503, args.retry_after, args.latency)
+    print(f"calls={args.calls} threads={args.threads} 429={args.fail_429:.0%} 503={args.fail_503:.0%}")
+    run("no retry", stub, args.calls, args.threads, None)
+    scheduler = LLMScheduler(
+        SchedulerSettings(
+            max_retries=args.max_retries,
+            backoff_base=0.1,
+            backoff_max=5.0,
+            requests_per_minute=args.rpm,
+            max_in_flight=args.max_in_flight,
+        )
+    )
+    run("scheduled", stub, args.calls, args.threads, scheduler)
+    stub.server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
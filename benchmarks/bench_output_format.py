@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+スクリーンショット出力形式ベンチマーク
+
+機能概要:
+- sample/ の PNG（実際の手順書用スクリーンショット）を、extract_screenshots と同じフィルタ・エンコード引数
+  （output_filter / output_codec_args）で再エンコードし、形式・縮小幅・品質ごとの合計サイズと所要時間を比較する
+- 基準は従来の出力（PNG・等倍・-q:v 2）
+
+使い方:
+  python benchmarks/bench_output_format.py
+  python benchmarks/bench_output_format.py --images ./manual_assets --repeat 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from extract_screenshot import OutputOptions, output_codec_args, output_filename, output_filter  # noqa: E402
+
+PRESETS: List[Tuple[str, OutputOptions]] = [
+    ("png (baseline)", OutputOptions()),
+    ("png level 9", OutputOptions(png_compression=9)),
+    ("png w1280", OutputOptions(max_width=1280)),
+    ("jpeg q85", OutputOptions(format="jpeg", quality=85)),
+    ("jpeg q85 w1280", OutputOptions(max_width=1280, format="jpeg", quality=85)),
+    ("webp q80", OutputOptions(format="webp", quality=80)),
+    ("webp q80 w1280", OutputOptions(max_width=1280, format="webp", quality=80)),
+]
+
+
+def encode(src: Path, dst: Path, output: OutputOptions) -> None:
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-i", str(src)]
+    vf = output_filter(output)
+    if vf:
+        cmd += ["-vf", vf]
+    cmd += ["-frames:v", "1", *output_codec_args(dst, output), str(dst)]
+    completed = subprocess.run(cmd, check=False, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"ffmpeg でエンコードできませんでした（{src.name}）: {completed.stderr.strip()}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="スクリーンショット出力形式のベンチマーク")
+    parser.add_argument("--images", default=str(PROJECT_ROOT / "sample"), help="入力 PNG のディレクトリ")
+    parser.add_argument("--repeat", type=int, default=1, help="計測回数")
+    args = parser.parse_args()
+
+    images = sorted(Path(args.images).glob("*.png"))
+    if not images:
+        print(f"PNG が見つかりません: {args.images}", file=sys.stderr)
+        return 2
+    source_bytes = sum(p.stat().st_size for p in images)
+    print(f"images={len(images)} source={source_bytes / 1024:.0f} KiB repeat={args.repeat}")
+
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for label, output in PRESETS:
+            samples = []
+            out_dir = Path(tmpdir) / label.replace(" ", "_")
+            out_dir.mkdir()
+            try:
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    for src in images:
+                        encode(src, out_dir / output_filename(src.name, output), output)
+                    samples.append(time.perf_counter() - started)
+            except RuntimeError as e:
+                print(f"{label:>16}: skipped ({e})")
+                continue
+            size = sum(p.stat().st_size for p in out_dir.iterdir())
+            elapsed = statistics.median(samples)
+            if baseline is None:
+                baseline = (size, elapsed)
+            print(
+                f"{label:>16}: {size / 1024:8.0f} KiB ({size / baseline[0] * 100:5.1f}% of baseline), "
+                f"median {elapsed:.2f}s ({elapsed / baseline[1] * 100:5.1f}% of baseline)"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
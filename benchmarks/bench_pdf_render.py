@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF 変換ベンチマーク
+
+機能概要:
+- sample/ の手順書（Markdown + PNG）を --repeat 回 PDF に変換し、(1) cold: 毎回新しい変換器
+  （convert_markdown_to_pdf_with_weasyprint） (2) warm: 1 つの PDFRenderer を使い回す を比較する
+- 1 回目（import・フォント設定の初期化を含む）と、2 回目以降の中央値・p95・合計を表示する
+- markdown / weasyprint パッケージ（と WeasyPrint のシステムライブラリ）が必要
+
+使い方:
+  python benchmarks/bench_pdf_render.py --repeat 100
+  python benchmarks/bench_pdf_render.py --markdown ./manual_assets/manual.md --repeat 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from pdf_export import convert_markdown_to_pdf_with_weasyprint, get_renderer  # noqa: E402
+
+SAMPLE_MARKDOWN = PROJECT_ROOT / "sample" / "n8n_workflow_chat_with_mcp_manual.md"
+
+
+def measure(render: Callable[[str, str], None], markdown: Path, out_dir: Path, repeat: int) -> List[float]:
+    samples: List[float] = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        render(str(markdown), str(out_dir / f"manual_{i:03d}.pdf"))
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def report(label: str, samples: List[float]) -> None:
+    rest = sorted(samples[1:]) or samples
+    p95 = rest[min(len(rest) - 1, int(len(rest) * 0.95))]
+    print(
+        f"{label:>5}: first {samples[0] * 1000:7.1f} ms, then median {statistics.median(rest) * 1000:7.1f} ms, "
+        f"p95 {p95 * 1000:7.1f} ms, total {sum(samples):6.2f}s"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="PDF 変換（cold / warm）のベンチマーク")
+    parser.add_argument("--markdown", default=str(SAMPLE_MARKDOWN), help="変換する Markdown（画像は同じディレクトリから解決）")
+    parser.add_argument("--repeat", type=int, default=100, help="変換回数")
+    args = parser.parse_args()
+
+    markdown = Path(args.markdown)
+    print(f"markdown={markdown} repeat={args.repeat}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        (tmp / "cold").mkdir()
+        (tmp / "warm").mkdir()
+        # cold: 毎回 Markdown の拡張・共通スタイルシート・フォント設定・画像を読み直す
+        report("cold", measure(convert_markdown_to_pdf_with_weasyprint, markdown, tmp / "cold", args.repeat))
+        # warm: 変換器を使い回す（MCP サーバー・バッチモードの convert_markdown_to_pdf と同じ）
+        report("warm", measure(lambda md, pdf: get_renderer().render(md, pdf), markdown, tmp / "warm", args.repeat))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
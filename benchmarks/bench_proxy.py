@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+プロキシ動画ベンチマーク
+
+機能概要:
+- video_proxy.build_proxy で作るプロキシ動画と元動画のサイズ（= LLM への送信バイト数）と変換時間を比較する
+- --upload を付けると Gemini Files API へ両方をアップロードし、アップロード＋処理待ちの所要時間も計測する
+  （LLM_API_KEY または GOOGLE_API_KEY が必要。アップロードしたファイルは計測後に削除する）
+- --video 未指定時は ffmpeg で 1080p / 30fps の合成動画を生成して使用する
+
+使い方:
+  python benchmarks/bench_proxy.py --duration 300
+  python benchmarks/bench_proxy.py --video ./input.mp4 --width 960 --fps 2 --upload
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from extract_screenshot import run  # noqa: E402
+from video_proxy import DEFAULT_PROXY_CRF, DEFAULT_PROXY_FPS, DEFAULT_PROXY_WIDTH, ProxySettings, build_proxy  # noqa: E402
+
+
+def make_synthetic_video(path: Path, duration: float) -> None:
+    # 1080p / 30fps の動きのある合成動画（音声付き）。画面収録より圧縮しにくいので削減率は控えめに出る
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-b:v", "8M", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k", "-shortest",
+        str(path),
+    ]
+    if run(cmd) != 0:
+        raise RuntimeError("合成動画の生成に失敗しました")
+
+
+def measure_upload(path: Path) -> float:
+    from google import genai
+
+    from gemini_files import upload_video_file
+
+    client = genai.Client(api_key=os.getenv("LLM_API_KEY") or os.getenv("GOOGLE_API_KEY"))
+    started = time.perf_counter()
+    uploaded = upload_video_file(client, path)
+    elapsed = time.perf_counter() - started
+    client.files.delete(name=uploaded.name)
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="プロキシ動画のベンチマーク")
+    parser.add_argument("--video", default="", help="入力動画（未指定なら合成動画を生成）")
+    parser.add_argument("--duration", type=float, default=120.0, help="合成動画の長さ（秒）")
+    parser.add_argument("--width", type=int, default=DEFAULT_PROXY_WIDTH, help="プロキシの最大幅（px）")
+    parser.add_argument("--fps", type=float, default=DEFAULT_PROXY_FPS, help="プロキシのフレームレート")
+    parser.add_argument("--crf", type=int, default=DEFAULT_PROXY_CRF, help="プロキシの CRF")
+    parser.add_argument("--no-audio", action="store_true", help="プロキシから音声を除く")
+    parser.add_argument("--upload", action="store_true", help="Gemini Files API へのアップロード時間も計測する")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        if args.video:
+            video = Path(args.video)
+        else:
+            video = tmp / "synthetic.mp4"
+            make_synthetic_video(video, args.duration)
+
+        settings = ProxySettings(width=args.width, fps=args.fps, crf=args.crf, audio=not args.no_audio)
+        started = time.perf_counter()
+        proxy = build_proxy(video, settings, cache_dir=tmp / "proxies")
+        transcode = time.perf_counter() - started
+
+        original_bytes = video.stat().st_size
+        proxy_bytes = proxy.stat().st_size
+        print(f"video={video} proxy={settings.tag()}")
+        print(f"original: {original_bytes / 1024 / 1024:8.1f} MB")
+        print(
+            f"   proxy: {proxy_bytes / 1024 / 1024:8.1f} MB "
+            f"({proxy_bytes / original_bytes * 100:.1f}%), transcode {transcode:.1f}s"
+        )
+        if args.upload:
+            before = measure_upload(video)
+            after = measure_upload(proxy)
+            print(f"upload: original {before:.1f}s -> proxy {after:.1f}s (+ transcode {transcode:.1f}s on first run)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+場面検出ベンチマーク
+
+機能概要:
+- scene_detect.detect_stable_frames の所要時間を計測し、動画の長さに対する倍率（x リアルタイム）を表示する
+- --video 未指定時は ffmpeg で 1080p の合成画面収録（--segment 秒ごとに画面が切り替わる）を生成して使用する
+- 合成動画では切り替え時刻が既知なので、候補時刻が遷移をまたがず各区間に 1 つずつ出ているかも確認する
+
+使い方:
+  python benchmarks/bench_scene_detect.py                       # 30 分の合成動画
+  python benchmarks/bench_scene_detect.py --duration 300 --repeat 3
+  python benchmarks/bench_scene_detect.py --video ./input.mp4
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from extract_screenshot import run  # noqa: E402
+from scene_detect import DEFAULT_SAMPLE_FPS, DEFAULT_WIDTH, detect_stable_frames  # noqa: E402
+from video_frames import probe_video  # noqa: E402
+
+
+def make_synthetic_screencast(path: Path, duration: float, segment: float) -> None:
+    # testsrc2 を segment 秒に 1 コマだけ生成して 30fps に複製する: 静止画面が続き、区切りで切り替わる画面収録に近い
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=1/{segment}:duration={duration}",
+        "-vf", "fps=30",
+        "-c:v", "libx264", "-preset", "veryfast", "-g", "250", "-pix_fmt", "yuv420p",
+        str(path),
+    ]
+    if run(cmd) != 0:
+        raise RuntimeError("合成動画の生成に失敗しました")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="場面検出のベンチマーク")
+    parser.add_argument("--video", default="", help="入力動画（未指定なら合成動画を生成）")
+    parser.add_argument("--duration", type=float, default=1800.0, help="合成動画の長さ（秒）")
+    parser.add_argument("--segment", type=float, default=5.0, help="合成動画で画面が切り替わる間隔（秒）")
+    parser.add_argument("--sample-fps", type=float, default=DEFAULT_SAMPLE_FPS, help="解析するフレームレート")
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH, help="解析用に縮小する幅（px）")
+    parser.add_argument("--repeat", type=int, default=1, help="計測回数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if args.video:
+            video = Path(args.video)
+        else:
+            video = Path(tmpdir) / "screencast.mp4"
+            started = time.perf_counter()
+            make_synthetic_screencast(video, args.duration, args.segment)
+            print(f"合成動画を生成しました（{time.perf_counter() - started:.1f}s）", file=sys.stderr)
+        duration = probe_video(str(video)).duration or args.duration
+
+        samples = []
+        frames = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            frames = detect_stable_frames(str(video), sample_fps=args.sample_fps, width=args.width)
+            samples.append(time.perf_counter() - started)
+
+        elapsed = statistics.median(samples)
+        print(
+            f"video={video} duration={duration:.0f}s sample_fps={args.sample_fps} width={args.width} "
+            f"repeat={args.repeat}"
+        )
+        print(
+            f"detect_stable_frames: median {elapsed:.2f}s (min {min(samples):.2f}s), "
+            f"{duration / elapsed:.0f}x real time, {len(frames)} candidates"
+        )
+        if not args.video:
+            # 候補が切り替え時刻をまたいでいないか・各区間に 1 つずつあるか
+            segments = math.ceil(duration / args.segment)
+            crossing = [f for f in frames if int(f.start // args.segment) != int(f.time // args.segment)]
+            covered = {int(f.time // args.segment) for f in frames if f not in crossing}
+            print(f"segments covered: {len(covered)}/{segments}, candidates crossing a cut: {len(crossing)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCP サーバー同時実行ベンチマーク
+
+機能概要:
+- build_manual_from_video を複数同時に実行しながら health_check を一定間隔で呼び、応答遅延を計測する
+- LLM 呼び出しと画像抽出は time.sleep で置き換え（ブロッキング処理の模擬。API キー・ffmpeg 不要）
+- ブロッキング処理がイベントループ上で実行されていると health_check の最大遅延が処理時間まで伸びる
+
+使い方:
+  python benchmarks/bench_server_concurrency.py --builds 4 --llm-seconds 2 --extract-seconds 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import anyio
+from fastmcp import Client
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import server.main as srv  # noqa: E402
+
+
+def install_blocking_stages(llm_seconds: float, extract_seconds: float) -> None:
+    response = json.dumps({"output_dir": "", "markdown_output": "manual.md", "screenshots": []})
+
+    def fake_generate(cfg, video_file_name, prompt, stats=None):
+        time.sleep(llm_seconds)
+        return response
+
+    def fake_extract(resp_text, default_video_file, already_extracted=None, **kwargs):
+        time.sleep(extract_seconds)
+        return {}
+
+    srv.generate_response_text = fake_generate
+    srv.handle_response_and_extract = fake_extract
+
+
+async def run_benchmark(builds: int, interval: float) -> None:
+    latencies = []
+    done = anyio.Event()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        video = Path(tmpdir) / "dummy.mp4"
+        video.write_bytes(b"\0" * 1024)
+        async with Client(srv.mcp) as client:
+
+            async def build(i: int) -> None:
+                await client.call_tool(
+                    "build_manual_from_video",
+                    {
+                        "video_path": str(video),
+                        "output_dir": str(Path(tmpdir) / f"out{i}"),
+                        "model_provider": "ollama",
+                        "use_cache": False,
+                    },
+                )
+
+            async def build_all() -> None:
+                async with anyio.create_task_group() as tg:
+                    for i in range(builds):
+                        tg.start_soon(build, i)
+                done.set()
+
+            async def ping() -> None:
+                # 全ビルドが終わるまで health_check の往復時間を計測
+                while not done.is_set():
+                    t0 = time.perf_counter()
+                    await client.call_tool("health_check", {})
+                    latencies.append(time.perf_counter() - t0)
+                    await anyio.sleep(interval)
+
+            started = time.perf_counter()
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(build_all)
+                tg.start_soon(ping)
+            elapsed = time.perf_counter() - started
+
+    print(f"builds={builds} elapsed={elapsed:.2f}s health_check calls={len(latencies)}")
+    if latencies:
+        print(
+            f"health_check latency: median {statistics.median(latencies) * 1000:.1f} ms, "
+            f"max {max(latencies) * 1000:.1f} ms"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="MCP サーバーの同時実行時の応答性を計測")
+    parser.add_argument("--builds", type=int, default=4, help="同時に実行する build_manual_from_video の数")
+    parser.add_argument("--llm-seconds", type=float, default=2.0, help="LLM 呼び出しの模擬時間")
+    parser.add_argument("--extract-seconds", type=float, default=1.0, help="画像抽出の模擬時間")
+    parser.add_argument("--interval", type=float, default=0.05, help="health_check の呼び出し間隔")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LLM_PROVIDER", "ollama")
+    install_blocking_stages(args.llm_seconds, args.extract_seconds)
+    anyio.run(run_benchmark, args.builds, args.interval)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import bisect
+import csv
+import json
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from extract_screenshot import format_timecode, load_keyframe_index, parse_timecode, run, which
+from json_extract import extract_json_object
+from scene_detect import load_stable_frames
+from screenshot_dedup import rewrite_image_refs
+from video_frames import probe_video
+
+
+# 既定: 10 分ごとに分割し、3 区間ずつ並行して LLM に送る
+DEFAULT_CHUNK_SECONDS = 600.0
+DEFAULT_CHUNK_WORKERS = 3
+# 区切りを場面の切り替わりへ寄せる範囲（目標位置 ± 区間長のこの割合）
+SCENE_SNAP_RATIO = 0.2
+
+
+@dataclass
+class Segment:
+    index: int
+    count: int
+    start: float  # 元動画内の開始時刻（秒）
+    end: float
+    path: str  # 区間の動画ファイル（元動画からストリームコピー）
+
+
+def plan_cut_points(
+    duration: float,
+    keyframes: List[float],
+    chunk_seconds: float,
+    scene_changes: Optional[List[float]] = None,
+) -> List[float]:
+    """chunk_seconds ごとの目標位置の近くで区切り時刻を選ぶ（いずれもキーフレーム位置）。
+
+    目標位置 ± chunk_seconds * SCENE_SNAP_RATIO に場面の切り替わりがあれば最も近いものを選び、
+    その直前のキーフレームで区切る（ストリームコピーはキーフレームでしか切れないため）。
+    """
+    if duration <= chunk_seconds * 1.5 or not keyframes:
+        return []
+    tolerance = chunk_seconds * SCENE_SNAP_RATIO
+    changes = sorted(scene_changes or [])
+    cuts: List[float] = []
+    target = chunk_seconds
+    while target < duration - chunk_seconds * 0.5:
+        lo = bisect.bisect_left(changes, target - tolerance)
+        hi = bisect.bisect_right(changes, target + tolerance)
+        point = min(changes[lo:hi], key=lambda t: abs(t - target)) if hi > lo else target
+        k = bisect.bisect_right(keyframes, point) - 1
+        cut = keyframes[k] if k >= 0 else 0.0
+        if cut > (cuts[-1] if cuts else 0.0):
+            cuts.append(cut)
+        target = max(target, cut) + chunk_seconds
+    return cuts
+
+
+def scene_change_times(video: str) -> List[float]:
+    """場面の切り替わり時刻（キャッシュした静止区間 load_stable_frames の開始）。numpy 等がなければ空。"""
+    try:
+        return [f.start for f in load_stable_frames(video)]
+    except Exception as e:
+        print(f"場面検出を使わずに分割します: {e}", file=sys.stderr)
+        return []
+
+
+def split_video(video: str, cut_points: List[float], out_dir: Path) -> List[Segment]:
+    """segment muxer のストリームコピー（再エンコードなし）で 1 回の ffmpeg 実行により分割する。
+
+    実際の区間の開始・終了は -segment_list の CSV から読む（区切りは指定時刻以降の最初のキーフレーム）。
+    """
+    if which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg が見つかりません。インストールしてください。")
+    suffix = Path(video).suffix or ".mp4"
+    list_path = out_dir / "segments.csv"
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-i", video,
+        "-map", "0:v:0", "-map", "0:a?", "-c", "copy",
+        "-f", "segment", "-segment_times", ",".join(f"{t:.6f}" for t in cut_points),
+        "-reset_timestamps", "1",
+        "-segment_list", str(list_path), "-segment_list_type", "csv",
+        str(out_dir / f"part%03d{suffix}"),
+    ]
+    if run(cmd) != 0:
+        raise RuntimeError("動画の分割に失敗しました")
+    rows = list(csv.reader(list_path.read_text(encoding="utf-8").splitlines()))
+    return [
+        Segment(index=i, count=len(rows), start=float(row[1]), end=float(row[2]), path=str(out_dir / row[0]))
+        for i, row in enumerate(rows)
+    ]
+
+
+def segment_prompt_note(segment: Segment) -> str:
+    """区間ごとのプロンプトに添える注記（時刻は区間の先頭からの相対時刻で書かせる）。"""
+    return (
+        f"\nこの動画は長い動画を分割した {segment.count} 区間のうち {segment.index + 1} 番目です"
+        f"（元動画の {format_timecode(segment.start)} 〜 {format_timecode(segment.end)}）。"
+        "screenshots[].time はこの区間の動画の先頭からの時刻で記述してください。"
+        "body_markdown にはこの区間で行われている操作だけを記述してください。\n"
+    )
+
+
+def merge_segment_specs(video: str, segments: List[Segment], specs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """区間ごとの spec を 1 つにまとめる。
+
+    screenshots[].time に区間の開始時刻を足し、ファイル名の衝突を避けるため区間番号を前置する
+    （body_markdown 内の画像参照も合わせて差し替える）。body_markdown は区間の順に連結する。
+    output_dir / markdown_output / title / author は最初の区間の値を使う。
+    """
+    first = specs[0] if specs else {}
+    bodies: List[str] = []
+    screenshots: List[Dict[str, Any]] = []
+    for segment, spec in zip(segments, specs):
+        renames: Dict[str, str] = {}
+        for shot in spec.get("screenshots") or []:
+            if not isinstance(shot, dict) or "filename" not in shot or "time" not in shot:
+                continue
+            name = f"part{segment.index + 1:02d}_{shot['filename']}"
+            renames[str(shot["filename"])] = name
+            screenshots.append(
+                dict(shot, filename=name, time=format_timecode(parse_timecode(shot["time"]) + segment.start))
+            )
+        body = rewrite_image_refs(str(spec.get("body_markdown") or ""), renames).strip()
+        if body:
+            bodies.append(body)
+    return {
+        "video": video,
+        "output_dir": first.get("output_dir", "./manual_assets"),
+        "markdown_output": first.get("markdown_output", "manual.md"),
+        "title": first.get("title", "操作マニュアル"),
+        "author": first.get("author", ""),
+        "body_markdown": "\n\n".join(bodies) + "\n",
+        "screenshots": screenshots,
+    }
+
+
+def generate_chunked(
+    video: str,
+    analyse: Callable[[Segment], str],
+    chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+    max_workers: int = DEFAULT_CHUNK_WORKERS,
+    spec_video: Optional[str] = None,
+) -> Optional[str]:
+    """長い動画を場面の切り替わり付近で分割し、区間ごとに analyse を並行実行して 1 つの応答（JSON 文字列）にまとめる。
+
+    analyse(segment) は区間の動画に対する LLM 応答本文を返す。並行数は max_workers で制限するため、
+    所要時間はおおよそ 区間数 / max_workers 回分の LLM 呼び出しになる。
+    動画が chunk_seconds * 1.5 以下なら分割せず None を返す（呼び出し側で通常の 1 回呼び出しを行う）。
+    区間の応答から JSON を抽出できなかった場合は RuntimeError。
+    video がプロキシ動画の場合は spec_video に元動画を渡す（まとめた spec の video になる）。
+    """
+    duration = probe_video(video).duration
+    if duration <= chunk_seconds * 1.5:
+        return None
+    cut_points = plan_cut_points(duration, load_keyframe_index(video), chunk_seconds, scene_change_times(video))
+    if not cut_points:
+        return None
+
+    with tempfile.TemporaryDirectory(prefix="movie2manual_chunks_") as tmpdir:
+        segments = split_video(video, cut_points, Path(tmpdir))
+        print(
+            f"動画を {len(segments)} 区間に分割しました（並行数 {max(1, max_workers)}）",
+            file=sys.stderr,
+        )
+
+        def run_segment(segment: Segment) -> Dict[str, Any]:
+            started = time.perf_counter()
+            text = analyse(segment)
+            spec = extract_json_object(text)
+            if not isinstance(spec, dict):
+                raise RuntimeError(f"区間 {segment.index + 1} の応答から有効なJSONを抽出できませんでした。")
+            print(
+                f"区間 {segment.index + 1}/{segment.count} を解析しました（{time.perf_counter() - started:.1f}s）",
+                file=sys.stderr,
+            )
+            return spec
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            specs = list(pool.map(run_segment, segments))
+    merged = merge_segment_specs(spec_video or video, segments, specs)
+    return json.dumps(merged, ensure_ascii=False, indent=2)
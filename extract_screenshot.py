@@ -11,6 +11,13 @@
 
 使い方:
   python extract_screenshot.py --spec prompt.json
+  python extract_screenshot.py --spec prompt.json --method batch   # 1 回のデコードで全フレームを抽出
+  python extract_screenshot.py --spec prompt.json --max-workers 8  # ffmpeg を 8 並列で実行
+  python extract_screenshot.py --spec prompt.json --method accurate  # キーフレーム索引でフレーム精度のシーク
+  python extract_screenshot.py --spec prompt.json --snap  # 各時刻を前後 1 秒で最も安定したフレームへ補正してから抽出
+  python extract_screenshot.py --spec prompt.json --dedupe merge  # 直前とほぼ同じ画面の画像を削除し、1 枚にまとめる
+  python extract_screenshot.py --spec prompt.json --max-width 1280 --image-format webp --quality 80  # 縮小して WebP で保存
+  python extract_screenshot.py --spec prompt.json --incremental  # 前回から入力が変わった画像だけを抽出し直す
 
 prompt.json の例:
 {
@@ -26,24 +33,37 @@ prompt.json の例:
 from __future__ import annotations
 
 import argparse
+import bisect
+import dataclasses
 import datetime as dt
+import functools
+import hashlib
 import json
 import os
 import shutil
 import shlex
 import subprocess
 import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, TextIO, Tuple, Union
 
 
 def which(cmd: str) -> Optional[str]:
     return shutil.which(cmd)
 
 
+# 実行コマンドのログ出力先。None なら呼び出し時点の sys.stdout。
+# 標準出力をプロトコルに使うプロセス（MCP サーバー等）は sys.stderr を設定する。
+# redirect_stdout と違いスレッドから同時に抽出しても安全。
+COMMAND_LOG_STREAM: Optional[TextIO] = None
+
+
 def run(cmd: List[str], cwd: Optional[Union[str, Path]] = None) -> int:
-    print("$", " ".join(shlex.quote(c) for c in cmd))
+    print("$", " ".join(shlex.quote(c) for c in cmd), file=COMMAND_LOG_STREAM)
     try:
         completed = subprocess.run(cmd, cwd=cwd, check=False)
         return completed.returncode
@@ -71,6 +91,129 @@ def format_timecode(value: Union[str, float, int]) -> str:
     raise ValueError("Unsupported time format")
 
 
+def parse_timecode(value: Union[str, float, int]) -> float:
+    """秒(float/int)・"SS.mmm"・"MM:SS.mmm"・"HH:MM:SS.mmm" を秒数(float)へ変換。"""
+    if isinstance(value, (float, int)):
+        return float(value)
+    if isinstance(value, str):
+        parts = value.strip().split(":")
+        if not 1 <= len(parts) <= 3:
+            raise ValueError(f"Unsupported time format: {value}")
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+        return seconds
+    raise ValueError("Unsupported time format")
+
+
+# 抽出方式:
+# - seek    : 1 枚ごとに ffmpeg を起動し、-ss を -i より前に置いて高速シーク（従来方式）
+# - batch   : ffmpeg を 1 回だけ起動し、split + select フィルタで全フレームを 1 パスのデコードで書き出す
+# - accurate: キーフレーム索引から直前のキーフレームへシークし、指定時刻までの短い区間だけをデコード
+EXTRACT_METHODS = ("seek", "batch", "accurate")
+
+
+def default_cache_dir() -> Path:
+    """キャッシュの保存先（MOVIE2MANUAL_CACHE_DIR があれば優先）。"""
+    env = os.getenv("MOVIE2MANUAL_CACHE_DIR")
+    if env:
+        return Path(env).expanduser()
+    return Path.home() / ".cache" / "movie2manual"
+
+
+# file_sha256 の結果をプロセス内で再利用する件数（超えたら最終利用の古いものから捨てる）
+SHA256_MEMO_LIMIT = 1024
+
+_SHA256_MEMO: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_SHA256_LOCK = threading.Lock()
+
+
+def file_sha256(path: Union[str, Path], chunk_size: int = 1024 * 1024) -> str:
+    """ファイル内容の SHA-256 を固定長チャンクで逐次計算する（全体をメモリに載せない）。
+
+    同一プロセス内ではパス・サイズ・更新時刻が同じ限り結果を再利用する（直近 SHA256_MEMO_LIMIT 件まで）。
+    """
+    p = Path(path).resolve()
+    st = p.stat()
+    key = (str(p), st.st_size, st.st_mtime_ns)
+    with _SHA256_LOCK:
+        cached = _SHA256_MEMO.get(key)
+        if cached is not None:
+            _SHA256_MEMO.move_to_end(key)
+    if cached is not None:
+        return cached
+    h = hashlib.sha256()
+    with p.open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _SHA256_LOCK:
+        _SHA256_MEMO[key] = digest
+        while len(_SHA256_MEMO) > SHA256_MEMO_LIMIT:
+            _SHA256_MEMO.popitem(last=False)
+    return digest
+
+
+def probe_start_time(video: str) -> float:
+    """映像ストリームの start_time（秒）。取得できなければ 0。"""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=start_time", "-of", "csv=p=0", video,
+    ]
+    completed = subprocess.run(cmd, check=False, capture_output=True, text=True)
+    try:
+        return float(completed.stdout.strip().splitlines()[0])
+    except (IndexError, ValueError):
+        return 0.0
+
+
+def probe_keyframes(video: str) -> List[float]:
+    """ffprobe のパケット情報からキーフレーム（K フラグ）の時刻を昇順で返す。
+
+    pts はストリームの絶対時刻のため、start_time を引いて -ss と同じ先頭からの相対時刻にする。
+    """
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video,
+    ]
+    completed = subprocess.run(cmd, check=False, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"ffprobe でキーフレーム索引を作成できませんでした: {completed.stderr.strip()}")
+    start = probe_start_time(video)
+    keyframes: List[float] = []
+    for line in completed.stdout.splitlines():
+        pts, _, flags = line.strip().partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            keyframes.append(max(0.0, float(pts) - start))
+    keyframes.sort()
+    return keyframes
+
+
+def load_keyframe_index(video: str, cache_dir: Optional[Union[str, Path]] = None) -> List[float]:
+    """動画内容の SHA-256 をキーにキーフレーム索引をキャッシュし、2 回目以降は ffprobe を省略する。
+
+    索引の時刻は先頭からの相対時刻（"relative": true。絶対時刻で保存した古い索引は作り直す）。
+    """
+    index_dir = Path(cache_dir) if cache_dir else default_cache_dir() / "keyframes"
+    index_path = index_dir / f"{file_sha256(video)}.json"
+    if index_path.exists():
+        try:
+            index = json.loads(index_path.read_text(encoding="utf-8"))
+            if index.get("relative"):
+                return [float(t) for t in index["keyframes"]]
+        except Exception:
+            pass  # 壊れた索引は作り直す
+    keyframes = probe_keyframes(video)
+    try:
+        ensure_dir(index_dir)
+        index_path.write_text(
+            json.dumps({"video": str(video), "relative": True, "keyframes": keyframes}), encoding="utf-8"
+        )
+    except OSError as e:
+        print(f"キーフレーム索引を保存できませんでした: {e}", file=sys.stderr)
+    return keyframes
+
+
 @dataclass
 class ScreenshotSpec:
     time: Union[str, float, int]
@@ -78,32 +221,418 @@ class ScreenshotSpec:
     caption: Optional[str] = None
 
 
-def extract_screenshots(video: str, output_dir: str, screenshots: List[ScreenshotSpec]) -> List[Path]:
-    if which("ffmpeg") is None:
-        raise RuntimeError("ffmpeg が見つかりません。インストールしてください。")
+# 出力形式と拡張子（format 未指定ならファイル名の拡張子のまま ffmpeg に任せる）
+IMAGE_FORMATS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
 
-    ensure_dir(output_dir)
-    out_paths: List[Path] = []
-    for i, s in enumerate(screenshots or []):
-        t = format_timecode(s.time)
-        out_path = Path(output_dir) / s.filename
+
+@dataclass
+class OutputOptions:
+    max_width: int = 0  # 0 なら縮小しない（元より大きくはしない）
+    format: str = ""  # "" | "png" | "jpeg" | "webp"
+    quality: Optional[int] = None  # jpeg / webp の品質（1〜100）
+    png_compression: Optional[int] = None  # png の圧縮レベル（0〜9）
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> "OutputOptions":
+        """screenshot_policy 等の dict から作る（未知のキーは無視し、値の範囲は検証する）。"""
+        options = OutputOptions(
+            max_width=int(d.get("max_width") or 0),
+            format=str(d.get("format") or "").lower().replace("jpg", "jpeg"),
+            quality=None if d.get("quality") is None else int(d["quality"]),
+            png_compression=None if d.get("png_compression") is None else int(d["png_compression"]),
+        )
+        options.validate()
+        return options
+
+    def validate(self) -> None:
+        if self.format and self.format not in IMAGE_FORMATS:
+            raise ValueError(f"未対応の画像形式です: {self.format}（{', '.join(IMAGE_FORMATS)}）")
+        if self.max_width < 0:
+            raise ValueError(f"max_width は 0 以上を指定してください: {self.max_width}")
+        if self.quality is not None and not 1 <= self.quality <= 100:
+            raise ValueError(f"quality は 1〜100 で指定してください: {self.quality}")
+        if self.png_compression is not None and not 0 <= self.png_compression <= 9:
+            raise ValueError(f"png_compression は 0〜9 で指定してください: {self.png_compression}")
+
+
+def output_filename(filename: str, output: Optional[OutputOptions]) -> str:
+    """出力形式に合わせて拡張子を差し替えたファイル名（形式未指定ならそのまま）。"""
+    if output is None or not output.format:
+        return filename
+    return str(Path(filename).with_suffix(IMAGE_FORMATS[output.format]))
+
+
+def output_filter(output: Optional[OutputOptions]) -> str:
+    """抽出フレームに掛けるフィルタ（縮小）。元の幅が max_width 以下なら拡大しない。"""
+    if output is None or not output.max_width:
+        return ""
+    return f"scale=w=min({output.max_width}\\,iw):h=-2:flags=lanczos"
+
+
+def output_codec_args(out_path: Path, output: Optional[OutputOptions]) -> List[str]:
+    """出力ファイルの拡張子と OutputOptions から ffmpeg のエンコード引数を作る。
+
+    オプション未指定の項目は従来どおり -q:v 2（jpeg の高品質設定。png では無視される）。
+    """
+    suffix = out_path.suffix.lower()
+    quality = output.quality if output is not None else None
+    if suffix == ".webp":
+        return ["-c:v", "libwebp", "-quality", str(quality if quality is not None else 90)]
+    if suffix == ".png":
+        level = output.png_compression if output is not None else None
+        return ["-compression_level", str(level)] if level is not None else ["-q:v", "2"]
+    if quality is not None:
+        # jpeg の qscale は 2（高品質）〜31（低品質）
+        return ["-q:v", str(round(31 - (quality - 1) * 29 / 99))]
+    return ["-q:v", "2"]
+
+
+def _extract_seek(
+    video: str,
+    out_paths: List[Path],
+    times: List[str],
+    threads: int = 0,
+    output: Optional[OutputOptions] = None,
+) -> None:
+    vf = output_filter(output)
+    for t, out_path in zip(times, out_paths):
         # 高速かつ近似シーク: -ss を -i より前に置く
-        cmd = [
-            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
-            "-ss", t, "-i", video,
-            "-frames:v", "1", "-q:v", "2",
+        cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+        if threads:
+            cmd += ["-threads", str(threads)]
+        cmd += ["-ss", t, "-i", video]
+        if vf:
+            cmd += ["-vf", vf]
+        cmd += ["-frames:v", "1", *output_codec_args(out_path, output), str(out_path)]
+        code = run(cmd)
+        if code != 0:
+            raise RuntimeError(f"ffmpeg 抽出に失敗しました: time={t}, filename={out_path}")
+
+
+def _extract_batch(
+    video: str,
+    out_paths: List[Path],
+    times: List[str],
+    threads: int = 0,
+    output: Optional[OutputOptions] = None,
+) -> None:
+    """動画を 1 度だけデコードし、各時刻の最初のフレームをそれぞれのファイルへ書き出す。
+
+    split で映像を出力数ぶんに分岐し、各枝の select で `t >= 指定時刻` の先頭フレームだけを
+    出力する（-frames:v 1）。全出力が 1 枚ずつ書き終えた時点で ffmpeg は終了するため、
+    最後の時刻より後ろはデコードしない。先頭側は最小時刻まで入力シークで読み飛ばし、
+    -copyts で select に渡る t を元動画の時刻のまま保つ。-copyts の t はストリームの絶対時刻のため、
+    start_time（probe_start_time）を足して -ss と同じ先頭からの相対時刻で選ぶ。縮小は各枝の select の後ろで行う。
+    """
+    seconds = [parse_timecode(t) for t in times]
+    n = len(seconds)
+    vf = output_filter(output)
+    start = max(0.0, min(seconds) - 1.0)
+    offset = probe_start_time(video) if start > 0 else 0.0
+    graph = [f"[0:v]split={n}" + "".join(f"[s{i}]" for i in range(n))]
+    for i, sec in enumerate(seconds):
+        graph.append(f"[s{i}]select=gte(t\\,{sec + offset:.3f})" + (f",{vf}" if vf else "") + f"[o{i}]")
+
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    if start > 0:
+        cmd += ["-ss", format_timecode(start), "-copyts"]
+    cmd += ["-i", video, "-filter_complex", ";".join(graph)]
+    for i, out_path in enumerate(out_paths):
+        # 失敗時に古いファイルを成功扱いしないよう、事前に消しておく
+        out_path.unlink(missing_ok=True)
+        cmd += ["-map", f"[o{i}]", "-frames:v", "1", *output_codec_args(out_path, output), str(out_path)]
+
+    code = run(cmd)
+    missing = [
+        f"time={t}, filename={p}" for t, p in zip(times, out_paths) if not p.exists()
+    ]
+    if code != 0 or missing:
+        detail = "; ".join(missing) if missing else f"exit code {code}"
+        raise RuntimeError(f"ffmpeg 一括抽出に失敗しました: {detail}")
+
+
+def _extract_accurate(
+    video: str,
+    out_paths: List[Path],
+    times: List[str],
+    threads: int = 0,
+    keyframes: Optional[List[float]] = None,
+    output: Optional[OutputOptions] = None,
+) -> None:
+    """直前のキーフレームへ入力シークし、出力側 -ss で指定時刻までの差分だけをデコードする。
+
+    入力側は -noaccurate_seek でキーフレーム位置へ直接ジャンプし、出力側の -ss で
+    `pts >= 指定時刻` の最初のフレームまで読み進める（batch と同じフレームを選ぶ）。
+    """
+    keyframes = keyframes or [0.0]  # 先頭からの相対時刻（load_keyframe_index）。-ss と同じ基準で比較する
+    vf = output_filter(output)
+    for t, out_path in zip(times, out_paths):
+        sec = parse_timecode(t)
+        k = bisect.bisect_right(keyframes, sec) - 1
+        base = keyframes[k] if k >= 0 else 0.0
+        cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+        if threads:
+            cmd += ["-threads", str(threads)]
+        cmd += ["-noaccurate_seek", "-ss", f"{base:.6f}", "-i", video]
+        if vf:
+            cmd += ["-vf", vf]
+        cmd += [
+            "-ss", f"{max(0.0, sec - base):.6f}",
+            "-frames:v", "1", *output_codec_args(out_path, output),
             str(out_path),
         ]
         code = run(cmd)
         if code != 0:
             raise RuntimeError(f"ffmpeg 抽出に失敗しました: time={t}, filename={out_path}")
-        out_paths.append(out_path)
+
+
+def frame_input_key(
+    video_sha256: str, time: Union[str, float, int], output: Optional[OutputOptions], snap: bool = False, method: str = "seek"
+) -> str:
+    """1 枚の抽出結果を決める入力（動画の内容・指定時刻・時刻補正の有無・抽出方式・縮小／形式の設定）のハッシュ。
+
+    増分抽出（extract_screenshots の incremental=True）とパイプラインのチェックポイント（pipeline_checkpoint）で共通。
+    """
+    payload = {
+        "video_sha256": video_sha256,
+        "time": format_timecode(time),
+        "snap": snap,
+        "method": method,
+        "output": dataclasses.asdict(output) if output is not None else None,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def resolve_max_workers(max_workers: Optional[int]) -> int:
+    """ワーカー数を CPU 数の範囲に収める。None/0 以下は 1（逐次実行）とみなす。"""
+    cpu = os.cpu_count() or 1
+    if not max_workers or max_workers < 1:
+        return 1
+    return min(max_workers, cpu)
+
+
+def _plan_groups(times: List[str], method: str, workers: int) -> List[List[int]]:
+    """ワーカーへ割り当てる添字グループを作る。
+
+    seek は 1 枚 = 1 タスク。batch は時刻順に並べて連続区間へ分割し、
+    各ワーカーが動画の異なる範囲だけをデコードするようにする。
+    """
+    if method != "batch":
+        return [[i] for i in range(len(times))]
+    order = sorted(range(len(times)), key=lambda i: parse_timecode(times[i]))
+    size = -(-len(order) // workers)
+    return [order[k:k + size] for k in range(0, len(order), size)]
+
+
+def extract_screenshots(
+    video: str,
+    output_dir: str,
+    screenshots: List[ScreenshotSpec],
+    method: str = "seek",
+    max_workers: Optional[int] = None,
+    dedupe: str = "off",
+    dedupe_distance: Optional[int] = None,
+    output: Optional[OutputOptions] = None,
+    incremental: bool = False,
+    snap: bool = False,
+) -> List[Path]:
+    """スクリーンショットを抽出し、screenshots と同じ順序で出力パスを返す。
+
+    method="accurate" では動画ごとのキーフレーム索引（default_cache_dir() 配下に内容ハッシュで保存）を使う。
+    max_workers を指定すると ffmpeg をスレッドプールで並列実行する（CPU 数が上限）。
+    各 ffmpeg のデコードスレッド数は CPU 数 / ワーカー数に抑える。
+    一部のフレームが失敗しても他のワーカーは最後まで実行し、失敗分をまとめて RuntimeError で報告する。
+    dedupe="flag" / "merge" では抽出後に各フレームの dHash を比較し、直前とハミング距離 dedupe_distance 以内の
+    画像を報告する（merge は削除し、その要素の戻り値を残した画像のパスにする。screenshot_dedup を参照）。
+    output で縮小幅・形式・品質を指定できる。形式を指定した場合、ファイル名の拡張子は形式に合わせて差し替える
+    （output_filename。戻り値のパスも差し替え後の名前）。
+    snap=True なら抽出前に各時刻を前後の区間で最も安定したフレームへ補正する（frame_snap）。
+    incremental=True では output_dir のチェックポイント（manifest.json。pipeline_checkpoint）に各ファイルの入力キー
+    （frame_input_key）と出力ハッシュを記録し、入力が前回と同じで出力ファイルも変わっていないものは抽出も補正もしない。
+    """
+    if which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg が見つかりません。インストールしてください。")
+    if method not in EXTRACT_METHODS:
+        raise ValueError(f"未対応の抽出方式です: {method}（{', '.join(EXTRACT_METHODS)}）")
+
+    if output is not None:
+        output.validate()
+    ensure_dir(output_dir)
+    shots = [
+        dataclasses.replace(s, filename=output_filename(s.filename, output))
+        for s in (screenshots or [])
+    ]
+    out_paths: List[Path] = [Path(output_dir) / s.filename for s in shots]
+    times = [format_timecode(s.time) for s in shots]
+    if not shots:
+        return out_paths
+
+    if incremental:
+        return _extract_incremental(video, output_dir, shots, method, max_workers, dedupe, dedupe_distance, output, snap)
+    if snap:
+        # frame_snap は本モジュールを import するため遅延 import
+        from frame_snap import snap_screenshots
+
+        shots = snap_screenshots(video, shots)
+        times = [format_timecode(s.time) for s in shots]
+
+    if method == "accurate":
+        if which("ffprobe") is None:
+            raise RuntimeError("ffprobe が見つかりません。ffmpeg と同梱のものをインストールしてください。")
+        extractor = functools.partial(_extract_accurate, keyframes=load_keyframe_index(video), output=output)
+    elif method == "batch":
+        extractor = functools.partial(_extract_batch, output=output)
+    else:
+        extractor = functools.partial(_extract_seek, output=output)
+    workers = resolve_max_workers(max_workers)
+    groups = _plan_groups(times, method, workers)
+    threads = max(1, (os.cpu_count() or 1) // workers) if workers > 1 else 0
+
+    def run_group(group: List[int]) -> None:
+        extractor(video, [out_paths[i] for i in group], [times[i] for i in group], threads)
+
+    errors: List[Tuple[int, str]] = []
+    if workers == 1:
+        for group in groups:
+            try:
+                run_group(group)
+            except Exception as e:
+                errors.append((min(group), str(e)))
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(groups))) as pool:
+            futures = {pool.submit(run_group, group): group for group in groups}
+            for future in as_completed(futures):
+                exc = future.exception()
+                if exc is not None:
+                    errors.append((min(futures[future]), str(exc)))
+
+    if errors:
+        errors.sort()
+        raise RuntimeError(
+            f"{len(errors)} 件の抽出に失敗しました:\n" + "\n".join(msg for _, msg in errors)
+        )
+    if dedupe != "off":
+        # screenshot_dedup は本モジュールを import するため遅延 import
+        from screenshot_dedup import DEFAULT_DEDUPE_DISTANCE, dedupe_screenshots
+
+        distance = DEFAULT_DEDUPE_DISTANCE if dedupe_distance is None else dedupe_distance
+        merged = dedupe_screenshots(output_dir, shots, distance, mode=dedupe)
+        out_paths = _merged_paths(output_dir, shots, out_paths, merged, dedupe)
     return out_paths
 
 
+def _merged_paths(
+    output_dir: str, shots: List[ScreenshotSpec], out_paths: List[Path], merged: Dict[str, str], dedupe: str
+) -> List[Path]:
+    """dedupe="merge" で削除した要素のパスを、残した画像のパスに差し替える。"""
+    if dedupe != "merge":
+        return out_paths
+    return [
+        Path(output_dir) / merged[s.filename] if s.filename in merged else p
+        for s, p in zip(shots, out_paths)
+    ]
+
+
+def _extract_incremental(
+    video: str,
+    output_dir: str,
+    shots: List[ScreenshotSpec],
+    method: str,
+    max_workers: Optional[int],
+    dedupe: str,
+    dedupe_distance: Optional[int],
+    output: Optional[OutputOptions],
+    snap: bool,
+) -> List[Path]:
+    """チェックポイントの画像の記録を見て、入力が変わった（またはファイルが無い・変わった）画像だけを抽出する。"""
+    # pipeline_checkpoint / screenshot_dedup は本モジュールを import するため遅延 import
+    from pipeline_checkpoint import Checkpoint
+    from screenshot_dedup import DEFAULT_DEDUPE_DISTANCE, dedupe_screenshots
+
+    ckpt = Checkpoint(output_dir)
+    shots = list(shots)
+    keys, extracted = ckpt.extract_frames(
+        video,
+        shots,
+        lambda todo: extract_screenshots(video, output_dir, todo, method=method, max_workers=max_workers, output=output),
+        snap=snap,
+        output=output,
+        method=method,
+    )
+    distance = DEFAULT_DEDUPE_DISTANCE if dedupe_distance is None else dedupe_distance
+    merged: Optional[Dict[str, str]] = {}
+    if dedupe != "off":
+        merged = None if extracted else ckpt.saved_merged(keys, dedupe, distance)
+        if merged is None:
+            merged = dedupe_screenshots(output_dir, shots, distance, mode=dedupe)
+    ckpt.finish_frames(shots, keys, merged, dedupe, distance)
+    return _merged_paths(output_dir, shots, [Path(output_dir) / s.filename for s in shots], merged, dedupe)
+
+
+def add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    """出力形式・縮小・圧縮のコマンドライン引数（main.py と共通）。"""
+    parser.add_argument("--max-width", type=int, default=0, help="この幅（px）を超える画像は縮小する（既定: 0 = 縮小しない）")
+    parser.add_argument(
+        "--image-format",
+        choices=tuple(IMAGE_FORMATS),
+        default="",
+        help="出力形式（未指定ならファイル名の拡張子に従う。指定時は拡張子を差し替える）",
+    )
+    parser.add_argument("--quality", type=int, default=None, help="jpeg / webp の品質（1〜100）")
+    parser.add_argument("--png-compression", type=int, default=None, help="png の圧縮レベル（0〜9）")
+
+
+def output_options_from_args(args: argparse.Namespace) -> OutputOptions:
+    options = OutputOptions(
+        max_width=args.max_width,
+        format=args.image_format,
+        quality=args.quality,
+        png_compression=args.png_compression,
+    )
+    options.validate()
+    return options
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="動画から静止画抽出")
     parser.add_argument("--spec", required=True, help="JSONのパス")
+    parser.add_argument(
+        "--method",
+        choices=EXTRACT_METHODS,
+        default="seek",
+        help="抽出方式（seek: 1 枚ずつ高速シーク / batch: 1 回のデコードで全フレームを抽出 / accurate: キーフレーム索引でフレーム精度のシーク）",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=1,
+        help="ffmpeg の並列実行数（CPU 数が上限。既定: 1 = 逐次）",
+    )
+    parser.add_argument(
+        "--snap",
+        action="store_true",
+        help="抽出前に各時刻を前後の区間で最も安定した（動きが少なく鮮明な）フレームへ補正する（numpy が必要）",
+    )
+    parser.add_argument(
+        "--dedupe",
+        choices=("off", "flag", "merge"),
+        default="off",
+        help="直前とほぼ同じ画面の画像の扱い（off: 何もしない / flag: 報告のみ / merge: 削除して 1 枚にまとめる）",
+    )
+    parser.add_argument(
+        "--dedupe-distance",
+        type=int,
+        default=None,
+        help="同一画面とみなす dHash（64 ビット）のハミング距離の上限（既定: 5）",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="出力先の manifest.json の記録を見て、前回から入力（動画・時刻・時刻補正・抽出方式・出力形式）が変わっていない画像の抽出を省略する",
+    )
+    add_output_arguments(parser)
     args = parser.parse_args()
 
     spec_path = Path(args.spec)
@@ -134,10 +663,23 @@ def main() -> int:
         return 2
 
     try:
-        images = extract_screenshots(video, output_dir, shots)
+        images = extract_screenshots(
+            video,
+            output_dir,
+            shots,
+            method=args.method,
+            max_workers=args.max_workers,
+            dedupe=args.dedupe,
+            dedupe_distance=args.dedupe_distance,
+            output=output_options_from_args(args),
+            incremental=args.incremental,
+            snap=args.snap,
+        )
     except Exception as e:
         print(f"静止画抽出でエラー: {e}", file=sys.stderr)
         return 1
+    print(f"{len(set(images))} 枚の静止画を抽出しました: {output_dir}", file=sys.stderr)
+    return 0
 
 if __name__ == "__main__":
     sys.exit(main())
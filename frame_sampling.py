@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import base64
+import heapq
+import math
+import os
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple, Union
+
+from extract_screenshot import format_timecode
+from video_frames import frame_differences, iter_frame_blocks, probe_video, require_numpy, scaled_size
+
+
+# コンタクトシートの既定レイアウト: 320px 幅のコマを 4x4 に並べる（16:9 なら 1280x720）
+DEFAULT_COLUMNS = 4
+DEFAULT_ROWS = 4
+DEFAULT_THUMB_WIDTH = 320
+DEFAULT_SAMPLE_FPS = 1.0
+# 変化量（平均絶対差, 0〜255）がこれ未満のフレームは場面転換とみなさない
+MIN_SCENE_SCORE = 2.0
+# sample_for_prompt で再利用するコンタクトシートの件数（動画ごと）
+SHEET_MEMO_LIMIT = 4
+
+_SHEET_MEMO: "OrderedDict[Tuple[str, int, int, int], List[ContactSheet]]" = OrderedDict()
+_SHEET_MEMO_LOCK = threading.Lock()
+
+
+@dataclass
+class ContactSheet:
+    jpeg: bytes
+    times: List[float]  # シート内のコマの時刻（左上から行優先）
+
+    def data_url(self) -> str:
+        return "data:image/jpeg;base64," + base64.b64encode(self.jpeg).decode("ascii")
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """OpenAI の画像入力（detail=high）のトークン数見積もり: 512px タイル数 x 170 + 85。"""
+    scale = min(1.0, 2048 / max(width, height))
+    w, h = width * scale, height * scale
+    scale = min(1.0, 768 / min(w, h))
+    w, h = w * scale, h * scale
+    return 85 + 170 * math.ceil(w / 512) * math.ceil(h / 512)
+
+
+def select_scene_frames(
+    video: str,
+    max_frames: int,
+    thumb_width: int = DEFAULT_THUMB_WIDTH,
+    sample_fps: float = DEFAULT_SAMPLE_FPS,
+) -> List[Tuple[float, "object"]]:
+    """1 回のデコードで縮小 RGB フレームを読み、直前フレームとの差分が大きい上位 max_frames 枚を選ぶ。
+
+    差分は 1/2 に間引いた輝度で NumPy によりブロック単位で一括計算する。
+    保持するのは上位候補のサムネイルだけなので、動画の長さに関わらずメモリ使用量は一定。
+    先頭フレームは常に含める。戻り値は時刻順の (時刻, RGB サムネイル)。
+    """
+    numpy = require_numpy()
+    info = probe_video(video)
+    width, height = scaled_size(info, thumb_width)
+    weights = numpy.array([0.299, 0.587, 0.114], dtype=numpy.float32)
+
+    heap: List[Tuple[float, float, int, "object"]] = []
+    previous = None
+    counter = 0
+    for times, frames in iter_frame_blocks(video, sample_fps, width, height, gray=False):
+        luma = (frames[:, ::2, ::2, :].astype(numpy.float32) @ weights).astype(numpy.uint8)
+        scores = frame_differences(luma, previous)
+        previous = luma[-1]
+        # ブロック内で上位に入り得るものだけを heap と比較する
+        candidates = numpy.flatnonzero(scores >= MIN_SCENE_SCORE)
+        for i in candidates:
+            item = (float(scores[i]), float(times[i]), counter, frames[i].copy())
+            counter += 1
+            if len(heap) < max_frames:
+                heapq.heappush(heap, item)
+            elif item[0] > heap[0][0]:
+                heapq.heapreplace(heap, item)
+    return sorted(((t, thumb) for _, t, _, thumb in heap), key=lambda x: x[0])
+
+
+# 時刻ラベル用の 3x5 ビットマップフォント（数字・コロン・ピリオドのみ）
+_GLYPHS = {
+    "0": ("111", "101", "101", "101", "111"),
+    "1": ("010", "110", "010", "010", "111"),
+    "2": ("111", "001", "111", "100", "111"),
+    "3": ("111", "001", "111", "001", "111"),
+    "4": ("101", "101", "111", "001", "001"),
+    "5": ("111", "100", "111", "001", "111"),
+    "6": ("111", "100", "111", "101", "111"),
+    "7": ("111", "001", "001", "001", "001"),
+    "8": ("111", "101", "111", "101", "111"),
+    "9": ("111", "101", "111", "001", "111"),
+    ":": ("000", "010", "000", "010", "000"),
+    ".": ("000", "000", "000", "000", "010"),
+}
+
+
+def _draw_label(tile: "object", text: str, scale: int = 3) -> None:
+    """tile（H,W,3）の左上に黒背景・白文字で text を描く。"""
+    numpy = require_numpy()
+    glyph_w, glyph_h, pad = 4 * scale, 5 * scale, scale
+    box_w = min(tile.shape[1], glyph_w * len(text) + pad * 2)
+    box_h = min(tile.shape[0], glyph_h + pad * 2)
+    tile[:box_h, :box_w] = 0
+    for k, ch in enumerate(text):
+        rows = _GLYPHS.get(ch)
+        if rows is None:
+            continue
+        bitmap = numpy.array([[c == "1" for c in row] for row in rows], dtype=bool)
+        bitmap = bitmap.repeat(scale, axis=0).repeat(scale, axis=1)
+        y0, x0 = pad, pad + k * glyph_w
+        region = tile[y0:y0 + bitmap.shape[0], x0:x0 + bitmap.shape[1]]
+        region[bitmap[: region.shape[0], : region.shape[1]]] = 255
+
+
+def _encode_jpeg(image: "object", quality: int = 4) -> bytes:
+    height, width = image.shape[:2]
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-i", "pipe:0",
+        "-frames:v", "1", "-q:v", str(quality), "-f", "image2pipe", "-c:v", "mjpeg", "pipe:1",
+    ]
+    completed = subprocess.run(cmd, input=image.tobytes(), capture_output=True, check=False)
+    if completed.returncode != 0:
+        raise RuntimeError(f"コンタクトシートの JPEG 化に失敗しました: {completed.stderr.decode(errors='replace')}")
+    return completed.stdout
+
+
+def build_contact_sheets(
+    frames: List[Tuple[float, "object"]],
+    columns: int = DEFAULT_COLUMNS,
+    rows: int = DEFAULT_ROWS,
+) -> List[ContactSheet]:
+    """サムネイルを columns x rows のタイルに並べ、各コマに時刻ラベルを付けて JPEG 化する。"""
+    numpy = require_numpy()
+    if not frames:
+        return []
+    th, tw = frames[0][1].shape[:2]
+    per_sheet = columns * rows
+    sheets: List[ContactSheet] = []
+    for start in range(0, len(frames), per_sheet):
+        chunk = frames[start:start + per_sheet]
+        used_rows = math.ceil(len(chunk) / columns)
+        sheet = numpy.zeros((used_rows * th, columns * tw, 3), dtype=numpy.uint8)
+        for k, (t, thumb) in enumerate(chunk):
+            r, c = divmod(k, columns)
+            tile = sheet[r * th:(r + 1) * th, c * tw:(c + 1) * tw]
+            tile[:] = thumb
+            _draw_label(tile, format_timecode(t)[:8])
+        sheets.append(ContactSheet(jpeg=_encode_jpeg(sheet), times=[t for t, _ in chunk]))
+    return sheets
+
+
+def frame_token_budget() -> int:
+    """MOVIE2MANUAL_FRAME_TOKEN_BUDGET（画像入力に使う最大トークン数）。0 なら画像を送らない。"""
+    raw = os.getenv("MOVIE2MANUAL_FRAME_TOKEN_BUDGET") or "0"
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        print(f"MOVIE2MANUAL_FRAME_TOKEN_BUDGET が不正です（無効化します）: {raw}", file=sys.stderr)
+        return 0
+
+
+def frame_sampling_variant() -> str:
+    """コンタクトシートの有無・予算・レイアウトを応答キャッシュのキーに含める文字列（画像を送らないなら空文字）。"""
+    budget = frame_token_budget()
+    if budget <= 0:
+        return ""
+    return f"frames{budget}_{DEFAULT_COLUMNS}x{DEFAULT_ROWS}_w{DEFAULT_THUMB_WIDTH}_fps{DEFAULT_SAMPLE_FPS:g}"
+
+
+def sample_contact_sheets(
+    video: str,
+    token_budget: int,
+    columns: int = DEFAULT_COLUMNS,
+    rows: int = DEFAULT_ROWS,
+    thumb_width: int = DEFAULT_THUMB_WIDTH,
+    sample_fps: float = DEFAULT_SAMPLE_FPS,
+) -> List[ContactSheet]:
+    """トークン予算に収まる枚数のコンタクトシートを作る（シート数 = 予算 / 1 枚あたりの見積もり）。"""
+    width, height = scaled_size(probe_video(video), thumb_width)
+    per_sheet_tokens = estimate_image_tokens(columns * width, rows * height)
+    sheet_count = token_budget // per_sheet_tokens
+    if sheet_count < 1:
+        return []
+    frames = select_scene_frames(video, sheet_count * columns * rows, thumb_width, sample_fps)
+    sheets = build_contact_sheets(frames, columns, rows)
+    print(
+        f"コンタクトシートを作成しました: {len(sheets)} 枚 / {len(frames)} コマ"
+        f"（約 {len(sheets) * per_sheet_tokens} トークン）",
+        file=sys.stderr,
+    )
+    return sheets
+
+
+FRAME_NOTE = (
+    "添付画像は、動画から場面転換ごとに抽出したフレームを時刻順に並べたコンタクトシートです。"
+    "各コマ左上の HH:MM:SS が動画内の時刻です。screenshots[].time はこの時刻を基準に指定してください。"
+)
+
+
+def openai_user_content(prompt: str, sheets: List[ContactSheet]) -> Union[str, List[Dict[str, Any]]]:
+    """Chat Completions の user メッセージ content を作る（シートがなければ従来どおり文字列）。"""
+    if not sheets:
+        return prompt
+    content: List[Dict[str, Any]] = [{"type": "text", "text": prompt + "\n" + FRAME_NOTE}]
+    for sheet in sheets:
+        content.append({"type": "image_url", "image_url": {"url": sheet.data_url(), "detail": "high"}})
+    return content
+
+
+def sample_for_prompt(video: str) -> List[ContactSheet]:
+    """MOVIE2MANUAL_FRAME_TOKEN_BUDGET が設定されていればコンタクトシートを作る（未設定なら空）。
+
+    同じ動画（パス・サイズ・更新時刻）と予算のシートは直近 SHEET_MEMO_LIMIT 件まで再利用する
+    （ヘッジで別の OpenAI 互換プロバイダへ送る場合も動画をデコードし直さない）。
+    """
+    budget = frame_token_budget()
+    if budget <= 0 or not os.path.exists(video):
+        return []
+    st = os.stat(video)
+    key = (os.path.abspath(video), st.st_size, st.st_mtime_ns, budget)
+    with _SHEET_MEMO_LOCK:
+        if key in _SHEET_MEMO:
+            _SHEET_MEMO.move_to_end(key)
+            return _SHEET_MEMO[key]
+    sheets = sample_contact_sheets(video, budget)
+    with _SHEET_MEMO_LOCK:
+        _SHEET_MEMO[key] = sheets
+        while len(_SHEET_MEMO) > SHEET_MEMO_LIMIT:
+            _SHEET_MEMO.popitem(last=False)
+    return sheets
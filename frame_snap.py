@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import dataclasses
+import sys
+from typing import List, Tuple
+
+from extract_screenshot import ScreenshotSpec, format_timecode, parse_timecode
+from video_frames import iter_frame_windows, probe_video, require_numpy, scaled_size
+
+
+# 指定時刻の前後 SNAP_WINDOW 秒を SNAP_SAMPLE_FPS で調べ、最も安定したフレームへ時刻を寄せる
+SNAP_WINDOW = 1.0
+SNAP_SAMPLE_FPS = 10.0
+SNAP_WIDTH = 320
+# 動き（前後フレームとの平均絶対差, 0〜255）が窓内の最小値 + この値以下なら「静止」とみなす
+MOTION_TOLERANCE = 0.5
+# 静止フレームのうち、鮮鋭度が最大値のこの割合以上のものから指定時刻に最も近いものを選ぶ
+SHARPNESS_RATIO = 0.9
+
+
+def score_window(frames: "object") -> Tuple["object", "object"]:
+    """区間内の各フレームの (動き, 鮮鋭度) を NumPy でまとめて計算する。
+
+    動きは前後のフレームとの平均絶対差の大きい方、鮮鋭度はラプラシアンの分散。
+    """
+    numpy = require_numpy()
+    x = frames.astype(numpy.float32)
+    if len(x) > 1:
+        d = numpy.abs(x[1:] - x[:-1]).mean(axis=(1, 2))
+        motion = numpy.maximum(numpy.concatenate([d[:1], d]), numpy.concatenate([d, d[-1:]]))
+    else:
+        motion = numpy.zeros(len(x), dtype=numpy.float32)
+    lap = (
+        4 * x[:, 1:-1, 1:-1]
+        - x[:, :-2, 1:-1] - x[:, 2:, 1:-1]
+        - x[:, 1:-1, :-2] - x[:, 1:-1, 2:]
+    )
+    sharpness = lap.reshape(len(x), -1).var(axis=1)
+    return motion, sharpness
+
+
+def pick_stable_time(times: "object", frames: "object", requested: float) -> float:
+    """区間内で動きが最小に近く、鮮鋭度が高いフレームのうち requested に最も近い時刻を返す。"""
+    numpy = require_numpy()
+    motion, sharpness = score_window(frames)
+    still = motion <= motion.min() + MOTION_TOLERANCE
+    sharp = sharpness >= SHARPNESS_RATIO * sharpness[still].max()
+    candidates = numpy.flatnonzero(still & sharp)
+    best = candidates[numpy.argmin(numpy.abs(times[candidates] - requested))]
+    return float(times[best])
+
+
+def snap_screenshots(
+    video: str,
+    screenshots: List[ScreenshotSpec],
+    window: float = SNAP_WINDOW,
+    sample_fps: float = SNAP_SAMPLE_FPS,
+    width: int = SNAP_WIDTH,
+) -> List[ScreenshotSpec]:
+    """各 ScreenshotSpec の時刻を、前後 window 秒の中で最も安定したフレームへ移した新しいリストを返す。
+
+    全スクリーンショットの区間は video_frames.iter_frame_windows で 1 回の ffmpeg 起動にまとめてデコードする。
+    場面検出に失敗した場合は警告を出して元の時刻のまま返す（補正は任意の後処理のため）。
+    """
+    shots = list(screenshots or [])
+    if not shots:
+        return shots
+    try:
+        info = probe_video(video)
+        w, h = scaled_size(info, width)
+        count = int(round(2 * window * sample_fps)) + 1
+        latest = max(0.0, info.duration - (count + 1) / sample_fps) if info.duration else None
+        requested = [parse_timecode(s.time) for s in shots]
+        starts = [max(0.0, t - window) for t in requested]
+        if latest is not None:
+            starts = [min(s, latest) for s in starts]
+        snapped = list(requested)
+        windows = iter_frame_windows(video, starts, count, sample_fps, w, h)
+        for i, (times, frames) in enumerate(windows):
+            snapped[i] = pick_stable_time(times, frames, requested[i])
+    except Exception as e:
+        print(f"時刻の補正に失敗しました（指定時刻のまま抽出します）: {e}", file=sys.stderr)
+        return shots
+
+    result: List[ScreenshotSpec] = []
+    for shot, before, after in zip(shots, requested, snapped):
+        if abs(after - before) < 0.5 / sample_fps:
+            result.append(shot)
+            continue
+        print(
+            f"時刻を補正しました: {shot.filename} {format_timecode(before)} -> {format_timecode(after)}",
+            file=sys.stderr,
+        )
+        result.append(dataclasses.replace(shot, time=format_timecode(after)))
+    return result
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from google import genai
+from google.genai import types
+
+
+# inline_data で送る上限（これを超える動画は Files API へアップロードして URI で参照する）
+# Gemini のリクエストサイズ上限（約 20MB）に余裕を持たせた値
+DEFAULT_INLINE_MAX_BYTES = 16 * 1024 * 1024
+
+
+def inline_max_bytes() -> int:
+    """GEMINI_INLINE_MAX_BYTES で inline 送信の上限を上書きできる（0 なら常にアップロード）。"""
+    raw = os.getenv("GEMINI_INLINE_MAX_BYTES")
+    if raw is None or raw.strip() == "":
+        return DEFAULT_INLINE_MAX_BYTES
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        print(f"GEMINI_INLINE_MAX_BYTES が不正です（既定値を使用）: {raw}", file=sys.stderr)
+        return DEFAULT_INLINE_MAX_BYTES
+
+
+def upload_video_file(
+    client: genai.Client,
+    video_file_name: Union[str, Path],
+    mime_type: str = "video/mp4",
+    poll_interval: float = 2.0,
+    timeout: float = 600.0,
+) -> types.File:
+    """Files API へ動画をアップロードし、処理完了（ACTIVE）まで待つ。
+
+    SDK の resumable upload はファイルを固定長チャンクで読み出して送信するため、
+    動画サイズに関わらずメモリ使用量は一定に保たれる。
+    """
+    uploaded = client.files.upload(
+        file=str(video_file_name),
+        config=types.UploadFileConfig(mime_type=mime_type),
+    )
+    deadline = time.monotonic() + timeout
+    while uploaded.state == types.FileState.PROCESSING:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"動画ファイルの処理待ちがタイムアウトしました: {uploaded.name}")
+        time.sleep(poll_interval)
+        uploaded = client.files.get(name=uploaded.name)
+    if uploaded.state == types.FileState.FAILED:
+        raise RuntimeError(f"動画ファイルの処理に失敗しました: {uploaded.name} ({uploaded.error})")
+    return uploaded
+
+
+@contextmanager
+def video_part(
+    client: genai.Client,
+    video_file_name: Union[str, Path],
+    mime_type: str = "video/mp4",
+    max_inline_bytes: Optional[int] = None,
+) -> Iterator[types.Part]:
+    """動画を generate_content に渡す Part を用意する。
+
+    上限以下なら従来どおり inline_data、超える場合は Files API にアップロードして file_data(URI) で参照する。
+    アップロードしたファイルは with ブロックを抜ける際に削除する。
+    """
+    limit = inline_max_bytes() if max_inline_bytes is None else max_inline_bytes
+    size = Path(video_file_name).stat().st_size
+    if size <= limit:
+        print(f"動画を inline で送信します（{size / 1024 / 1024:.1f} MB）", file=sys.stderr)
+        with open(video_file_name, "rb") as f:
+            yield types.Part(inline_data=types.Blob(data=f.read(), mime_type=mime_type))
+        return
+
+    print(f"動画をアップロードしています（{size / 1024 / 1024:.1f} MB）...", file=sys.stderr)
+    started = time.monotonic()
+    uploaded = upload_video_file(client, video_file_name, mime_type=mime_type)
+    print(f"アップロード完了（{time.monotonic() - started:.1f}s）", file=sys.stderr)
+    try:
+        yield types.Part(file_data=types.FileData(file_uri=uploaded.uri, mime_type=uploaded.mime_type or mime_type))
+    finally:
+        try:
+            client.files.delete(name=uploaded.name)
+        except Exception as e:
+            print(f"アップロード済みファイルの削除に失敗しました: {uploaded.name} ({e})", file=sys.stderr)
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+
+# 波括弧の対応だけを追うときに意味を持つ文字（それ以外は正規表現で読み飛ばす）
+_STRUCTURAL = re.compile(r'[{}"\\]')
+# strict=False: 文字列中の生改行・タブ等の制御文字をそのまま受け付ける（LLM 応答で頻出）
+_DECODER = json.JSONDecoder(strict=False)
+
+
+def _skip_object(text: str, pos: int) -> int:
+    """text[pos] の '{' に対応する '}' の直後の位置を返す（閉じていなければ -1）。"""
+    depth = 0
+    in_string = False
+    i = pos
+    while True:
+        m = _STRUCTURAL.search(text, i)
+        if m is None:
+            return -1
+        j = m.start()
+        ch = text[j]
+        i = j + 1
+        if in_string:
+            if ch == "\\":
+                i = j + 2  # エスケープされた次の文字は読み飛ばす
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+
+
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """LLM 応答から最初に JSON として解釈できる最外側のオブジェクトを取り出す。
+
+    全文 JSON・```json フェンス・前後に説明文が付いた応答を、先頭から 1 回の前方走査で扱う。
+    各 '{' から raw_decode（C 実装）で読み、文字列中の生改行は strict=False で受理、\\r は事前に除去する。
+    解釈できない {...}（説明文中の波括弧など）は対応する '}' まで読み飛ばし、
+    その内側のオブジェクト（screenshots の要素など）を誤って返さないようにする。
+    閉じていない '{' の後にコードフェンスがあれば、フェンスの中から走査を続ける。
+    """
+    if not text:
+        return None
+    if "\r" in text:
+        text = text.replace("\r", "")
+    pos = text.find("{")
+    while pos != -1:
+        try:
+            obj, end = _DECODER.raw_decode(text, pos)
+        except ValueError:
+            end = _skip_object(text, pos)
+            if end == -1:
+                # 閉じていない '{'（説明文中の波括弧、または途中で切れたオブジェクト）。
+                # 後ろにコードフェンスがあればその中から読み直し、なければ諦める
+                fence = text.find("```", pos)
+                if fence == -1:
+                    return None
+                end = fence + 3
+        else:
+            if isinstance(obj, dict):
+                return obj
+        pos = text.find("{", end)
+    return None
+
+
+# ストリーミング応答用: 区切り文字（キー・値・要素の境界）も追う
+_STREAM_STRUCTURAL = re.compile(r'[{}\[\]"\\:,]')
+
+
+class StreamingSpecParser:
+    """LLM のストリーミング応答を少しずつ受け取り、完成した部分から取り出す増分パーサー。
+
+    - 最外側オブジェクト直下の文字列値（video / output_dir など）を fields に記録する
+    - array_key（既定 "screenshots"）配列の要素オブジェクトが閉じた時点で feed() の戻り値として返す
+
+    前置き文中の波括弧などで構造を追えなくなった場合は何も返さないだけで、
+    最終的な解釈は完成した全文に対する extract_json_object に任せる前提。
+    """
+
+    def __init__(self, array_key: str = "screenshots") -> None:
+        self.array_key = array_key
+        self.fields: Dict[str, Any] = {}
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._string_start = -1
+        self._key: Optional[str] = None
+        self._expect_value = False
+        self._array_depth: Optional[int] = None
+        self._element_start = -1
+
+    def feed(self, chunk: str) -> list:
+        """chunk を追加し、新たに完成した配列要素（dict）のリストを返す。"""
+        self._buf += chunk.replace("\r", "")
+        completed = []
+        buf = self._buf
+        i = self._pos
+        while True:
+            m = _STREAM_STRUCTURAL.search(buf, i)
+            if m is None:
+                i = len(buf)
+                break
+            j = m.start()
+            ch = buf[j]
+            if self._in_string:
+                if ch == "\\":
+                    if j + 1 >= len(buf):
+                        i = j  # エスケープ対象の文字が次のチャンクに来るまで待つ
+                        break
+                    i = j + 2
+                    continue
+                if ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._on_top_level_string(buf[self._string_start:j + 1])
+                i = j + 1
+                continue
+            i = j + 1
+            if ch == '"':
+                self._in_string = True
+                self._string_start = j
+            elif ch in "{[":
+                if (
+                    ch == "["
+                    and self._depth == 1
+                    and self._expect_value
+                    and self._key == self.array_key
+                ):
+                    self._array_depth = self._depth + 1
+                if ch == "{" and self._array_depth is not None and self._depth == self._array_depth:
+                    self._element_start = j
+                if self._depth == 1:
+                    self._expect_value = False
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if (
+                    ch == "}"
+                    and self._array_depth is not None
+                    and self._depth == self._array_depth
+                    and self._element_start != -1
+                ):
+                    try:
+                        element = _DECODER.decode(buf[self._element_start:j + 1])
+                    except ValueError:
+                        element = None
+                    if isinstance(element, dict):
+                        completed.append(element)
+                    self._element_start = -1
+                if ch == "]" and self._array_depth is not None and self._depth == self._array_depth - 1:
+                    self._array_depth = None
+            elif ch == ":" and self._depth == 1:
+                self._expect_value = True
+            elif ch == "," and self._depth == 1:
+                self._expect_value = False
+                self._key = None
+        self._pos = i
+        return completed
+
+    def _on_top_level_string(self, literal: str) -> None:
+        try:
+            value = _DECODER.decode(literal)
+        except ValueError:
+            return
+        if self._expect_value:
+            if self._key is not None:
+                self.fields[self._key] = value
+            self._expect_value = False
+        else:
+            self._key = value
+
+    @property
+    def text(self) -> str:
+        return self._buf
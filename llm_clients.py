@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+
+# HTTP 接続プールの既定値（1 クライアントあたり）
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    max_connections: int = DEFAULT_MAX_CONNECTIONS
+    max_keepalive: int = DEFAULT_MAX_KEEPALIVE
+    keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=min(self.max_keepalive, self.max_connections),
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+def pool_settings_from_env() -> PoolSettings:
+    """MOVIE2MANUAL_HTTP_MAX_CONNECTIONS / _MAX_KEEPALIVE / _KEEPALIVE_EXPIRY で既定値を上書きできる。"""
+    values: Dict[str, Any] = {}
+    for name, attr, cast in (
+        ("MOVIE2MANUAL_HTTP_MAX_CONNECTIONS", "max_connections", int),
+        ("MOVIE2MANUAL_HTTP_MAX_KEEPALIVE", "max_keepalive", int),
+        ("MOVIE2MANUAL_HTTP_KEEPALIVE_EXPIRY", "keepalive_expiry", float),
+    ):
+        raw = os.getenv(name)
+        if raw is None or raw.strip() == "":
+            continue
+        try:
+            values[attr] = max(1, cast(raw)) if cast is int else max(0.0, cast(raw))
+        except ValueError:
+            print(f"{name} が不正です（既定値を使用）: {raw}", file=sys.stderr)
+    return replace(PoolSettings(), **values)
+
+
+def _key_hash(api_key: Optional[str]) -> str:
+    # レジストリのキーや表示に API キーそのものを残さない
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _build_gemini_client(api_key: str, pool: PoolSettings) -> Any:
+    from google import genai
+    from google.genai import types
+
+    try:
+        # 新しめの google-genai は client_args を内部の httpx.Client にそのまま渡す
+        return genai.Client(api_key=api_key, http_options=types.HttpOptions(client_args={"limits": pool.limits()}))
+    except (TypeError, ValueError, AttributeError):
+        return genai.Client(api_key=api_key)
+
+
+def _build_openai_client(api_key: str, base_url: Optional[str], pool: PoolSettings) -> Any:
+    from openai import DefaultHttpxClient, OpenAI
+
+    # DefaultHttpxClient は SDK 既定のタイムアウト・リダイレクト設定を保ったまま limits だけ差し替える
+    http_client = DefaultHttpxClient(limits=pool.limits())
+    # リトライは llm_scheduler が Retry-After・レート制限と合わせて行うため、SDK 側では行わない
+    if base_url:
+        return OpenAI(api_key=api_key or "", base_url=base_url, http_client=http_client, max_retries=0)
+    return OpenAI(api_key=api_key or "", http_client=http_client, max_retries=0)
+
+
+RegistryKey = Tuple[str, str, str]  # (provider, base_url, API キーのハッシュ)
+
+
+class ClientRegistry:
+    """プロセス内で SDK クライアント（= HTTP 接続プール）を共有するレジストリ。
+
+    (provider, base_url, API キーのハッシュ) ごとに 1 つのクライアントを作って使い回すため、
+    リクエストごとの TLS ハンドシェイク・接続確立を省ける（keep-alive 接続はプール内で再利用される）。
+    同じ (provider, base_url) で API キーが変わった場合（ローテーション）は古いクライアントを破棄して作り直す。
+    """
+
+    def __init__(self, pool: Optional[PoolSettings] = None):
+        self._pool = pool
+        self._clients: Dict[RegistryKey, Any] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+
+    @property
+    def pool(self) -> PoolSettings:
+        return self._pool or pool_settings_from_env()
+
+    def get(self, provider: str, api_key: Optional[str], base_url: Optional[str] = None) -> Any:
+        key: RegistryKey = (provider, base_url or "", _key_hash(api_key))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                return client
+            # 同じ接続先で別のキーのクライアントが残っていれば、ローテーション前のものとして破棄する
+            for stale in [k for k in self._clients if k[:2] == key[:2]]:
+                self._discard(stale)
+            if provider == "gemini":
+                client = _build_gemini_client(api_key or "", self.pool)
+            else:
+                client = _build_openai_client(api_key or "", base_url, self.pool)
+            self._clients[key] = client
+            self.created += 1
+            return client
+
+    def refresh(self, provider: Optional[str] = None) -> int:
+        """クライアントを破棄し、次回の get で作り直させる（provider 指定時はそのプロバイダのみ）。破棄した数を返す。
+
+        認証情報の更新時や接続先の DNS 変更時に呼ぶ。実行中のリクエストは破棄前のクライアントで完了する。
+        """
+        with self._lock:
+            keys = [k for k in self._clients if provider is None or k[0] == provider]
+            for k in keys:
+                self._discard(k)
+            return len(keys)
+
+    def _discard(self, key: RegistryKey) -> None:
+        # 他のスレッドが使用中の可能性があるため close() はせず、参照が外れた時点で GC に閉じさせる
+        self._clients.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+
+_REGISTRY = ClientRegistry()
+
+
+def get_client(provider: str, api_key: Optional[str], base_url: Optional[str] = None) -> Any:
+    """プロセス共有のレジストリから provider 用のクライアントを返す（なければ作る）。"""
+    return _REGISTRY.get(provider, api_key, base_url)
+
+
+def refresh_clients(provider: Optional[str] = None) -> int:
+    """プロセス共有のクライアントを作り直させる（認証情報のローテーション時など）。"""
+    return _REGISTRY.refresh(provider)
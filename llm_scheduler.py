@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import email.utils
+import os
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# 既定: 最大 4 回リトライ、待ち時間は 1s から倍々（上限 60s）の範囲でジッター付き、同時実行 8、レート制限なし
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+DEFAULT_MAX_IN_FLIGHT = 8
+
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+
+@dataclass
+class SchedulerSettings:
+    max_retries: int = DEFAULT_MAX_RETRIES
+    backoff_base: float = DEFAULT_BACKOFF_BASE
+    backoff_max: float = DEFAULT_BACKOFF_MAX
+    requests_per_minute: float = 0.0  # provider/model ごと。0 ならレート制限しない
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT  # provider/model ごとの同時実行数
+
+
+def scheduler_settings_from_env() -> SchedulerSettings:
+    """MOVIE2MANUAL_LLM_MAX_RETRIES / _BACKOFF_BASE / _BACKOFF_MAX / _RPM / _MAX_IN_FLIGHT で既定値を上書きできる。"""
+    settings = SchedulerSettings()
+    for name, attr, cast in (
+        ("MOVIE2MANUAL_LLM_MAX_RETRIES", "max_retries", int),
+        ("MOVIE2MANUAL_LLM_BACKOFF_BASE", "backoff_base", float),
+        ("MOVIE2MANUAL_LLM_BACKOFF_MAX", "backoff_max", float),
+        ("MOVIE2MANUAL_LLM_RPM", "requests_per_minute", float),
+        ("MOVIE2MANUAL_LLM_MAX_IN_FLIGHT", "max_in_flight", int),
+    ):
+        raw = os.getenv(name)
+        if raw is None or raw.strip() == "":
+            continue
+        try:
+            setattr(settings, attr, max(0, cast(raw)))
+        except ValueError:
+            print(f"{name} が不正です（既定値を使用）: {raw}", file=sys.stderr)
+    settings.max_in_flight = max(1, settings.max_in_flight)
+    return settings
+
+
+@dataclass
+class LLMCallStats:
+    """1 件の処理（動画 1 本など）で行った LLM 呼び出しの集計。分割解析の並行呼び出しからも加算できる。"""
+
+    calls: int = 0
+    attempts: int = 0
+    retries: int = 0
+    backoff_seconds: float = 0.0  # リトライ前の待ち時間（Retry-After を含む）
+    throttle_seconds: float = 0.0  # レート制限・同時実行数の上限による待ち時間
+    errors: List[str] = field(default_factory=list)  # リトライした失敗の要約
+    answered_by: str = ""  # 応答を採用した provider/model（provider_fallback）
+    fallbacks: int = 0  # 採用した応答が chain の何番目か（0 = 先頭）
+    hedged: int = 0  # 期限切れでフォールバック先へも並行して送った回数
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, **deltas: float) -> None:
+        with self._lock:
+            for name, value in deltas.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def note_error(self, message: str) -> None:
+        with self._lock:
+            self.errors.append(message)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "wait_seconds": round(self.backoff_seconds + self.throttle_seconds, 3),
+                "backoff_seconds": round(self.backoff_seconds, 3),
+                "throttle_seconds": round(self.throttle_seconds, 3),
+                "errors": list(self.errors[-5:]),
+                "answered_by": self.answered_by or None,
+                "fallbacks": self.fallbacks,
+                "hedged": self.hedged,
+            }
+
+    def summary(self) -> str:
+        d = self.as_dict()
+        return f"リトライ {d['retries']} 回、待ち {d['wait_seconds']:.1f}s（バックオフ {d['backoff_seconds']:.1f}s）"
+
+
+class TokenBucket:
+    """requests_per_minute の平均レートで、最大 burst 件まで連続で通すトークンバケット。"""
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """トークンを 1 つ取る（足りない・一時停止中なら待つ）。待った秒数を返す。"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self.paused_until - now
+                if delay <= 0:
+                    if self.rate <= 0:
+                        return waited
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        return waited
+                    delay = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """Retry-After を受けたら、同じ provider/model の後続リクエストもその間は送らない。"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def status_code_of(error: BaseException) -> Optional[int]:
+    """SDK の例外から HTTP ステータスを取り出す（openai: status_code / google-genai: code）。"""
+    for attr in ("status_code", "code", "status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def retry_after_of(error: BaseException) -> Optional[float]:
+    """レスポンスヘッダの Retry-After（秒 または HTTP-date）/ retry-after-ms を秒で返す。"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        raw_ms = headers.get("retry-after-ms")
+        if raw_ms:
+            return max(0.0, float(raw_ms) / 1000.0)
+        raw = headers.get("retry-after")
+        if not raw:
+            return None
+        try:
+            return max(0.0, float(raw))
+        except ValueError:
+            when = email.utils.parsedate_to_datetime(raw)
+            return max(0.0, when.timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """429 / 5xx / タイムアウト・接続エラーはリトライする（400 や認証エラーはしない）。"""
+    status = status_code_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # httpx / openai / google-genai の接続・タイムアウト系の例外（SDK を import せずに判定する）
+    name = type(error).__name__
+    return any(word in name for word in ("Timeout", "Connection", "Transport", "RemoteProtocol"))
+
+
+class LLMScheduler:
+    """LLM 呼び出しを provider/model ごとのトークンバケットと同時実行数の上限で流し、失敗時はリトライする。
+
+    リトライの待ち時間は指数バックオフ（full jitter）。Retry-After があればそれ以上待ち、
+    同じ provider/model の後続リクエストもその間は止める。
+    """
+
+    def __init__(self, settings: Optional[SchedulerSettings] = None):
+        self._settings = settings
+        self._limits: Dict[Tuple[str, str], Tuple[TokenBucket, threading.BoundedSemaphore]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def settings(self) -> SchedulerSettings:
+        return self._settings or scheduler_settings_from_env()
+
+    def _limit(self, provider: str, model: str) -> Tuple[TokenBucket, threading.BoundedSemaphore]:
+        with self._lock:
+            if (provider, model) not in self._limits:
+                s = self.settings
+                self._limits[(provider, model)] = (
+                    TokenBucket(s.requests_per_minute, burst=s.max_in_flight),
+                    threading.BoundedSemaphore(s.max_in_flight),
+                )
+            return self._limits[(provider, model)]
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        s = self.settings
+        delay = random.uniform(0, min(s.backoff_max, s.backoff_base * (2 ** attempt)))
+        retry_after = retry_after_of(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, s.backoff_max))
+        return delay
+
+    def _wait_before_retry(
+        self, provider: str, model: str, attempt: int, error: BaseException, stats: Optional[LLMCallStats]
+    ) -> None:
+        """リトライできない失敗・回数切れならそのまま投げ、そうでなければバックオフ分待つ。"""
+        max_retries = self.settings.max_retries
+        if attempt >= max_retries or not is_retryable(error):
+            raise error
+        delay = self.backoff(attempt, error)
+        if retry_after_of(error) is not None:
+            self._limit(provider, model)[0].pause(delay)
+        summary = f"{status_code_of(error) or type(error).__name__}: {str(error)[:120]}"
+        print(
+            f"LLM 呼び出しに失敗しました（{provider}/{model}, {summary}）。{delay:.1f}s 後に再試行します"
+            f"（{attempt + 1}/{max_retries}）",
+            file=sys.stderr,
+        )
+        if stats is not None:
+            stats.add(retries=1, backoff_seconds=delay)
+            stats.note_error(summary)
+        time.sleep(delay)
+
+    def _acquire(self, provider: str, model: str, stats: Optional[LLMCallStats]) -> threading.BoundedSemaphore:
+        bucket, slots = self._limit(provider, model)
+        started = time.monotonic()
+        slots.acquire()
+        bucket.acquire()
+        if stats is not None:
+            stats.add(attempts=1, throttle_seconds=time.monotonic() - started)
+        return slots
+
+    def call(self, provider: str, model: str, fn: Callable[[], T], stats: Optional[LLMCallStats] = None) -> T:
+        """fn() をレート制限・同時実行数の上限の下で実行し、リトライ可能な失敗なら待って再実行する。"""
+        if stats is not None:
+            stats.add(calls=1)
+        attempt = 0
+        while True:
+            slots = self._acquire(provider, model, stats)
+            try:
+                return fn()
+            except Exception as e:
+                error = e
+            finally:
+                slots.release()
+            self._wait_before_retry(provider, model, attempt, error, stats)
+            attempt += 1
+
+    def stream(
+        self, provider: str, model: str, make: Callable[[], Iterator[str]], stats: Optional[LLMCallStats] = None
+    ) -> Iterator[str]:
+        """ストリーミング版。最初の断片を受け取るまでの失敗だけをリトライする（途中からの再送はしない）。"""
+        if stats is not None:
+            stats.add(calls=1)
+        attempt = 0
+        while True:
+            slots = self._acquire(provider, model, stats)
+            started = False
+            try:
+                for piece in make():
+                    started = True
+                    yield piece
+                return
+            except Exception as e:
+                if started:
+                    raise
+                error = e
+            finally:
+                slots.release()
+            self._wait_before_retry(provider, model, attempt, error, stats)
+            attempt += 1
+
+
+_SCHEDULER = LLMScheduler()
+
+
+def scheduled_call(provider: str, model: str, fn: Callable[[], T], stats: Optional[LLMCallStats] = None) -> T:
+    """プロセス共有のスケジューラで fn() を実行する。"""
+    return _SCHEDULER.call(provider, model, fn, stats)
+
+
+def scheduled_stream(
+    provider: str, model: str, make: Callable[[], Iterator[str]], stats: Optional[LLMCallStats] = None
+) -> Iterator[str]:
+    """プロセス共有のスケジューラでストリーミング呼び出しを行う。"""
+    return _SCHEDULER.stream(provider, model, make, stats)
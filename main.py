@@ -1,17 +1,39 @@
 from google import genai
 from google.genai import types
-import json
-import re
 import sys
 import os
+import time
 import argparse
+import json
 from pathlib import Path
-from contextlib import redirect_stdout
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from openai import OpenAI  # OpenAI 互換APIや Ollama の OpenAI互換エンドポイントで使用
-from extract_screenshot import ScreenshotSpec, extract_screenshots
+import extract_screenshot
+from extract_screenshot import (
+    OutputOptions,
+    add_output_arguments,
+    file_sha256,
+    output_filename,
+    output_options_from_args,
+)
+from frame_sampling import ContactSheet, openai_user_content, sample_for_prompt
+from gemini_files import video_part
+from json_extract import extract_json_object
+from streaming_generation import ExtractedKey, generate_with_early_extraction
 from pdf_export import convert_markdown_to_pdf
+from scene_detect import scene_hint_for_prompt
+from screenshot_dedup import DEFAULT_DEDUPE_DISTANCE, DEDUPE_MODES
+from response_cache import ResponseCache, cached_generate, generation_variant
+from video_proxy import ProxySettings, llm_video_for, proxy_settings_from_env
+from chunked_generation import DEFAULT_CHUNK_WORKERS, Segment, generate_chunked, segment_prompt_note
+from llm_clients import get_client
+from llm_scheduler import LLMCallStats, scheduled_call, scheduled_stream
+from provider_fallback import fallback_provider_settings, generate_with_fallback, hedging_enabled
+from batch_runner import BatchJob, jsonl_writer, load_batch_jobs, run_batch
+from staged_pipeline import DEFAULT_QUEUE_SIZE, Stage, format_metrics
+from pipeline_checkpoint import Checkpoint
+from manual_spec import Spec, handle_response_and_extract
 
 try:
     from dotenv import load_dotenv  # type: ignore
@@ -95,13 +117,21 @@ def get_provider_config() -> ProviderConfig:
 
 
 def create_gemini_client(api_key: str) -> genai.Client:
-    return genai.Client(api_key=api_key)
+    # プロセス共有のクライアント（接続プール）を返す。API キーが変われば作り直される
+    return get_client("gemini", api_key)
+
 
+def create_openai_compatible_client(api_key: str, base_url: Optional[str], provider: str = "openai") -> OpenAI:
+    return get_client(provider, api_key or "", base_url)
 
-def create_openai_compatible_client(api_key: str, base_url: Optional[str]) -> OpenAI:
-    if base_url:
-        return OpenAI(api_key=api_key or "", base_url=base_url)
-    return OpenAI(api_key=api_key or "")
+
+def create_client(cfg: ProviderConfig) -> Any:
+    """ProviderConfig に応じた SDK クライアントを返す（llm_clients のレジストリでプロセス内共有）。"""
+    if cfg.provider == "gemini":
+        if not cfg.api_key:
+            raise RuntimeError("Gemini 用 API キーがありません")
+        return create_gemini_client(cfg.api_key)
+    return create_openai_compatible_client(cfg.api_key or "", cfg.base_url, cfg.provider)
 
 PROMPT_TEMPLATE = """
 あなたは優秀な日本人の動画分析エンジニアです。
@@ -136,24 +166,33 @@ PROMPT_TEMPLATE = """
 
 """
 
-def build_prompt(video_file_name: str) -> str:
+def base_prompt(video_file_name: str) -> str:
+    """ヒントを添える前のプロンプト（応答キャッシュのキーに使う。ヒントの設定は generation_variant でキーに含める）。"""
     return PROMPT_TEMPLATE.replace("{video_file_name}", video_file_name)
 
 
+def build_prompt(
+    video_file_name: str, scene_video: str = "", start: float = 0.0, end: Optional[float] = None
+) -> str:
+    prompt = base_prompt(video_file_name)
+    # MOVIE2MANUAL_SCENE_HINTS が設定されていれば、静止区間の候補時刻を添える
+    # （分割時は元動画 scene_video の検出結果から区間 start〜end の分を使う。検出結果は動画ごとにキャッシュされる）
+    hint = scene_hint_for_prompt(scene_video or video_file_name, start, end)
+    return prompt + "\n" + hint + "\n" if hint else prompt
+
+
 def read_video_bytes(video_file_name: str) -> bytes:
     with open(video_file_name, "rb") as f:
         return f.read()
 
 
-def generate_response_text_gemini(client: genai.Client, video_file_name: str, prompt: str, model_name: str) -> str:
-    video_bytes = read_video_bytes(video_file_name)
+def generate_response_text_gemini(client: genai.Client, part: types.Part, prompt: str, model_name: str) -> str:
+    # part は video_part で用意した動画（大きな動画は Files API 経由。リトライのたびにアップロードし直さない）
     response = client.models.generate_content(
         model=model_name,
         contents=types.Content(
             parts=[
-                types.Part(
-                    inline_data=types.Blob(data=video_bytes, mime_type='video/mp4')
-                ),
+                part,
                 types.Part(text=prompt),
             ]
         ),
@@ -161,144 +200,418 @@ def generate_response_text_gemini(client: genai.Client, video_file_name: str, pr
     return response.text
 
 
-def generate_response_text_openai(client: OpenAI, prompt: str, model_name: str) -> str:
-    # OpenAI互換/Ollama は動画バイト未対応の前提で、テキストのみで生成を依頼
+def generate_response_text_openai(
+    client: OpenAI, prompt: str, model_name: str, sheets: Optional[List[ContactSheet]] = None
+) -> str:
+    # OpenAI互換/Ollama は動画バイト未対応のため、MOVIE2MANUAL_FRAME_TOKEN_BUDGET が設定されていれば
+    # 場面転換フレームのコンタクトシート（画像）を添付し、なければテキストのみで生成を依頼
     completion = client.chat.completions.create(
         model=model_name,
         messages=[
             {"role": "system", "content": "You are a helpful AI that outputs valid JSON only."},
-            {"role": "user", "content": prompt},
+            {"role": "user", "content": openai_user_content(prompt, sheets or [])},
         ],
         # temperature=0.2,
     )
     return completion.choices[0].message.content or ""
 
-# --- 以下: 応答本文からJSONを抽出し、静止画抽出を実行（標準出力は汚さない） ---
+def generate_response_text(
+    cfg: ProviderConfig,
+    video_file_name: str,
+    prompt: str,
+    client: Optional[Any] = None,
+    stats: Optional[LLMCallStats] = None,
+) -> str:
+    """ProviderConfig に応じて Gemini / OpenAI 互換のいずれかで応答本文を生成する。
+
+    client を渡せばそれを使い、省略時は create_client（プロセス共有のクライアント）を使う。
+    呼び出しは llm_scheduler 経由（レート制限・同時実行数の上限・429/5xx のリトライ）で、回数と待ち時間を stats に加算する。
+    """
+    client = client or create_client(cfg)
+    if cfg.provider == "gemini":
+        # 動画の送信準備（アップロードと処理待ち）は 1 回だけ行い、リトライするのはモデルへのリクエストのみ
+        with video_part(client, video_file_name) as part:
+            return scheduled_call(
+                cfg.provider,
+                cfg.model_name,
+                lambda: generate_response_text_gemini(client, part, prompt, cfg.model_name),
+                stats,
+            )
+    # OpenAI互換 / Ollama
+    sheets = sample_for_prompt(video_file_name)  # コンタクトシートもリトライの外で 1 回だけ作る
+    return scheduled_call(
+        cfg.provider,
+        cfg.model_name,
+        lambda: generate_response_text_openai(client, prompt, cfg.model_name, sheets),
+        stats,
+    )
 
-def _extract_json_from_text(text: str):
-    def escape_newlines_in_json_strings(s: str) -> str:
-        result_chars = []
-        in_string = False
-        escape = False
-        for ch in s:
-            if in_string:
-                if escape:
-                    # 次の文字はエスケープとしてそのまま
-                    result_chars.append(ch)
-                    escape = False
-                    continue
-                if ch == "\\":
-                    result_chars.append(ch)
-                    escape = True
-                    continue
-                if ch == "\n":
-                    result_chars.append("\\n")
-                    continue
-                if ch == "\r":
-                    # CRLF の場合は無視（\n 側で処理）
-                    continue
-                if ch == '"':
-                    in_string = False
-                    result_chars.append(ch)
-                    continue
-                result_chars.append(ch)
-            else:
-                if ch == '"':
-                    in_string = True
-                    result_chars.append(ch)
-                else:
-                    result_chars.append(ch)
-        return "".join(result_chars)
-
-    def try_load(candidate: str):
-        # そのまま
-        try:
-            return json.loads(candidate)
-        except Exception:
-            pass
-        # 文字列中の生改行を \n に置換
-        try:
-            return json.loads(escape_newlines_in_json_strings(candidate))
-        except Exception:
-            return None
 
-    # 候補を列挙: 全文 → フェンスjson → フェンス任意 → 波括弧範囲
-    candidates = []
-    candidates.append(text)
+def stream_response_text_gemini(client: genai.Client, part: types.Part, prompt: str, model_name: str) -> Iterator[str]:
+    for chunk in client.models.generate_content_stream(
+        model=model_name,
+        contents=types.Content(parts=[part, types.Part(text=prompt)]),
+    ):
+        if chunk.text:
+            yield chunk.text
+
+
+def stream_response_text_openai(
+    client: OpenAI, prompt: str, model_name: str, sheets: Optional[List[ContactSheet]] = None
+) -> Iterator[str]:
+    stream = client.chat.completions.create(
+        model=model_name,
+        messages=[
+            {"role": "system", "content": "You are a helpful AI that outputs valid JSON only."},
+            {"role": "user", "content": openai_user_content(prompt, sheets or [])},
+        ],
+        stream=True,
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _stream_with_video_part(
+    client: genai.Client, cfg: ProviderConfig, video_file_name: str, prompt: str, stats: Optional[LLMCallStats]
+) -> Iterator[str]:
+    # アップロードした動画はストリームを読み終えるまで残す（リトライは同じ part で行う）
+    with video_part(client, video_file_name) as part:
+        yield from scheduled_stream(
+            cfg.provider,
+            cfg.model_name,
+            lambda: stream_response_text_gemini(client, part, prompt, cfg.model_name),
+            stats,
+        )
+
+
+def stream_response_text(
+    cfg: ProviderConfig,
+    video_file_name: str,
+    prompt: str,
+    client: Optional[Any] = None,
+    stats: Optional[LLMCallStats] = None,
+) -> Iterator[str]:
+    """generate_response_text のストリーミング版（生成された断片を順に返す。リトライは最初の断片を受け取るまで）。"""
+    client = client or create_client(cfg)
+    if cfg.provider == "gemini":
+        return _stream_with_video_part(client, cfg, video_file_name, prompt, stats)
+    sheets = sample_for_prompt(video_file_name)
+    return scheduled_stream(
+        cfg.provider,
+        cfg.model_name,
+        lambda: stream_response_text_openai(client, prompt, cfg.model_name, sheets),
+        stats,
+    )
+
+
+# --- 以下: 応答本文からJSONを抽出（静止画抽出は manual_spec.handle_response_and_extract。標準出力は汚さない） ---
+
+def _extract_json_from_text(text: str):
+    # 全文 / コードフェンス / 前後に説明文付き のいずれも 1 回の前方走査で抽出（文字列中の生改行も修復）
+    return extract_json_object(text)
+
+
+def provider_chain(cfg: ProviderConfig) -> List[ProviderConfig]:
+    """cfg（LLM_PROVIDER）の後に LLM_FALLBACK_PROVIDERS の設定を順に並べたリスト（同じ provider/model は除く）。"""
+    chain = [cfg]
+    for settings in fallback_provider_settings():
+        fallback = ProviderConfig(**settings)
+        if all((c.provider, c.model_name) != (fallback.provider, fallback.model_name) for c in chain):
+            chain.append(fallback)
+    return chain
+
+
+def generate_for_video(
+    cfg: ProviderConfig,
+    video: str,
+    args: argparse.Namespace,
+    output: Optional[OutputOptions] = None,
+    client: Optional[Any] = None,
+    cache: Optional[ResponseCache] = None,
+    stats: Optional[LLMCallStats] = None,
+    output_dir: str = "",
+) -> Tuple[str, Dict[ExtractedKey, str]]:
+    """1 本の動画について LLM 応答を得る（キャッシュ・プロキシ・分割・ストリーミングの各オプションに従う）。
+
+    戻り値は (応答本文, ストリーミング中に先行抽出したスクリーンショットの {キー: 抽出した時刻})。
+    client を渡すと、その SDK クライアントを使い回す（バッチモード）。stats にはリトライ回数・待ち時間を加算する。
+    output_dir は spec の output_dir より優先する出力先（先行抽出もここへ書く。handle_response_and_extract と同じ値を渡す）。
+    """
+    prompt = base_prompt(video)  # キャッシュのキー（ヒントは LLM を呼ぶときだけ付ける）
+    early: Dict[ExtractedKey, str] = {}
+
+    # 動画バイトを送るのは Gemini のみ。プロキシは LLM 入力にだけ使い、抽出は元動画から行う
+    proxy = proxy_settings_from_env() or (ProxySettings() if args.proxy else None)
+    if cfg.provider != "gemini":
+        proxy = None
+
+    # LLM_FALLBACK_PROVIDERS があれば失敗時（--hedge / LLM_HEDGE=1 なら p95 超過時も）に順に切り替える
+    chain = provider_chain(cfg)
+    hedge = args.hedge or hedging_enabled()
+
+    # フォールバック先が答えた応答は先頭の provider/model のキャッシュとして保存しない
+    fallback_answers: List[ProviderConfig] = []
+
+    def ask(providers: List[ProviderConfig], llm_video: str, llm_prompt: str) -> str:
+        text, answered = generate_with_fallback(
+            providers,
+            lambda c: generate_response_text(
+                c, llm_video, llm_prompt, client=client if c is cfg else None, stats=stats
+            ),
+            hedge=hedge,
+            stats=stats,
+        )
+        if answered is not cfg:
+            fallback_answers.append(answered)
+        return text
 
-    fence_json = re.compile(r"```json\s*(\{[\s\S]*?\})\s*```", re.IGNORECASE)
-    candidates += fence_json.findall(text)
+    def analyse_segment(segment: Segment) -> str:
+        segment_prompt = build_prompt(segment.path, video, segment.start, segment.end)
+        return ask(chain, segment.path, segment_prompt + segment_prompt_note(segment))
 
-    fence_any = re.compile(r"```\s*(\{[\s\S]*?\})\s*```", re.IGNORECASE)
-    candidates += fence_any.findall(text)
+    def generate() -> str:
+        llm_video = llm_video_for(video, proxy)
+        started = time.perf_counter()
+        try:
+            if args.chunk_minutes > 0:
+                # 分割はプロキシ（あれば）に対して行い、時刻は元動画と共通
+                text = generate_chunked(
+                    llm_video, analyse_segment, args.chunk_minutes * 60, args.chunk_workers, spec_video=video
+                )
+                if text is not None:
+                    return text
+            # 場面検出のヒントはキャッシュに無かった場合だけ付ける（検出結果も動画ごとにキャッシュ）
+            full_prompt = build_prompt(video)
+            if not args.stream:
+                return ask(chain, llm_video, full_prompt)
+            try:
+                text, extracted = generate_with_early_extraction(
+                    stream_response_text(cfg, llm_video, full_prompt, client=client, stats=stats),
+                    video,
+                    snap=args.snap,
+                    output=output,
+                    output_dir=output_dir,
+                )
+            except Exception as e:
+                # ストリーミングは先頭のプロバイダのみ。失敗したら残りのプロバイダへ通常の呼び出しで切り替える
+                if len(chain) < 2:
+                    raise
+                print(f"ストリーミング呼び出しに失敗しました: {e}", file=sys.stderr)
+                return ask(chain[1:], llm_video, full_prompt)
+            early.update(extracted)
+            return text
+        finally:
+            print(
+                f"LLM 呼び出し: {time.perf_counter() - started:.1f}s"
+                f"（入力動画 {Path(llm_video).stat().st_size / 1024 / 1024:.1f} MB）",
+                file=sys.stderr,
+            )
 
-    first = text.find("{")
-    last = text.rfind("}")
-    if first != -1 and last != -1 and last > first:
-        candidates.append(text[first:last+1])
+    resp_text = cached_generate(
+        cache,
+        video,
+        prompt,
+        cfg.provider,
+        cfg.model_name,
+        generate,
+        refresh=args.refresh,
+        variant=generation_variant(proxy, args.chunk_minutes, cfg.provider),
+        cacheable=lambda: not fallback_answers,
+    )
+    return resp_text, early
 
-    for cand in candidates:
-        obj = try_load(cand)
-        if obj is not None:
-            return obj
-    return None
 
+def export_pdf_for_response(
+    resp_text: str, pdf_output: str = "", output_dir: str = "", checkpoint: bool = False
+) -> Path:
+    """応答の spec が指す Markdown を PDF に変換し、出力先パスを返す。
 
-def handle_response_and_extract(resp_text: str, default_video_file: str) -> None:
+    checkpoint=True なら、Markdown・画像・出力先が前回の変換時と同じで PDF も残っていれば変換を省略する。
+    """
     spec_dict = _extract_json_from_text(resp_text)
     if spec_dict is None:
-        raise ValueError("モデル応答から有効なJSONを抽出できませんでした。")
-
+        raise ValueError("モデル応答から有効なJSONを抽出できませんでした（PDF出力前）。")
     spec = Spec.from_dict(spec_dict)
-    if not spec.video:
-        spec.video = default_video_file
+    out_dir = Path(output_dir or spec.output_dir or "./manual_assets")
+    md_path = out_dir / (spec.markdown_output or "manual.md")
+    if not md_path.exists():
+        raise FileNotFoundError(f"Markdown が見つかりません（PDF 変換元）: {md_path}")
 
-    try:
-        out_dir = Path(spec.output_dir)
-        out_dir.mkdir(parents=True, exist_ok=True)
-        md_path = out_dir / spec.markdown_output
-        md_path.write_text(spec.body_markdown or "", encoding="utf-8")
-    except Exception as e:
-        print(f"Markdown 保存でエラー: {e}", file=sys.stderr)
+    if pdf_output:
+        pdf_path = Path(pdf_output)
+    else:
+        pdf_path = out_dir / Path(md_path.name).with_suffix(".pdf")
+
+    ckpt = Checkpoint(out_dir) if checkpoint else None
+    inputs = {"markdown": file_sha256(md_path), "images": ckpt.frame_hashes(), "pdf": str(pdf_path)} if ckpt else None
+    if ckpt and ckpt.output_current("pdf", pdf_path, inputs):
+        print(f"PDF は前回から変更がないため変換を省略します: {pdf_path}", file=sys.stderr)
+        return pdf_path
+    convert_markdown_to_pdf(str(md_path), str(pdf_path))
+    if ckpt:
+        ckpt.record_output("pdf", pdf_path, inputs)
+    print(f"PDF 出力: {pdf_path}", file=sys.stderr)
+    return pdf_path
+
+
+# --resume で前回の設定を引き継ぐ引数（画像の出力形式は "output" に別途記録）
+RESUME_SETTINGS = (
+    "snap", "dedupe", "dedupe_distance", "proxy", "chunk_minutes", "chunk_workers", "export_pdf", "pdf_output"
+)
+
+
+def checkpoint_settings(args: argparse.Namespace, output: Optional[OutputOptions]) -> Dict[str, Any]:
+    settings: Dict[str, Any] = {name: getattr(args, name) for name in RESUME_SETTINGS}
+    settings["output"] = asdict(output) if output else None
+    return settings
+
+
+def resume_from_checkpoint(args: argparse.Namespace) -> int:
+    """--resume <output_dir>: manifest.json の動画・設定で処理をやり直し、完了済みのステージは省略する。
+
+    LLM 応答は記録したもの（動画が変わっていなければ）を使い、manifest.json の "spec" を手で編集していればそちらを使う。
+    画像・Markdown・PDF は入力が前回と同じでファイルも残っていれば作り直さない。
+    """
+    out_dir = args.resume
+    ckpt = Checkpoint(out_dir)
+    if not ckpt.exists():
+        raise FileNotFoundError(f"チェックポイントが見つかりません: {ckpt.path}")
+    settings = ckpt.data.get("settings") or {}
+    for name in RESUME_SETTINGS:
+        if name in settings:
+            setattr(args, name, settings[name])
+    output = OutputOptions(**settings["output"]) if settings.get("output") else output_options_from_args(args)
+    video = ckpt.data.get("video") or args.video
+    if not video:
+        raise ValueError("チェックポイントに動画が記録されていません（--video で指定してください）")
+
+    edited = ckpt.edited_spec()
+    resp_text = json.dumps(edited, ensure_ascii=False) if edited else ckpt.saved_response(video)
+    early: Dict[ExtractedKey, str] = {}
+    if resp_text is not None:
+        print(f"LLM 応答をチェックポイントから再利用します{'（編集済みの spec）' if edited else ''}", file=sys.stderr)
+    else:
+        cfg = get_provider_config()
+        cache = None if args.no_cache else ResponseCache()
+        resp_text, early = generate_for_video(cfg, video, args, output, cache=cache, output_dir=out_dir)
+    print(resp_text)
+    handle_response_and_extract(
+        resp_text,
+        video,
+        already_extracted=early,
+        snap=args.snap,
+        dedupe=args.dedupe,
+        dedupe_distance=args.dedupe_distance,
+        output=output,
+        output_dir=out_dir,
+        checkpoint=True,
+        run_settings=checkpoint_settings(args, output),
+    )
+    if args.export_pdf:
+        export_pdf_for_response(resp_text, args.pdf_output, out_dir, checkpoint=True)
+    return 0
 
-    if not Path(spec.video).exists():
-        print(f"動画ファイルが見つかりません: {spec.video}", file=sys.stderr)
-        return
-    with redirect_stdout(sys.stderr):
-        extract_screenshots(spec.video, spec.output_dir, spec.screenshots or [])
 
+def run_batch_mode(args: argparse.Namespace, output: Optional[OutputOptions]) -> int:
+    """--videos-dir / --manifest の全動画を、LLM / ffmpeg / PDF のステージを重ねながら処理する。
 
-# --- データ構造（main 用の軽量 Spec） ---
-@dataclass
-class Spec:
-    video: str
-    output_dir: str = "./manual_assets"
-    markdown_output: str = "./manual.md"
-    title: str = "操作マニュアル"
-    author: str = ""
-    body_markdown: str = ""
-    screenshots: Optional[List[ScreenshotSpec]] = None
-
-    @staticmethod
-    def from_dict(d: Dict[str, Any]) -> "Spec":
-        shots = [ScreenshotSpec(**s) for s in d.get("screenshots", [])]
-        return Spec(
-            video=d.get("video", ""),
-            output_dir=d.get("output_dir", "./manual_assets"),
-            markdown_output=d.get("markdown_output", "./manual.md"),
-            title=d.get("title", "操作マニュアル"),
-            author=d.get("author", ""),
-            body_markdown=d.get("body_markdown", ""),
-            screenshots=shots,
+    ProviderConfig・SDK クライアント・応答キャッシュは全動画で共有する。結果は 1 動画 1 行の JSONL
+    （--results、未指定なら標準出力）。1 本の失敗はその動画の結果行に記録し、残りの処理は続ける。
+    """
+    jobs = load_batch_jobs(args.videos_dir, args.manifest)
+    if not jobs:
+        print("処理対象の動画がありません", file=sys.stderr)
+        return 1
+    cfg = get_provider_config()
+    client = create_client(cfg)
+    cache = None if args.no_cache else ResponseCache()
+
+    def llm_stage(job: BatchJob) -> None:
+        if not Path(job.video).exists():
+            raise FileNotFoundError(f"動画ファイルが見つかりません: {job.video}")
+        stats = LLMCallStats()
+        try:
+            job.resp_text, job.state["early"] = generate_for_video(
+                cfg, job.video, args, output, client, cache, stats, output_dir=job.output_dir
+            )
+        finally:
+            job.llm = stats.as_dict()
+
+    def extract_stage(job: BatchJob) -> None:
+        merged = handle_response_and_extract(
+            job.resp_text,
+            job.video,
+            already_extracted=job.state.get("early"),
+            snap=args.snap,
+            dedupe=args.dedupe,
+            dedupe_distance=args.dedupe_distance,
+            output=output,
+            output_dir=job.output_dir,
+            checkpoint=not args.no_checkpoint,
+            run_settings=checkpoint_settings(args, output),
         )
+        spec = Spec.from_dict(_extract_json_from_text(job.resp_text) or {})
+        out_dir = Path(job.output_dir or spec.output_dir)
+        job.markdown_path = str(out_dir / spec.markdown_output)
+        names = [output_filename(s.filename, output) for s in (spec.screenshots or [])]
+        job.image_paths = [str(out_dir / n) for n in names if args.dedupe != "merge" or n not in merged]
+
+    def pdf_stage(job: BatchJob) -> None:
+        job.pdf_path = str(export_pdf_for_response(
+            job.resp_text, job.pdf_output, job.output_dir, checkpoint=not args.no_checkpoint
+        ))
+
+    stages: List[Stage] = [("llm", llm_stage, args.llm_workers), ("ffmpeg", extract_stage, args.ffmpeg_workers)]
+    if args.export_pdf:
+        stages.append(("pdf", pdf_stage, args.pdf_workers))
+    def report_metrics(metrics: List[Dict[str, Any]]) -> None:
+        print("ステージ別の処理状況:\n" + format_metrics(metrics), file=sys.stderr)
+        if args.metrics:
+            Path(args.metrics).write_text(json.dumps(metrics, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"バッチ処理を開始します: {len(jobs)} 本", file=sys.stderr)
+    with jsonl_writer(args.results) as write:
+        failures = run_batch(jobs, stages, write, queue_size=args.queue_size, on_metrics=report_metrics)
+    print(f"バッチ処理が完了しました: 成功 {len(jobs) - failures} / 失敗 {failures}", file=sys.stderr)
+    return 1 if failures else 0
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="動画解析から手順書素案を生成し静止画を抽出")
     parser.add_argument(
         "--video",
-        required=True,
-        help="入力動画ファイルパス（必須）",
+        default="",
+        help="入力動画ファイルパス（--videos-dir / --manifest を使わない場合は必須）",
+    )
+    parser.add_argument(
+        "--videos-dir",
+        default="",
+        help="バッチモード: このディレクトリ直下の動画をすべて処理する（出力先は動画ごとに DIR/<動画名>）",
+    )
+    parser.add_argument(
+        "--manifest",
+        default="",
+        help="バッチモード: 処理する動画の一覧（JSONL。各行 {\"video\": ..., \"output_dir\": ..., \"pdf_output\": ...}）",
+    )
+    parser.add_argument(
+        "--results",
+        default="",
+        help="バッチモードの結果 JSONL の出力先（追記。未指定なら標準出力）",
+    )
+    parser.add_argument("--llm-workers", type=int, default=2, help="バッチモードで同時に実行する LLM 呼び出し数")
+    parser.add_argument("--ffmpeg-workers", type=int, default=2, help="バッチモードで同時に実行する静止画抽出数")
+    parser.add_argument("--pdf-workers", type=int, default=1, help="バッチモードで同時に実行する PDF 変換数")
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help="バッチモードでステージ間に待たせておける動画数（超えると上流のステージが待つ）",
+    )
+    parser.add_argument(
+        "--metrics",
+        default="",
+        help="バッチモードのステージ別メトリクス（件数・件/分・平均時間・キュー長）を JSON で書き出すパス",
     )
     parser.add_argument(
         "--export-pdf",
@@ -311,41 +624,108 @@ def main() -> int:
         default="",
         help="PDF 出力先パス（未指定なら Markdown と同じ場所に同名.pdf で出力）",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="LLM 応答キャッシュを使わない（読み込みも保存もしない）",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="LLM 応答キャッシュを無視して再生成し、キャッシュを上書きする",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="LLM 応答をストリーミングで受け取り、確定したスクリーンショットから順に抽出を始める",
+    )
+    parser.add_argument(
+        "--snap",
+        action="store_true",
+        help="抽出前に各スクリーンショットの時刻を前後の区間で最も安定したフレームへ補正する",
+    )
+    parser.add_argument(
+        "--dedupe",
+        choices=DEDUPE_MODES,
+        default="off",
+        help="直前とほぼ同じ画面のスクリーンショットの扱い（off / flag: 報告のみ / merge: 削除して Markdown の参照を差し替える）",
+    )
+    parser.add_argument(
+        "--dedupe-distance",
+        type=int,
+        default=DEFAULT_DEDUPE_DISTANCE,
+        help="同一画面とみなす dHash（64 ビット）のハミング距離の上限",
+    )
+    parser.add_argument(
+        "--proxy",
+        action="store_true",
+        help="Gemini へ送る前に低解像度・低 fps のプロキシ動画へ変換する（MOVIE2MANUAL_PROXY=1 と同じ。抽出は元動画から行う）",
+    )
+    parser.add_argument(
+        "--chunk-minutes",
+        type=float,
+        default=0.0,
+        help="長い動画をこの分数ごと（場面の切り替わり付近）に分割して並行に解析し、結果をまとめる（既定: 0 = 分割しない）",
+    )
+    parser.add_argument(
+        "--chunk-workers",
+        type=int,
+        default=DEFAULT_CHUNK_WORKERS,
+        help="分割時に同時に LLM へ送る区間数",
+    )
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="先頭のプロバイダが p95 応答時間を過ぎても返らなければフォールバック先へも並行して送り、先に有効な JSON を返した方を使う（LLM_HEDGE=1 と同じ）",
+    )
+    parser.add_argument(
+        "--resume",
+        default="",
+        metavar="OUTPUT_DIR",
+        help="前回の出力先（manifest.json のあるディレクトリ）から再開する。動画・設定はチェックポイントから引き継ぎ、完了済みのステージは省略する",
+    )
+    parser.add_argument(
+        "--no-checkpoint",
+        action="store_true",
+        help="出力先の manifest.json にステージごとのチェックポイントを記録・参照しない",
+    )
+    add_output_arguments(parser)
     args = parser.parse_args()
 
+    # ffmpeg のコマンドログで標準出力（応答本文・結果 JSONL）を汚さない（スレッドからの抽出でも安全）
+    extract_screenshot.COMMAND_LOG_STREAM = sys.stderr
     try:
+        output = output_options_from_args(args)
+        if args.resume:
+            return resume_from_checkpoint(args)
+        if args.videos_dir or args.manifest:
+            return run_batch_mode(args, output)
+        if not args.video:
+            parser.error("--video または --videos-dir / --manifest を指定してください")
         cfg = get_provider_config()
-        prompt = build_prompt(args.video)
-        if cfg.provider == "gemini":
-            if not cfg.api_key:
-                raise RuntimeError("Gemini 用 API キーがありません")
-            client = create_gemini_client(cfg.api_key)
-            resp_text = generate_response_text_gemini(client, args.video, prompt, cfg.model_name)
-        else:
-            # OpenAI互換 / Ollama
-            client = create_openai_compatible_client(cfg.api_key or "", cfg.base_url)
-            resp_text = generate_response_text_openai(client, prompt, cfg.model_name)
+        cache = None if args.no_cache else ResponseCache()
+        stats = LLMCallStats()
+        resp_text, early = generate_for_video(cfg, args.video, args, output, cache=cache, stats=stats)
+        if stats.calls:
+            print(f"LLM 呼び出しの再試行: {stats.summary()}", file=sys.stderr)
+        if stats.fallbacks or stats.hedged:
+            print(f"LLM 応答: {stats.answered_by}（フォールバック {stats.fallbacks} / ヘッジ {stats.hedged}）", file=sys.stderr)
         print(resp_text)
-        handle_response_and_extract(resp_text, args.video)
+        handle_response_and_extract(
+            resp_text,
+            args.video,
+            already_extracted=early,
+            snap=args.snap,
+            dedupe=args.dedupe,
+            dedupe_distance=args.dedupe_distance,
+            output=output,
+            checkpoint=not args.no_checkpoint,
+            run_settings=checkpoint_settings(args, output),
+        )
 
         # 追加: PDF 出力
         if args.export_pdf:
-            spec_dict = _extract_json_from_text(resp_text)
-            if spec_dict is None:
-                raise ValueError("モデル応答から有効なJSONを抽出できませんでした（PDF出力前）。")
-            spec = Spec.from_dict(spec_dict)
-            out_dir = Path(spec.output_dir or "./manual_assets")
-            md_path = out_dir / (spec.markdown_output or "manual.md")
-            if not md_path.exists():
-                raise FileNotFoundError(f"Markdown が見つかりません（PDF 変換元）: {md_path}")
-
-            if args.pdf_output:
-                pdf_path = Path(args.pdf_output)
-            else:
-                pdf_path = out_dir / Path(md_path.name).with_suffix(".pdf")
-
-            convert_markdown_to_pdf(str(md_path), str(pdf_path))
-            print(f"PDF 出力: {pdf_path}", file=sys.stderr)
+            export_pdf_for_response(resp_text, args.pdf_output, checkpoint=not args.no_checkpoint)
         return 0
     except Exception as e:
         print(f"処理中にエラーが発生しました: {e}", file=sys.stderr)
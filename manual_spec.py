@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from extract_screenshot import OutputOptions, ScreenshotSpec, extract_screenshots, output_filename
+from frame_snap import snap_screenshots
+from json_extract import extract_json_object
+from pipeline_checkpoint import Checkpoint, spec_record
+from screenshot_dedup import DEFAULT_DEDUPE_DISTANCE, dedupe_screenshots, rewrite_image_refs
+from streaming_generation import ExtractedKey, extracted_key
+
+
+# --- データ構造（main.py / server/main.py 共通の軽量 Spec） ---
+@dataclass
+class Spec:
+    video: str
+    output_dir: str = "./manual_assets"
+    markdown_output: str = "./manual.md"
+    title: str = "操作マニュアル"
+    author: str = ""
+    body_markdown: str = ""
+    screenshots: Optional[List[ScreenshotSpec]] = None
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> "Spec":
+        shots = [ScreenshotSpec(**s) for s in d.get("screenshots", [])]
+        return Spec(
+            video=d.get("video", ""),
+            output_dir=d.get("output_dir", "./manual_assets"),
+            markdown_output=d.get("markdown_output", "./manual.md"),
+            title=d.get("title", "操作マニュアル"),
+            author=d.get("author", ""),
+            body_markdown=d.get("body_markdown", ""),
+            screenshots=shots,
+        )
+
+
+def handle_response_and_extract(
+    resp_text: str,
+    default_video_file: str,
+    already_extracted: Optional[Dict[ExtractedKey, str]] = None,
+    snap: bool = False,
+    dedupe: str = "off",
+    dedupe_distance: int = DEFAULT_DEDUPE_DISTANCE,
+    output: Optional[OutputOptions] = None,
+    output_dir: str = "",
+    checkpoint: bool = False,
+    run_settings: Optional[Dict[str, Any]] = None,
+) -> Dict[str, str]:
+    """Markdown を保存してスクリーンショットを抽出し、重複としてまとめた {ファイル名: 残したファイル名} を返す。
+
+    output で形式を指定した場合のファイル名は output_filename に従い、Markdown の画像参照も差し替える。
+    output_dir を指定すると spec の output_dir より優先する（バッチモードの manifest 指定・MCP の output_dir）。
+    checkpoint=True なら output_dir/manifest.json に各ステージを記録し、入力が前回と同じで
+    ファイルも残っている画像は再抽出しない（run_settings は --resume 用に記録する実行時の設定）。
+    """
+    spec_dict = extract_json_object(resp_text)
+    if spec_dict is None:
+        raise ValueError("モデル応答から有効なJSONを抽出できませんでした。")
+
+    spec = Spec.from_dict(spec_dict)
+    if not spec.video:
+        spec.video = default_video_file
+    if output_dir:
+        spec.output_dir = output_dir
+    ckpt = Checkpoint(spec.output_dir) if checkpoint else None
+    if ckpt:
+        ckpt.record_response(resp_text, spec.video)
+        ckpt.record_spec(spec_record(spec, output))
+        if run_settings is not None:
+            ckpt.record_settings(run_settings)
+
+    try:
+        out_dir = Path(spec.output_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        md_path = out_dir / spec.markdown_output
+        md_path.write_text(spec.body_markdown or "", encoding="utf-8")
+    except Exception as e:
+        print(f"Markdown 保存でエラー: {e}", file=sys.stderr)
+
+    if not Path(spec.video).exists():
+        print(f"動画ファイルが見つかりません: {spec.video}", file=sys.stderr)
+        return {}
+    # ストリーミング中に先行抽出済みのものは除く
+    all_shots = list(spec.screenshots or [])
+    early_times = already_extracted or {}
+    keys_by_index = [extracted_key(spec.output_dir, s) for s in all_shots]
+    early = {i: early_times[k] for i, k in enumerate(keys_by_index) if k in early_times}
+    pending = [i for i in range(len(all_shots)) if i not in early]
+    # 出力形式で拡張子が変わる場合は、以降の判定・Markdown の参照を新しいファイル名で行う
+    renames = {s.filename: output_filename(s.filename, output) for s in all_shots}
+    renames = {k: v for k, v in renames.items() if k != v}
+    all_shots = [replace(s, filename=renames.get(s.filename, s.filename)) for s in all_shots]
+    if ckpt:
+        # 前回と同じ入力で抽出済みの画像は除く（時刻は前回補正した値に戻る）。失敗しても書き出せた分は記録される
+        skip = set(range(len(all_shots))) - set(pending)
+        keys, extracted = ckpt.extract_frames(
+            spec.video,
+            all_shots,
+            lambda todo: extract_screenshots(spec.video, spec.output_dir, todo, output=output),
+            snap=snap,
+            output=output,
+            skip=skip,
+        )
+    else:
+        shots = [all_shots[i] for i in pending]
+        if snap:
+            shots = snap_screenshots(spec.video, shots)
+            for i, s in zip(pending, shots):
+                all_shots[i] = s
+        extract_screenshots(spec.video, spec.output_dir, shots, output=output)
+        extracted = len(shots)
+    # 先行抽出分は実際に抽出した（補正後の）時刻を記録する
+    for i, time in early.items():
+        all_shots[i] = replace(all_shots[i], time=time)
+    # 重複判定は先行抽出分も含めた全スクリーンショットを spec の順に比較する（何も抽出し直していなければ前回の結果を使う）
+    merged = None
+    if ckpt and not extracted and not already_extracted:
+        merged = ckpt.saved_merged(keys, dedupe, dedupe_distance)
+    if merged is None:
+        merged = dedupe_screenshots(spec.output_dir, all_shots, dedupe_distance, mode=dedupe)
+    if ckpt:
+        ckpt.finish_frames(all_shots, keys, merged, dedupe, dedupe_distance)
+    body = rewrite_image_refs(spec.body_markdown or "", renames)
+    if dedupe == "merge":
+        body = rewrite_image_refs(body, merged)
+    if body != (spec.body_markdown or ""):
+        (Path(spec.output_dir) / spec.markdown_output).write_text(body, encoding="utf-8")
+    if ckpt:
+        md_inputs = {"spec": spec_record(spec, output), "merged": merged}
+        ckpt.record_output("markdown", Path(spec.output_dir) / spec.markdown_output, md_inputs)
+    return merged
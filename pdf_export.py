@@ -1,62 +1,55 @@
 from __future__ import annotations
 
+import inspect
+import threading
 from pathlib import Path
 from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+
+# Markdown の拡張（よく使うもの）と、全 PDF 共通のスタイル（@page のヘッダー等は文書ごとに HTML 側で指定）
+MARKDOWN_EXTENSIONS = ["extra", "toc", "sane_lists", "tables", "fenced_code"]
+SHARED_CSS = """
+body {
+  font-family: 'Noto Sans CJK JP', 'Noto Sans JP', 'Hiragino Kaku Gothic ProN', 'Meiryo', sans-serif;
+  line-height: 1.7;
+  font-size: 12pt;
+  color: #222;
+}
+
+h1, h2, h3, h4, h5, h6 { page-break-after: avoid; }
+h1 { font-weight: 400; border-bottom: 1px solid #222; padding-bottom: 6px; margin-bottom: 12px; }
+h2 { font-weight: 400; }
+
+pre { background: #f5f7fa; padding: 10px; border-radius: 6px; overflow: auto; }
+code { font-family: 'SFMono-Regular', Consolas, 'Liberation Mono', Menlo, monospace; }
+img { max-width: 100%; height: auto; page-break-inside: avoid; }
+table { border-collapse: collapse; width: 100%; margin: 1em 0; }
+th, td { border: 1px solid #ccc; padding: 6px 8px; }
+"""
 
 
-def convert_markdown_to_pdf_with_weasyprint(markdown_path: str, pdf_path: str) -> None:
-    """
-    Python-Markdown で Markdown を HTML に変換し、WeasyPrint で PDF 化する。
-
-    参考: Python-Markdown を使った HTML 変換の基本（記事の趣旨 `markdown.markdown()`）
-    必要な Python パッケージ:
-      - markdown
-      - weasyprint
-
-    WeasyPrint はシステム依存ライブラリ（cairo/pango 等）に依存します。
-    Ubuntu/Debian の例:
-      sudo apt-get update && sudo apt-get install -y \
-        libcairo2 libpango-1.0-0 libpangoft2-1.0-0 libpangocairo-1.0-0 libgdk-pixbuf2.0-0 libffi-dev libssl-dev
-    """
-
+def _import_renderer_modules() -> Tuple[Any, Any]:
     try:
         import markdown  # type: ignore
     except Exception:
         raise RuntimeError("python-markdown が見つかりません。'pip install markdown' を実行してください。")
 
     try:
-        from weasyprint import HTML  # type: ignore
+        import weasyprint  # type: ignore
     except Exception:
         raise RuntimeError(
             "WeasyPrint が見つかりません。'pip install weasyprint' を実行し、必要なシステムライブラリも導入してください。"
         )
+    return markdown, weasyprint
+
 
-    md = Path(markdown_path)
-    pdf = Path(pdf_path)
-    pdf.parent.mkdir(parents=True, exist_ok=True)
-
-    if not md.exists():
-        raise FileNotFoundError(f"Markdown ファイルが見つかりません: {md}")
-
-    md_text = md.read_text(encoding="utf-8")
-
-    # よく使う拡張を有効化
-    html_body = markdown.markdown(
-        md_text,
-        extensions=[
-            "extra",
-            "toc",
-            "sane_lists",
-            "tables",
-            "fenced_code",
-        ],
-        output_format="html5",
-    )
-
-    # 簡易テンプレート + 日本語フォント指定
-    # base_url に md.parent を渡すことで、相対パス画像を解決
+def _html_document(md: Path, html_body: str) -> str:
+    """簡易テンプレート + 日本語フォント指定（ページのヘッダー・フッターは文書ごと）。"""
     today_str = date.today().strftime("%Y-%m-%d")
-    html_template = f"""
+    return f"""
 <!DOCTYPE html>
 <html lang=\"ja\">
 <head>
@@ -70,22 +63,6 @@ def convert_markdown_to_pdf_with_weasyprint(markdown_path: str, pdf_path: str) -
       @top-right {{ content: "{today_str}"; font-size: 10pt; color: #333; }}
       @bottom-center {{ content: counter(page) "/" counter(pages); font-size: 10pt; color: #333; }}
     }}
-    body {{
-      font-family: 'Noto Sans CJK JP', 'Noto Sans JP', 'Hiragino Kaku Gothic ProN', 'Meiryo', sans-serif;
-      line-height: 1.7;
-      font-size: 12pt;
-      color: #222;
-    }}
-
-    h1, h2, h3, h4, h5, h6 {{ page-break-after: avoid; }}
-    h1 {{ font-weight: 400; border-bottom: 1px solid #222; padding-bottom: 6px; margin-bottom: 12px; }}
-    h2 {{ font-weight: 400; }}
-
-    pre {{ background: #f5f7fa; padding: 10px; border-radius: 6px; overflow: auto; }}
-    code {{ font-family: 'SFMono-Regular', Consolas, 'Liberation Mono', Menlo, monospace; }}
-    img {{ max-width: 100%; height: auto; page-break-inside: avoid; }}
-    table {{ border-collapse: collapse; width: 100%; margin: 1em 0; }}
-    th, td {{ border: 1px solid #ccc; padding: 6px 8px; }}
   </style>
   <meta name=\"generator\" content=\"movie2manual weasyprint\" />
   <meta http-equiv=\"Content-Language\" content=\"ja\" />
@@ -111,7 +88,118 @@ def convert_markdown_to_pdf_with_weasyprint(markdown_path: str, pdf_path: str) -
 </html>
 """
 
-    HTML(string=html_template, base_url=str(md.parent.resolve())).write_pdf(str(pdf))
+
+# PDFRenderer が保持する画像キャッシュの上限（件数）
+IMAGE_CACHE_LIMIT = 512
+
+
+def _file_stat(url: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = Path(url2pathname(urlparse(url).path)).stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class PDFRenderer:
+    """Markdown → HTML → PDF の変換器。生成した 1 つを使い回すと 2 回目以降の変換が速くなる。
+
+    - Markdown の変換器（拡張の読み込み済み）を reset して再利用する
+    - 共通スタイルシートは生成時に 1 度だけ解析し、フォント設定（FontConfiguration）も共有する
+    - WeasyPrint の画像キャッシュを保持し、同じ画像の再デコードを省く（ファイルが更新された画像は読み直す）
+
+    スレッドセーフではないため、スレッドごとに別の PDFRenderer を使う（get_renderer）。
+    WeasyPrint はシステム依存ライブラリ（cairo/pango 等）に依存します。
+    Ubuntu/Debian の例:
+      sudo apt-get update && sudo apt-get install -y \
+        libcairo2 libpango-1.0-0 libpangoft2-1.0-0 libpangocairo-1.0-0 libgdk-pixbuf2.0-0 libffi-dev libssl-dev
+    """
+
+    def __init__(self) -> None:
+        markdown, weasyprint = _import_renderer_modules()
+        try:
+            from weasyprint.text.fonts import FontConfiguration  # type: ignore
+        except ImportError:  # WeasyPrint 53 より前
+            from weasyprint.fonts import FontConfiguration  # type: ignore
+
+        self._weasyprint = weasyprint
+        self._markdown = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS, output_format="html5")
+        self._font_config = FontConfiguration()
+        self._stylesheet = weasyprint.CSS(string=SHARED_CSS, font_config=self._font_config)
+        # 画像キャッシュの引数名は WeasyPrint のバージョンで異なる（59 以降: cache / それ以前: image_cache）
+        if "cache" in (getattr(weasyprint, "DEFAULT_OPTIONS", None) or {}):
+            self._cache_arg: Optional[str] = "cache"
+        elif "image_cache" in inspect.signature(weasyprint.HTML.write_pdf).parameters:
+            self._cache_arg = "image_cache"
+        else:
+            self._cache_arg = None
+        self._image_cache: Dict[Any, Any] = {}
+        self._image_stats: Dict[str, Optional[Tuple[int, int]]] = {}
+
+    def _cached_image_urls(self) -> List[str]:
+        return [k for k in self._image_cache if isinstance(k, str) and k.startswith("file://")]
+
+    def _drop_stale_images(self) -> None:
+        """前回の変換後に更新・削除された画像ファイルをキャッシュから除く（同名で再抽出した場合など）。"""
+        if len(self._image_cache) > IMAGE_CACHE_LIMIT:
+            # 長時間動かすプロセス（MCP サーバー）でキャッシュが増え続けないよう、上限を超えたら空にする
+            self._image_cache.clear()
+            self._image_stats.clear()
+        for url in self._cached_image_urls():
+            if self._image_stats.get(url) != _file_stat(url):
+                self._image_cache.pop(url, None)
+                self._image_stats.pop(url, None)
+
+    def _remember_images(self) -> None:
+        for url in self._cached_image_urls():
+            if url not in self._image_stats:
+                self._image_stats[url] = _file_stat(url)
+
+    def render(self, markdown_path: str, pdf_path: str) -> None:
+        md = Path(markdown_path)
+        pdf = Path(pdf_path)
+        pdf.parent.mkdir(parents=True, exist_ok=True)
+
+        if not md.exists():
+            raise FileNotFoundError(f"Markdown ファイルが見つかりません: {md}")
+
+        html_body = self._markdown.reset().convert(md.read_text(encoding="utf-8"))
+        options: Dict[str, Any] = {"stylesheets": [self._stylesheet], "font_config": self._font_config}
+        if self._cache_arg:
+            self._drop_stale_images()
+            options[self._cache_arg] = self._image_cache
+        # base_url に md.parent を渡すことで、相対パス画像を解決
+        self._weasyprint.HTML(string=_html_document(md, html_body), base_url=str(md.parent.resolve())).write_pdf(
+            str(pdf), **options
+        )
+        if self._cache_arg:
+            self._remember_images()
+
+
+_RENDERERS = threading.local()
+
+
+def get_renderer() -> PDFRenderer:
+    """呼び出し元スレッドの PDFRenderer（初回に生成し、以降は使い回す）。"""
+    renderer = getattr(_RENDERERS, "renderer", None)
+    if renderer is None:
+        renderer = PDFRenderer()
+        _RENDERERS.renderer = renderer
+    return renderer
+
+
+def convert_markdown_to_pdf_with_weasyprint(markdown_path: str, pdf_path: str) -> None:
+    """
+    Python-Markdown で Markdown を HTML に変換し、WeasyPrint で PDF 化する（毎回新しい変換器で行う）。
+
+    参考: Python-Markdown を使った HTML 変換の基本（記事の趣旨 `markdown.markdown()`）
+    必要な Python パッケージ:
+      - markdown
+      - weasyprint
+
+    繰り返し変換する場合は convert_markdown_to_pdf（スレッドごとの PDFRenderer を再利用）を使う。
+    """
+    PDFRenderer().render(markdown_path, pdf_path)
 
 
 def convert_markdown_to_pdf(markdown_path: str, pdf_path: str) -> None:
@@ -119,7 +207,8 @@ def convert_markdown_to_pdf(markdown_path: str, pdf_path: str) -> None:
 
     参考: 記事にある `markdown.markdown()` の基本的な使い方を採用。
     See: https://chocottopro.com/?p=512
+    変換器はスレッドごとに使い回す（MCP サーバー・バッチモードで 2 本目以降の初期化を省く）。
     """
-    return convert_markdown_to_pdf_with_weasyprint(markdown_path, pdf_path)
+    return get_renderer().render(markdown_path, pdf_path)
 
 
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from extract_screenshot import OutputOptions, ScreenshotSpec, file_sha256, frame_input_key, output_filename
+from frame_snap import snap_screenshots
+
+
+# output_dir 直下に置くチェックポイント（MCP サーバーの manifest.json と同じファイル。"spec" キーの形式も共通）
+CHECKPOINT_FILE = "manifest.json"
+RESPONSE_FILE = "llm_response.txt"
+CHECKPOINT_VERSION = 1
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _is_written(path: Path) -> bool:
+    return path.is_file() and path.stat().st_size > 0
+
+
+def spec_record(spec: Any, output: Optional[OutputOptions] = None) -> Dict[str, Any]:
+    """Spec（main.py / server/main.py）を manifest.json の "spec" の形式にする（画像名は出力形式に合わせる）。"""
+    return {
+        "video": spec.video,
+        "output_dir": str(spec.output_dir),
+        "markdown_output": spec.markdown_output,
+        "title": spec.title,
+        "author": spec.author,
+        "body_markdown": spec.body_markdown,
+        "screenshots": [
+            {"time": s.time, "filename": output_filename(s.filename, output), "caption": getattr(s, "caption", None)}
+            for s in (spec.screenshots or [])
+        ],
+    }
+
+
+class Checkpoint:
+    """output_dir/manifest.json に各ステージ（LLM 応答 / spec / 画像 / Markdown / PDF）の入力と出力のハッシュを記録する。
+
+    再実行時は、入力が同じで出力ファイルも記録どおり残っているステージ（画像は 1 枚ごと）を省略する。
+    記録はステージごとに一時ファイル経由で置き換えるため、途中で失敗してもそれまでのステージは残る。
+    """
+
+    def __init__(self, output_dir: Union[str, Path]):
+        self.dir = Path(output_dir)
+        self.path = self.dir / CHECKPOINT_FILE
+        self.data: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        try:
+            loaded = json.loads(self.path.read_text(encoding="utf-8"))
+            if isinstance(loaded, dict):
+                self.data = loaded
+        except (OSError, ValueError):
+            pass
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    @property
+    def stages(self) -> Dict[str, Any]:
+        return self.data.setdefault("stages", {})
+
+    def save(self) -> None:
+        with self._lock:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self.data["version"] = CHECKPOINT_VERSION
+            self.data["updated_at"] = time.time()
+            tmp = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(self.data, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+    # --- 実行時の設定（--resume で同じ設定を使う） ---
+    def record_settings(self, settings: Dict[str, Any]) -> None:
+        self.data["settings"] = settings
+        self.save()
+
+    # --- 1) LLM 応答 ---
+    def record_response(self, text: str, video: str) -> None:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        entry = self.stages.get("llm") or {}
+        if entry.get("sha256") == digest and (self.dir / RESPONSE_FILE).exists():
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        (self.dir / RESPONSE_FILE).write_text(text, encoding="utf-8")
+        self.data["video"] = video
+        self.stages["llm"] = {
+            "path": RESPONSE_FILE,
+            "sha256": digest,
+            "video_sha256": file_sha256(video) if Path(video).exists() else None,
+        }
+        self.save()
+
+    def saved_response(self, video: str) -> Optional[str]:
+        """記録した LLM 応答（動画の内容が変わっていない場合のみ）。応答ファイルを手で直した場合はその内容を返す。"""
+        entry = self.stages.get("llm")
+        path = self.dir / RESPONSE_FILE
+        if not entry or not path.exists() or not Path(video).exists():
+            return None
+        if entry.get("video_sha256") != file_sha256(video):
+            return None
+        return path.read_text(encoding="utf-8")
+
+    # --- 2) spec ---
+    def record_spec(self, spec: Dict[str, Any]) -> None:
+        self.data["spec"] = spec
+        self.stages["spec"] = {"sha256": _digest(spec)}
+        self.save()
+
+    def edited_spec(self) -> Optional[Dict[str, Any]]:
+        """manifest.json の "spec" が記録後に手で編集されていれば、その spec を返す。"""
+        spec = self.data.get("spec")
+        entry = self.stages.get("spec")
+        if isinstance(spec, dict) and entry and entry.get("sha256") != _digest(spec):
+            return spec
+        return None
+
+    # --- 3) 画像 ---
+    def plan_frames(
+        self,
+        video: str,
+        shots: List[ScreenshotSpec],
+        snap: bool,
+        output: Optional[OutputOptions],
+        method: str = "seek",
+    ) -> Tuple[List[int], Dict[str, str]]:
+        """再抽出が必要な shots のインデックスと、各ファイル名の入力キー（frame_input_key）を返す。
+
+        キーが同じで、ファイルが記録したハッシュのまま残っている（重複としてまとめた画像は残した側が残っている）
+        ものは再抽出しない。再抽出しないものは、前回補正した時刻を shots に書き戻す（重複判定に使うため）。
+        """
+        frames = self.stages.get("frames") or {}
+        video_sha = file_sha256(video)
+        keys: Dict[str, str] = {}
+        stale: List[int] = []
+        for i, shot in enumerate(shots):
+            key = frame_input_key(video_sha, shot.time, output, snap=snap, method=method)
+            keys[shot.filename] = key
+            entry = frames.get(shot.filename) or {}
+            if entry.get("key") == key and self._frame_present(shot.filename, entry, frames):
+                shots[i] = dataclasses.replace(shot, time=entry.get("extracted_time") or shot.time)
+            else:
+                stale.append(i)
+        return stale, keys
+
+    def extract_frames(
+        self,
+        video: str,
+        shots: List[ScreenshotSpec],
+        extract: Callable[[List[ScreenshotSpec]], Any],
+        snap: bool = False,
+        output: Optional[OutputOptions] = None,
+        method: str = "seek",
+        skip: Iterable[int] = (),
+    ) -> Tuple[Dict[str, str], int]:
+        """入力が前回から変わった画像だけを（snap=True なら時刻を補正してから）extract で抽出し、(入力キー, 抽出枚数) を返す。
+
+        shots は補正後・再利用した時刻に書き換える。skip（先行抽出済みなどのインデックス）は抽出しない。
+        新たに書き出す画像があるときは、前回重複としてまとめて削除した画像も抽出し直す（重複判定をやり直すため）。
+        extract が失敗した場合も、書き出せた画像は記録してから例外を送出する（再開時に抽出し直さない）。
+        """
+        stale, keys = self.plan_frames(video, shots, snap, output, method)
+        skip = set(skip)
+        pending = [i for i in range(len(shots)) if i not in skip]
+        todo = [i for i in pending if i in set(stale)]
+        if todo or skip:
+            # 重複判定をやり直すため、前回重複としてまとめて削除した画像も書き出し直す（判定は画像そのもので行う）
+            todo = [i for i in pending if i in set(todo) or not (self.dir / shots[i].filename).exists()]
+        reused = len(pending) - len(todo)
+        if reused:
+            print(f"チェックポイントから画像 {reused} 枚を再利用します", file=sys.stderr)
+        todo_shots = [shots[i] for i in todo]
+        if snap:
+            todo_shots = snap_screenshots(video, todo_shots)
+            for i, s in zip(todo, todo_shots):
+                shots[i] = s
+        # 失敗したときに書き出せた分だけを記録できるよう、抽出し直す画像の古いファイルは先に消す
+        for s in todo_shots:
+            (self.dir / s.filename).unlink(missing_ok=True)
+        if todo_shots:
+            try:
+                extract(todo_shots)
+            except Exception:
+                failed = {s.filename for s in todo_shots if not _is_written(self.dir / s.filename)}
+                self.record_frames(shots, keys, {}, failed=failed)
+                raise
+        return keys, len(todo_shots)
+
+    def _frame_present(self, filename: str, entry: Dict[str, Any], frames: Dict[str, Any]) -> bool:
+        kept = entry.get("merged_into")
+        if kept:
+            return (self.dir / kept).exists() and kept in frames and not frames[kept].get("merged_into")
+        path = self.dir / filename
+        return path.exists() and entry.get("sha256") == file_sha256(path)
+
+    def saved_merged(self, keys: Dict[str, str], mode: str, distance: int) -> Optional[Dict[str, str]]:
+        """画像の入力と重複判定の設定が前回と同じなら、前回の重複判定の結果を返す。"""
+        entry = self.stages.get("dedupe")
+        if entry and entry.get("inputs") == _digest({"keys": keys, "mode": mode, "distance": distance}):
+            return dict(entry.get("merged") or {})
+        return None
+
+    def record_frames(
+        self,
+        shots: List[ScreenshotSpec],
+        keys: Dict[str, str],
+        merged: Dict[str, str],
+        failed: Iterable[str] = (),
+    ) -> None:
+        """各画像の入力キー・補正後の時刻・出力ハッシュを記録する。
+
+        failed（抽出に失敗したファイル名）は記録しないため、次回は抽出し直す。
+        ファイルが無く merged にも無いが、前回の記録で重複としてまとめた画像（キーも同じ）はその記録を残す。
+        """
+        previous = self.stages.get("frames") or {}
+        failed = set(failed)
+        frames: Dict[str, Any] = {}
+        for shot in shots:
+            if shot.filename in failed:
+                continue
+            entry: Dict[str, Any] = {"key": keys.get(shot.filename), "extracted_time": shot.time}
+            path = self.dir / shot.filename
+            old = previous.get(shot.filename) or {}
+            if shot.filename in merged:
+                entry["merged_into"] = merged[shot.filename]
+            elif path.exists():
+                entry["sha256"] = file_sha256(path)
+            elif old.get("merged_into") and old.get("key") == entry["key"]:
+                entry = old
+            frames[shot.filename] = entry
+        self.stages["frames"] = frames
+        self.save()
+
+    def record_dedupe(self, keys: Dict[str, str], merged: Dict[str, str], mode: str, distance: int) -> None:
+        self.stages["dedupe"] = {
+            "inputs": _digest({"keys": keys, "mode": mode, "distance": distance}),
+            "merged": merged,
+        }
+        self.save()
+
+    def finish_frames(
+        self, shots: List[ScreenshotSpec], keys: Dict[str, str], merged: Dict[str, str], mode: str, distance: int
+    ) -> None:
+        """抽出と重複判定が済んだ画像を記録する（record_frames + record_dedupe）。"""
+        self.record_frames(shots, keys, merged)
+        self.record_dedupe(keys, merged, mode, distance)
+
+    def frame_hashes(self) -> Dict[str, Optional[str]]:
+        return {name: entry.get("sha256") for name, entry in (self.stages.get("frames") or {}).items()}
+
+    # --- 4) Markdown / 5) PDF ---
+    def output_current(self, stage: str, path: Union[str, Path], inputs: Any) -> bool:
+        entry = self.stages.get(stage)
+        p = Path(path)
+        return bool(
+            entry
+            and entry.get("inputs") == _digest(inputs)
+            and p.exists()
+            and entry.get("sha256") == file_sha256(p)
+        )
+
+    def record_output(self, stage: str, path: Union[str, Path], inputs: Any) -> None:
+        self.stages[stage] = {"path": str(path), "inputs": _digest(inputs), "sha256": file_sha256(path)}
+        self.save()
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from json_extract import extract_json_object
+from llm_scheduler import LLMCallStats
+
+C = TypeVar("C")  # ProviderConfig（main.py / server/main.py それぞれの定義。provider / model_name を持つ）
+
+# p95 が計算できるまで（計測が HEDGE_MIN_SAMPLES 件未満）の、ヘッジを送るまでの待ち時間
+DEFAULT_HEDGE_AFTER_SECONDS = 90.0
+HEDGE_MIN_SAMPLES = 5
+LATENCY_WINDOW = 50
+
+# フォールバック先ごとの既定値（LLM_<PROVIDER>_MODEL / _BASE_URL / _API_KEY で上書き）
+_FALLBACK_DEFAULTS: Dict[str, Dict[str, Optional[str]]] = {
+    "gemini": {"model_name": "models/gemini-2.5-flash", "base_url": None},
+    "openai": {"model_name": "gpt-4o-mini", "base_url": "https://api.openai.com/v1"},
+    "ollama": {"model_name": "llama3.1", "base_url": "http://localhost:11434/v1"},
+}
+_FALLBACK_KEY_ENVS = {
+    "gemini": ("GOOGLE_API_KEY", "GEMINI_API_KEY", "GENAI_API_KEY"),
+    "openai": ("OPENAI_API_KEY",),
+    "ollama": (),
+}
+
+
+def fallback_provider_settings() -> List[Dict[str, Optional[str]]]:
+    """LLM_FALLBACK_PROVIDERS（例: "ollama" / "openai,ollama"）の順に、ProviderConfig の引数を返す。
+
+    各プロバイダの設定は LLM_<PROVIDER>_MODEL / LLM_<PROVIDER>_BASE_URL / LLM_<PROVIDER>_API_KEY。
+    API キーが必要なのに見つからないプロバイダは警告して除く。
+    """
+    settings: List[Dict[str, Optional[str]]] = []
+    for name in (os.getenv("LLM_FALLBACK_PROVIDERS") or "").split(","):
+        provider = name.strip().lower()
+        if not provider:
+            continue
+        if provider not in _FALLBACK_DEFAULTS:
+            print(f"未対応のフォールバック先です（無視します）: {provider}", file=sys.stderr)
+            continue
+        prefix = f"LLM_{provider.upper()}_"
+        api_key = os.getenv(prefix + "API_KEY") or next(
+            (os.getenv(env) for env in _FALLBACK_KEY_ENVS[provider] if os.getenv(env)), None
+        )
+        if provider == "ollama":
+            api_key = api_key or "ollama"  # ダミー
+        elif not api_key:
+            print(f"フォールバック先 {provider} の API キーがないため使用しません（{prefix}API_KEY）", file=sys.stderr)
+            continue
+        settings.append(
+            {
+                "provider": provider,
+                "base_url": os.getenv(prefix + "BASE_URL") or _FALLBACK_DEFAULTS[provider]["base_url"],
+                "model_name": os.getenv(prefix + "MODEL") or _FALLBACK_DEFAULTS[provider]["model_name"],
+                "api_key": api_key,
+            }
+        )
+    return settings
+
+
+def hedging_enabled() -> bool:
+    """LLM_HEDGE=1 ならヘッジ（期限内に応答がなければフォールバック先へも並行して送る）を既定で有効にする。"""
+    return (os.getenv("LLM_HEDGE") or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+class LatencyTracker:
+    """provider/model ごとの直近の応答時間（成功したもの）から、ヘッジを送るまでの期限を決める。"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, model: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault((provider, model), deque(maxlen=self._window)).append(seconds)
+
+    def p95(self, provider: str, model: str) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get((provider, model)) or [])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def hedge_after(self, provider: str, model: str) -> float:
+        """p95（計測不足なら LLM_HEDGE_AFTER_SECONDS、既定 90 秒）。"""
+        p95 = self.p95(provider, model)
+        if p95 is not None:
+            return p95
+        raw = os.getenv("LLM_HEDGE_AFTER_SECONDS")
+        try:
+            return float(raw) if raw else DEFAULT_HEDGE_AFTER_SECONDS
+        except ValueError:
+            print(f"LLM_HEDGE_AFTER_SECONDS が不正です（既定値を使用）: {raw}", file=sys.stderr)
+            return DEFAULT_HEDGE_AFTER_SECONDS
+
+
+LATENCY = LatencyTracker()
+
+
+def is_valid_spec(text: str) -> bool:
+    """応答本文から spec（JSON オブジェクト）を取り出せるか。"""
+    return isinstance(extract_json_object(text or ""), dict)
+
+
+def _label(cfg: Any) -> str:
+    return f"{cfg.provider}/{cfg.model_name}"
+
+
+def generate_with_fallback(
+    chain: Sequence[C],
+    generate: Callable[[C], str],
+    hedge: bool = False,
+    stats: Optional[LLMCallStats] = None,
+    tracker: LatencyTracker = LATENCY,
+) -> Tuple[str, C]:
+    """chain の先頭から順に generate(cfg) を試し、有効な JSON spec を返した最初の応答と、その cfg を返す。
+
+    失敗（リトライ後の例外）や JSON を取り出せない応答なら次のプロバイダへ進む。
+    hedge=True なら、先頭がその provider/model の p95 応答時間を過ぎても返らない時点で次のプロバイダへも並行して送り、
+    先に有効な spec を返した方を採用する（遅れた方の呼び出しは中断できないため、バックグラウンドで完了を待たずに捨てる）。
+    すべて失敗したら最後の例外を投げる。
+    """
+    if not chain:
+        raise ValueError("LLM プロバイダが 1 つもありません")
+    if len(chain) == 1:
+        # フォールバック先がなければ従来どおり呼び出し元のスレッドで 1 回呼ぶ（JSON の検証は後段で行う）
+        started = time.perf_counter()
+        text = generate(chain[0])
+        tracker.record(chain[0].provider, chain[0].model_name, time.perf_counter() - started)
+        if stats is not None:
+            stats.answered_by = _label(chain[0])
+        return text, chain[0]
+    pool = ThreadPoolExecutor(max_workers=len(chain), thread_name_prefix="llm-fallback")
+    pending: Dict[Future, C] = {}
+    next_index = 0
+    last_error: Optional[BaseException] = None
+
+    def launch() -> None:
+        nonlocal next_index
+        cfg = chain[next_index]
+        next_index += 1
+        started = time.perf_counter()
+
+        def run() -> str:
+            text = generate(cfg)
+            if not is_valid_spec(text):
+                raise ValueError(f"{_label(cfg)} の応答から有効なJSONを抽出できませんでした")
+            tracker.record(cfg.provider, cfg.model_name, time.perf_counter() - started)
+            return text
+
+        pending[pool.submit(run)] = cfg
+
+    try:
+        launch()
+        while pending:
+            timeout = None
+            if hedge and next_index < len(chain) and len(pending) == 1:
+                primary = next(iter(pending.values()))
+                timeout = tracker.hedge_after(primary.provider, primary.model_name)
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # 期限切れ: 次のプロバイダへヘッジを送る（先頭の呼び出しはそのまま待ち続ける）
+                print(
+                    f"{_label(primary)} が {timeout:.1f}s 以内に応答しないため、{_label(chain[next_index])} へも送信します",
+                    file=sys.stderr,
+                )
+                if stats is not None:
+                    stats.add(hedged=1)
+                launch()
+                continue
+            for future in done:
+                cfg = pending.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    last_error = e
+                    print(f"{_label(cfg)} の呼び出しに失敗しました: {e}", file=sys.stderr)
+                    continue
+                if stats is not None:
+                    stats.answered_by = _label(cfg)
+                    stats.add(fallbacks=chain.index(cfg))
+                return text, cfg
+            if not pending and next_index < len(chain):
+                print(f"LLM を {_label(chain[next_index])} へフォールバックします", file=sys.stderr)
+                launch()
+        raise last_error or RuntimeError("LLM の応答を得られませんでした")
+    finally:
+        pool.shutdown(wait=False)
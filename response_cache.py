@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+from extract_screenshot import default_cache_dir, file_sha256
+from frame_sampling import frame_sampling_variant
+from scene_detect import scene_hint_variant
+from video_proxy import ProxySettings
+
+
+# 既定: 7 日で失効、合計 256MB を超えたら古い（最終利用が古い）ものから削除
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _env_number(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        print(f"{name} が不正です（既定値を使用）: {raw}", file=sys.stderr)
+        return default
+
+
+def generation_variant(
+    proxy: Optional[ProxySettings] = None, chunk_minutes: float = 0.0, provider: str = ""
+) -> str:
+    """LLM 入力を変える設定（プロキシ・分割・場面検出のヒント・コンタクトシート）を応答キャッシュのキーに含める文字列にする。
+
+    CLI / MCP サーバー / Streamlit で共通（cached_generate の variant に渡す）。
+    コンタクトシートは Gemini 以外（動画の代わりに画像を送るプロバイダ）のときだけ含める。
+    """
+    parts = ([proxy.tag()] if proxy else []) + ([f"chunk{chunk_minutes:g}m"] if chunk_minutes > 0 else [])
+    parts.append(scene_hint_variant())
+    if provider and provider != "gemini":
+        parts.append(frame_sampling_variant())
+    return "+".join(part for part in parts if part)
+
+
+class ResponseCache:
+    """LLM 応答のディスクキャッシュ。
+
+    キーは (動画内容の SHA-256, プロンプト, プロバイダ, モデル名)。
+    1 エントリ = 1 JSON ファイルで保存し、TTL 超過と合計サイズ超過（LRU）で削除する。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Union[str, Path]] = None,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir() / "responses"
+        self.ttl_seconds = (
+            ttl_seconds if ttl_seconds is not None
+            else _env_number("MOVIE2MANUAL_CACHE_TTL", DEFAULT_TTL_SECONDS)
+        )
+        self.max_bytes = int(
+            max_bytes if max_bytes is not None
+            else _env_number("MOVIE2MANUAL_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024) * 1024 * 1024
+        )
+
+    @staticmethod
+    def make_key(video_sha256: str, prompt: str, provider: str, model_name: str, variant: str = "") -> str:
+        # variant（プロキシ動画の設定など）は指定時のみキーに含める（既存エントリのキーを変えない）
+        parts = [video_sha256, prompt, provider, model_name] + ([variant] if variant else [])
+        payload = json.dumps(parts, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if self.ttl_seconds > 0 and time.time() - float(entry.get("created_at", 0)) > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            return None
+        # 最終利用時刻を mtime に記録（LRU 削除の順序に使う）
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        # 同じキーを複数スレッドが同時に書いても一時ファイルが衝突しないようにする（置き換えは os.replace で不可分）
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """TTL 切れを削除し、合計サイズが上限を超える分を最終利用の古い順に削除する。"""
+        if not self.cache_dir.exists():
+            return
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if self.ttl_seconds > 0 and now - st.st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def cached_generate(
+    cache: Optional[ResponseCache],
+    video_file_name: str,
+    prompt: str,
+    provider: str,
+    model_name: str,
+    generate: Callable[[], str],
+    refresh: bool = False,
+    variant: str = "",
+    cacheable: Optional[Callable[[], bool]] = None,
+) -> str:
+    """キャッシュにあれば LLM を呼ばずに応答を返し、なければ generate() の結果を保存して返す。
+
+    cache が None なら常に generate() を呼ぶ（--no-cache）。refresh=True なら既存エントリを無視して上書きする。
+    プロンプト中の動画パスはキー計算時にプレースホルダへ戻す（同じ動画を別パス・一時ファイルで渡しても当たるように）。
+    ヒット時は応答中の旧パスを今回のパスへ置き換える。
+    variant には LLM への入力を変える設定（プロキシ動画の設定など）を渡し、元動画が同じでも別エントリにする。
+    cacheable は generate() の後に呼び、False なら保存しない（provider / model 以外のフォールバック先が答えた応答など）。
+    """
+    if cache is None:
+        return generate()
+
+    video_sha256 = file_sha256(video_file_name)
+    normalized_prompt = prompt.replace(video_file_name, "{video_file_name}")
+    key = cache.make_key(video_sha256, normalized_prompt, provider, model_name, variant)
+
+    if not refresh:
+        entry = cache.get(key)
+        if entry is not None:
+            print(f"LLM 応答キャッシュを使用します: {key[:12]}", file=sys.stderr)
+            text = str(entry.get("response_text", ""))
+            old_path = entry.get("video")
+            if old_path and old_path != video_file_name:
+                # JSON 文字列中の表現（エスケープ済み）同士で置換する
+                text = text.replace(json.dumps(old_path)[1:-1], json.dumps(video_file_name)[1:-1])
+            return text
+
+    text = generate()
+    if cacheable is not None and not cacheable():
+        print("フォールバック先の応答のため、LLM 応答キャッシュには保存しません", file=sys.stderr)
+        return text
+    try:
+        cache.put(
+            key,
+            {
+                "created_at": time.time(),
+                "video": video_file_name,
+                "video_sha256": video_sha256,
+                "provider": provider,
+                "model_name": model_name,
+                "response_text": text,
+            },
+        )
+    except OSError as e:
+        print(f"LLM 応答キャッシュを保存できませんでした: {e}", file=sys.stderr)
+    return text
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+場面検出スクリプト
+
+機能概要:
+- 動画を 1 回だけデコードし（縮小グレースケールを ffmpeg からパイプで受け取る）、
+  連続フレームの平均絶対差と SSIM を NumPy で一括計算して、画面が静止している区間を検出する
+- 各静止区間から 1 つずつ、スクリーンショットに適した時刻（候補）を出力する
+- 候補は build_prompt へのヒント（MOVIE2MANUAL_SCENE_HINTS）や、LLM が選んだ時刻の補正に使える
+- ヒント用の検出結果は動画内容の SHA-256 ごとにキャッシュし（キャッシュ先の scenes/）、2 回目以降はデコードしない
+
+使い方:
+  python scene_detect.py --video ./input.mp4
+  python scene_detect.py --video ./input.mp4 --sample-fps 4 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional, Union
+
+from extract_screenshot import default_cache_dir, ensure_dir, file_sha256, format_timecode
+from video_frames import frame_differences, frame_ssim, iter_frame_blocks, probe_video, scaled_size
+
+
+DEFAULT_SAMPLE_FPS = 4.0
+DEFAULT_WIDTH = 160
+# 静止とみなす条件: 直前フレームとの平均絶対差（0〜255）が小さく、かつ SSIM が高い
+STABLE_DIFF = 1.0
+STABLE_SSIM = 0.98
+MIN_STABLE_SECONDS = 0.75
+
+
+@dataclass
+class StableFrame:
+    time: float  # スクリーンショット候補の時刻（静止区間の開始から少し後）
+    start: float  # 静止区間の開始
+    end: float  # 静止区間の終了
+    change: float  # 区間直前の変化量（平均絶対差の最大値）
+
+
+def detect_stable_frames(
+    video: str,
+    sample_fps: float = DEFAULT_SAMPLE_FPS,
+    width: int = DEFAULT_WIDTH,
+    stable_diff: float = STABLE_DIFF,
+    stable_ssim: float = STABLE_SSIM,
+    min_stable_seconds: float = MIN_STABLE_SECONDS,
+) -> List[StableFrame]:
+    """動画全体を 1 パスで走査し、静止区間ごとの候補時刻を返す。
+
+    静止区間は「直前フレームとの差分・SSIM がともに閾値内」のサンプルが
+    min_stable_seconds 以上続いた範囲。候補時刻は区間開始から min_stable_seconds / 2 後
+    （遷移アニメーションの直後を避けつつ、次の操作より前）。
+    """
+    info = probe_video(video)
+    w, h = scaled_size(info, width)
+    min_samples = max(2, int(round(min_stable_seconds * sample_fps)))
+
+    results: List[StableFrame] = []
+    previous = None
+    run_start: Optional[float] = None
+    run_length = 0
+    last_time = 0.0
+    change = 0.0  # 直近の静止区間以降に観測した最大の差分
+
+    def close_run() -> None:
+        if run_start is not None and run_length >= min_samples:
+            offset = min(min_stable_seconds / 2, (last_time - run_start) / 2)
+            results.append(StableFrame(run_start + offset, run_start, last_time, change))
+
+    for times, frames in iter_frame_blocks(video, sample_fps, w, h, gray=True):
+        diffs = frame_differences(frames, previous)
+        ssims = frame_ssim(frames, previous)
+        previous = frames[-1].copy()
+        stable = (diffs < stable_diff) & (ssims > stable_ssim)
+        for t, d, is_stable in zip(times.tolist(), diffs.tolist(), stable.tolist()):
+            if is_stable:
+                if run_start is None:
+                    run_start, run_length = last_time, 1  # 直前のサンプルから静止している
+                run_length += 1
+            else:
+                close_run()
+                if run_start is not None and run_length >= min_samples:
+                    change = 0.0
+                run_start, run_length = None, 0
+                if d != float("inf"):
+                    change = max(change, d)
+            last_time = t
+    close_run()
+    return results
+
+
+def load_stable_frames(video: str, cache_dir: Optional[Union[str, Path]] = None) -> List[StableFrame]:
+    """動画内容の SHA-256 をキーに（既定の設定での）静止区間をキャッシュし、2 回目以降はデコードを省略する。"""
+    index_dir = Path(cache_dir) if cache_dir else default_cache_dir() / "scenes"
+    index_path = index_dir / f"{file_sha256(video)}.json"
+    if index_path.exists():
+        try:
+            return [StableFrame(**f) for f in json.loads(index_path.read_text(encoding="utf-8"))["frames"]]
+        except Exception:
+            pass  # 壊れた索引は作り直す
+    frames = detect_stable_frames(video)
+    try:
+        ensure_dir(index_dir)
+        index_path.write_text(
+            json.dumps({"video": str(video), "frames": [asdict(f) for f in frames]}), encoding="utf-8"
+        )
+    except OSError as e:
+        print(f"静止区間の索引を保存できませんでした: {e}", file=sys.stderr)
+    return frames
+
+
+def candidate_times(frames: List[StableFrame], max_candidates: int = 0) -> List[float]:
+    """候補時刻を返す。max_candidates > 0 なら直前の変化が大きい順に絞り込み、時刻順に並べ直す。"""
+    chosen = frames
+    if max_candidates > 0 and len(frames) > max_candidates:
+        chosen = sorted(frames, key=lambda f: f.change, reverse=True)[:max_candidates]
+    return sorted(f.time for f in chosen)
+
+
+def scene_hint_count() -> int:
+    """MOVIE2MANUAL_SCENE_HINTS（プロンプトに添える候補時刻の最大数）。0 ならヒントを付けない。"""
+    raw = os.getenv("MOVIE2MANUAL_SCENE_HINTS") or "0"
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        print(f"MOVIE2MANUAL_SCENE_HINTS が不正です（無効化します）: {raw}", file=sys.stderr)
+        return 0
+
+
+SCENE_NOTE = (
+    "参考: 動画を解析した結果、次の時刻では画面が静止しています（遷移アニメーションの途中ではありません）。"
+    "screenshots[].time はできるだけこれらの時刻から選んでください: "
+)
+
+
+def scene_hint_variant() -> str:
+    """ヒントの有無・件数を応答キャッシュのキーに含める文字列（ヒントなしなら空文字）。
+
+    ヒントは動画の内容と件数で決まるため、キャッシュの照合にはプロンプトを組み立てずにこの文字列を使う。
+    """
+    count = scene_hint_count()
+    return f"scenes{count}" if count > 0 else ""
+
+
+def scene_hint_for_prompt(video: str, start: float = 0.0, end: Optional[float] = None) -> str:
+    """MOVIE2MANUAL_SCENE_HINTS が設定されていれば候補時刻の注記を返す（未設定・検出失敗時は空文字）。
+
+    静止区間は load_stable_frames で動画ごとにキャッシュする。start / end を指定すると
+    その範囲の候補だけを start からの相対時刻で返す（分割した区間のプロンプト用。元動画の検出結果を使い回す）。
+    """
+    count = scene_hint_count()
+    if count <= 0 or not os.path.exists(video):
+        return ""
+    try:
+        frames = load_stable_frames(video)
+    except Exception as e:
+        print(f"場面検出に失敗しました（ヒントなしで続行します）: {e}", file=sys.stderr)
+        return ""
+    frames = [f for f in frames if f.time >= start and (end is None or f.time < end)]
+    times = [t - start for t in candidate_times(frames, count)]
+    if not times:
+        return ""
+    print(f"静止区間の候補時刻: {len(times)} 件", file=sys.stderr)
+    return SCENE_NOTE + ", ".join(format_timecode(t) for t in times)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="動画の静止区間を検出しスクリーンショット候補の時刻を出力")
+    parser.add_argument("--video", required=True, help="入力動画ファイルパス")
+    parser.add_argument("--sample-fps", type=float, default=DEFAULT_SAMPLE_FPS, help="解析するフレームレート")
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH, help="解析用に縮小する幅（px）")
+    parser.add_argument("--min-stable", type=float, default=MIN_STABLE_SECONDS, help="静止とみなす最短秒数")
+    parser.add_argument("--json", action="store_true", help="JSON で出力する")
+    args = parser.parse_args()
+
+    try:
+        frames = detect_stable_frames(
+            args.video, sample_fps=args.sample_fps, width=args.width, min_stable_seconds=args.min_stable
+        )
+    except Exception as e:
+        print(f"場面検出でエラー: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps([asdict(f) for f in frames], ensure_ascii=False, indent=2))
+    else:
+        for f in frames:
+            print(f"{format_timecode(f.time)}\t{format_timecode(f.start)}-{format_timecode(f.end)}\tchange={f.change:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from extract_screenshot import ScreenshotSpec
+from video_frames import require_numpy
+
+
+# 重複判定の方式:
+# - off  : 判定しない
+# - flag : 重複を標準エラーに報告するだけ（ファイルはそのまま）
+# - merge: 重複した画像を削除し、直前の（残した）画像を参照させる
+DEDUPE_MODES = ("off", "flag", "merge")
+# dHash（64 ビット）のハミング距離がこれ以下なら同一画面とみなす
+DEFAULT_DEDUPE_DISTANCE = 5
+HASH_SIZE = 8
+# 1 回の ffmpeg 起動で読む画像の枚数（コマンドラインの長さを抑える）
+HASH_BATCH = 64
+
+
+def dhash(frames: "object") -> "object":
+    """(HASH_SIZE + 1) x HASH_SIZE に縮小したグレースケール [N,H,W+1] から dHash [N, H*W] (bool) をまとめて計算する。"""
+    numpy = require_numpy()
+    x = numpy.asarray(frames)
+    return (x[:, :, 1:] > x[:, :, :-1]).reshape(len(x), -1)
+
+
+def hash_images(paths: List[Path]) -> List[Optional["object"]]:
+    """書き出した画像を ffmpeg で 9x8 のグレースケールに縮小して読み、dHash を返す。
+
+    抽出方式・時刻補正・出力形式によらず、判定はディスク上の画像そのもので行う。
+    HASH_BATCH 枚ずつ 1 回の ffmpeg 起動でまとめて読み、読めない画像を含む組は 1 枚ずつ読み直す。
+    ファイルが無い・読めない要素は None。
+    """
+    numpy = require_numpy()
+    hashes: List[Optional["object"]] = [None] * len(paths)
+    present = [i for i, p in enumerate(paths) if p.is_file() and p.stat().st_size > 0]
+    for start in range(0, len(present), HASH_BATCH):
+        group = present[start:start + HASH_BATCH]
+        frames = _read_hash_images([paths[i] for i in group])
+        if frames is None:
+            frames = [(_read_hash_images([paths[i]]) or [None])[0] for i in group]
+        found = [(i, f) for i, f in zip(group, frames) if f is not None]
+        if found:
+            for (i, _), h in zip(found, dhash(numpy.stack([f for _, f in found]))):
+                hashes[i] = h
+    return hashes
+
+
+def _read_hash_images(paths: List[Path]) -> Optional[List["object"]]:
+    """画像を (HASH_SIZE + 1) x HASH_SIZE のグレースケールで読む（1 枚でも読めなければ None）。"""
+    numpy = require_numpy()
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin"]
+    for path in paths:
+        cmd += ["-i", str(path)]
+    graph = [
+        f"[{i}:v]scale={HASH_SIZE + 1}:{HASH_SIZE}:flags=area,format=gray,setsar=1[h{i}]"
+        for i in range(len(paths))
+    ]
+    graph.append("".join(f"[h{i}]" for i in range(len(paths))) + f"concat=n={len(paths)}:v=1:a=0[out]")
+    cmd += ["-filter_complex", ";".join(graph), "-map", "[out]", "-f", "rawvideo", "pipe:1"]
+    completed = subprocess.run(cmd, check=False, capture_output=True)
+    frame_bytes = (HASH_SIZE + 1) * HASH_SIZE
+    if completed.returncode != 0 or len(completed.stdout) != frame_bytes * len(paths):
+        return None
+    frames = numpy.frombuffer(completed.stdout, dtype=numpy.uint8).reshape(len(paths), HASH_SIZE, HASH_SIZE + 1)
+    return list(frames)
+
+
+def find_duplicates(hashes: List[Optional["object"]], max_distance: int) -> Dict[int, int]:
+    """直前に残した画像とのハミング距離が max_distance 以下の要素を {重複の添字: 残す添字} で返す。
+
+    連続して変化のない画面は、最初の 1 枚にまとめられる。
+    """
+    numpy = require_numpy()
+    duplicates: Dict[int, int] = {}
+    kept: Optional[int] = None
+    for i, h in enumerate(hashes):
+        if h is None:
+            kept = None
+            continue
+        if kept is not None and int(numpy.count_nonzero(h != hashes[kept])) <= max_distance:
+            duplicates[i] = kept
+            continue
+        kept = i
+    return duplicates
+
+
+def dedupe_screenshots(
+    output_dir: Union[str, Path],
+    screenshots: List[ScreenshotSpec],
+    max_distance: int = DEFAULT_DEDUPE_DISTANCE,
+    mode: str = "merge",
+) -> Dict[str, str]:
+    """抽出済みスクリーンショットのうち直前とほぼ同じ画面のものを {重複ファイル名: 残すファイル名} で返す。
+
+    判定は output_dir に書き出した画像（hash_images）で行うため、削除・参照の差し替えの対象と同じ画素を比べる。
+
+    mode="merge" なら重複ファイルを削除する（参照の書き換えは rewrite_image_refs で行う）。
+    mode="flag" なら報告のみ。判定に失敗した場合は警告を出して空の dict を返す。
+    """
+    if mode not in DEDUPE_MODES:
+        raise ValueError(f"未対応の重複判定方式です: {mode}（{', '.join(DEDUPE_MODES)}）")
+    shots = list(screenshots or [])
+    if mode == "off" or len(shots) < 2:
+        return {}
+    try:
+        paths = [Path(output_dir) / s.filename for s in shots]
+        duplicates = find_duplicates(hash_images(paths), max_distance)
+    except Exception as e:
+        print(f"重複判定に失敗しました（全画像を残します）: {e}", file=sys.stderr)
+        return {}
+
+    merged: Dict[str, str] = {}
+    for i, kept in sorted(duplicates.items()):
+        dup, keep = shots[i].filename, shots[kept].filename
+        if dup == keep:
+            continue
+        print(f"重複したスクリーンショット: {dup} は {keep} とほぼ同じです", file=sys.stderr)
+        if mode == "merge":
+            (Path(output_dir) / dup).unlink(missing_ok=True)
+        merged[dup] = keep
+    return merged
+
+
+_IMAGE_LINK = re.compile(r"(!\[[^\]]*\]\()([^)\s]+)")
+
+
+def rewrite_image_refs(markdown: str, merged: Dict[str, str]) -> str:
+    """Markdown の画像参照 ![...](path) のうち、ファイル名が merged のキーのものを残す画像へ差し替える。"""
+    if not merged:
+        return markdown
+
+    def replace(m: "re.Match[str]") -> str:
+        target = m.group(2)
+        head, sep, name = target.rpartition("/")
+        if name not in merged:
+            return m.group(0)
+        return m.group(1) + head + sep + merged[name]
+
+    return _IMAGE_LINK.sub(replace, markdown)
@@ -1,16 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
-import re
 import sys
-import tempfile
-import urllib.request
-from contextlib import contextmanager, redirect_stdout
-from dataclasses import dataclass
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
 
+import anyio
 from fastmcp import FastMCP, Context
 from google import genai
 from google.genai import types
@@ -26,14 +27,34 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 root_str = str(PROJECT_ROOT)
 if root_str not in sys.path:
     sys.path.insert(0, root_str)
-from extract_screenshot import ScreenshotSpec, extract_screenshots  # type: ignore
+import extract_screenshot  # type: ignore
+from extract_screenshot import OutputOptions, file_sha256, output_filename  # type: ignore
+from frame_sampling import ContactSheet, openai_user_content, sample_for_prompt  # type: ignore
+from gemini_files import video_part  # type: ignore
+from json_extract import extract_json_object  # type: ignore
+from streaming_generation import ExtractedKey, generate_with_early_extraction  # type: ignore
 from pdf_export import convert_markdown_to_pdf  # type: ignore
+from scene_detect import scene_hint_for_prompt  # type: ignore
+from screenshot_dedup import DEFAULT_DEDUPE_DISTANCE, DEDUPE_MODES  # type: ignore
+from response_cache import ResponseCache, cached_generate, generation_variant  # type: ignore
+from video_proxy import llm_video_for, proxy_settings_from_env  # type: ignore
+from chunked_generation import DEFAULT_CHUNK_WORKERS, Segment, generate_chunked, segment_prompt_note  # type: ignore
+from video_download import DownloadResult, download_video  # type: ignore
+from llm_clients import get_client, refresh_clients  # type: ignore
+from llm_scheduler import LLMCallStats, scheduled_call, scheduled_stream  # type: ignore
+from provider_fallback import fallback_provider_settings, generate_with_fallback, hedging_enabled  # type: ignore
+from pipeline_checkpoint import CHECKPOINT_FILE, Checkpoint, spec_record  # type: ignore
+from manual_spec import Spec, handle_response_and_extract  # type: ignore
 
 
 # チュートリアル準拠の最小構成: グローバル mcp に直接ツールを登録
 # 参考: https://github.com/jlowin/fastmcp/blob/main/docs/tutorials/create-mcp-server.mdx
 mcp = FastMCP("movie2manual")
 
+# STDIO トランスポートでは標準出力がプロトコル用のため、ffmpeg コマンドのログは標準エラーへ。
+# （redirect_stdout はプロセス全体の sys.stdout を差し替えるため、並行実行するツールでは使わない）
+extract_screenshot.COMMAND_LOG_STREAM = sys.stderr
+
 
 @contextmanager
 def _override_env(var: str, value: Optional[str]):
@@ -53,12 +74,22 @@ def _override_env(var: str, value: Optional[str]):
             os.environ[var] = prev
 
 
-def _download_to_tmp(url: str) -> str:
-    suffix = os.path.splitext(url.split("?")[0].split("#")[0])[1] or ".mp4"
-    fd, tmp_path = tempfile.mkstemp(prefix="movie2manual_", suffix=suffix)
-    os.close(fd)
-    urllib.request.urlretrieve(url, tmp_path)
-    return tmp_path
+async def _download_video(url: str, ctx: Optional[Context]) -> DownloadResult:
+    """URL の動画をワーカースレッドでストリーミング取得し、進捗を ctx へ送る（約 5% ごと）。"""
+    last_reported = [-1]
+
+    def on_progress(received: int, total: Optional[int]) -> None:
+        if ctx is None:
+            return
+        step = received * 20 // total if total else received // (64 * 1024 * 1024)
+        if step == last_reported[0]:
+            return
+        last_reported[0] = step
+        mb = received / 1024 / 1024
+        message = f"downloading... {mb:.1f} MB" + (f" / {total / 1024 / 1024:.1f} MB" if total else "")
+        anyio.from_thread.run(_safe_ctx_log, ctx, "info", message)
+
+    return await anyio.to_thread.run_sync(lambda: download_video(url, progress=on_progress))
 
 # ===== ルート main.py 相当の最低限の実装を内包（依存削減のため） =====
 DEFAULT_MODEL_NAME = "models/gemini-2.5-flash"
@@ -124,14 +155,23 @@ def get_provider_config() -> ProviderConfig:
     return ProviderConfig(provider=provider, base_url=base_url, model_name=model_name, api_key=api_key)
 
 
+def provider_chain(cfg: ProviderConfig) -> List[ProviderConfig]:
+    """cfg の後に LLM_FALLBACK_PROVIDERS の設定を順に並べたリスト（同じ provider/model は除く）。"""
+    chain = [cfg]
+    for settings in fallback_provider_settings():
+        fallback = ProviderConfig(**settings)
+        if all((c.provider, c.model_name) != (fallback.provider, fallback.model_name) for c in chain):
+            chain.append(fallback)
+    return chain
+
+
 def create_gemini_client(api_key: str) -> genai.Client:
-    return genai.Client(api_key=api_key)
+    # プロセス共有のクライアント（接続プール）を返す。API キーが変われば作り直される
+    return get_client("gemini", api_key)
 
 
-def create_openai_compatible_client(api_key: str, base_url: Optional[str]) -> OpenAI:
-    if base_url:
-        return OpenAI(api_key=api_key or "", base_url=base_url)
-    return OpenAI(api_key=api_key or "")
+def create_openai_compatible_client(api_key: str, base_url: Optional[str], provider: str = "openai") -> OpenAI:
+    return get_client(provider, api_key or "", base_url)
 
 
 PROMPT_TEMPLATE = """
@@ -168,24 +208,33 @@ PROMPT_TEMPLATE = """
 """
 
 
-def build_prompt(video_file_name: str) -> str:
+def base_prompt(video_file_name: str) -> str:
+    """ヒントを添える前のプロンプト（応答キャッシュのキーに使う。ヒントの設定は generation_variant でキーに含める）。"""
     return PROMPT_TEMPLATE.replace("{video_file_name}", video_file_name)
 
 
+def build_prompt(
+    video_file_name: str, scene_video: str = "", start: float = 0.0, end: Optional[float] = None
+) -> str:
+    prompt = base_prompt(video_file_name)
+    # MOVIE2MANUAL_SCENE_HINTS が設定されていれば、静止区間の候補時刻を添える
+    # （分割時は元動画 scene_video の検出結果から区間 start〜end の分を使う。検出結果は動画ごとにキャッシュされる）
+    hint = scene_hint_for_prompt(scene_video or video_file_name, start, end)
+    return prompt + "\n" + hint + "\n" if hint else prompt
+
+
 def read_video_bytes(video_file_name: str) -> bytes:
     with open(video_file_name, "rb") as f:
         return f.read()
 
 
-def generate_response_text_gemini(client: genai.Client, video_file_name: str, prompt: str, model_name: str) -> str:
-    video_bytes = read_video_bytes(video_file_name)
+def generate_response_text_gemini(client: genai.Client, part: types.Part, prompt: str, model_name: str) -> str:
+    # part は video_part で用意した動画（大きな動画は Files API 経由。リトライのたびにアップロードし直さない）
     response = client.models.generate_content(
         model=model_name,
         contents=types.Content(
             parts=[
-                types.Part(
-                    inline_data=types.Blob(data=video_bytes, mime_type='video/mp4')
-                ),
+                part,
                 types.Part(text=prompt),
             ]
         ),
@@ -193,120 +242,119 @@ def generate_response_text_gemini(client: genai.Client, video_file_name: str, pr
     return response.text
 
 
-def generate_response_text_openai(client: OpenAI, prompt: str, model_name: str) -> str:
+def generate_response_text_openai(
+    client: OpenAI, prompt: str, model_name: str, sheets: Optional[List[ContactSheet]] = None
+) -> str:
+    # 動画の代わりに場面転換フレームのコンタクトシートを添付（MOVIE2MANUAL_FRAME_TOKEN_BUDGET 設定時）
     completion = client.chat.completions.create(
         model=model_name,
         messages=[
             {"role": "system", "content": "You are a helpful AI that outputs valid JSON only."},
-            {"role": "user", "content": prompt},
+            {"role": "user", "content": openai_user_content(prompt, sheets or [])},
         ],
     )
     return completion.choices[0].message.content or ""
 
 
-def _extract_json_from_text(text: str):
-    def escape_newlines_in_json_strings(s: str) -> str:
-        result_chars = []
-        in_string = False
-        escape = False
-        for ch in s:
-            if in_string:
-                if escape:
-                    result_chars.append(ch)
-                    escape = False
-                    continue
-                if ch == "\\":
-                    result_chars.append(ch)
-                    escape = True
-                    continue
-                if ch == "\n":
-                    result_chars.append("\\n")
-                    continue
-                if ch == "\r":
-                    continue
-                if ch == '"':
-                    in_string = False
-                    result_chars.append(ch)
-                    continue
-                result_chars.append(ch)
-            else:
-                if ch == '"':
-                    in_string = True
-                    result_chars.append(ch)
-                else:
-                    result_chars.append(ch)
-        return "".join(result_chars)
+def generate_response_text(
+    cfg: ProviderConfig, video_file_name: str, prompt: str, stats: Optional[LLMCallStats] = None
+) -> str:
+    # レート制限・同時実行数の上限・429/5xx のリトライは llm_scheduler が行う（回数と待ち時間は stats へ）
+    if cfg.provider == "gemini":
+        if not cfg.api_key:
+            raise RuntimeError("Gemini 用 API キーがありません")
+        client = create_gemini_client(cfg.api_key)
+        # 動画の送信準備（アップロードと処理待ち）は 1 回だけ行い、リトライするのはモデルへのリクエストのみ
+        with video_part(client, video_file_name) as part:
+            return scheduled_call(
+                cfg.provider,
+                cfg.model_name,
+                lambda: generate_response_text_gemini(client, part, prompt, cfg.model_name),
+                stats,
+            )
+    client = create_openai_compatible_client(cfg.api_key or "", cfg.base_url, cfg.provider)
+    sheets = sample_for_prompt(video_file_name)  # コンタクトシートもリトライの外で 1 回だけ作る
+    return scheduled_call(
+        cfg.provider,
+        cfg.model_name,
+        lambda: generate_response_text_openai(client, prompt, cfg.model_name, sheets),
+        stats,
+    )
 
-    def try_load(candidate: str):
-        try:
-            return json.loads(candidate)
-        except Exception:
-            pass
-        try:
-            return json.loads(escape_newlines_in_json_strings(candidate))
-        except Exception:
-            return None
 
-    candidates = []
-    candidates.append(text)
-    fence_json = re.compile(r"```json\s*(\{[\s\S]*?\})\s*```", re.IGNORECASE)
-    candidates += fence_json.findall(text)
-    fence_any = re.compile(r"```\s*(\{[\s\S]*?\})\s*```", re.IGNORECASE)
-    candidates += fence_any.findall(text)
-    first = text.find("{")
-    last = text.rfind("}")
-    if first != -1 and last != -1 and last > first:
-        candidates.append(text[first:last+1])
-    for cand in candidates:
-        obj = try_load(cand)
-        if obj is not None:
-            return obj
-    return None
+def stream_response_text_gemini(client: genai.Client, part: types.Part, prompt: str, model_name: str) -> Iterator[str]:
+    for chunk in client.models.generate_content_stream(
+        model=model_name,
+        contents=types.Content(parts=[part, types.Part(text=prompt)]),
+    ):
+        if chunk.text:
+            yield chunk.text
 
 
-@dataclass
-class Spec:
-    video: str
-    output_dir: str = "./manual_assets"
-    markdown_output: str = "./manual.md"
-    title: str = "操作マニュアル"
-    author: str = ""
-    body_markdown: str = ""
-    screenshots: Optional[List[ScreenshotSpec]] = None
-
-    @staticmethod
-    def from_dict(d: Dict[str, Any]) -> "Spec":
-        shots = [ScreenshotSpec(**s) for s in d.get("screenshots", [])]
-        return Spec(
-            video=d.get("video", ""),
-            output_dir=d.get("output_dir", "./manual_assets"),
-            markdown_output=d.get("markdown_output", "./manual.md"),
-            title=d.get("title", "操作マニュアル"),
-            author=d.get("author", ""),
-            body_markdown=d.get("body_markdown", ""),
-            screenshots=shots,
+def stream_response_text_openai(
+    client: OpenAI, prompt: str, model_name: str, sheets: Optional[List[ContactSheet]] = None
+) -> Iterator[str]:
+    stream = client.chat.completions.create(
+        model=model_name,
+        messages=[
+            {"role": "system", "content": "You are a helpful AI that outputs valid JSON only."},
+            {"role": "user", "content": openai_user_content(prompt, sheets or [])},
+        ],
+        stream=True,
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _stream_with_video_part(
+    client: genai.Client, cfg: ProviderConfig, video_file_name: str, prompt: str, stats: Optional[LLMCallStats]
+) -> Iterator[str]:
+    # アップロードした動画はストリームを読み終えるまで残す（リトライは同じ part で行う）
+    with video_part(client, video_file_name) as part:
+        yield from scheduled_stream(
+            cfg.provider,
+            cfg.model_name,
+            lambda: stream_response_text_gemini(client, part, prompt, cfg.model_name),
+            stats,
         )
 
 
-def handle_response_and_extract(resp_text: str, default_video_file: str) -> None:
-    spec_dict = _extract_json_from_text(resp_text)
-    if spec_dict is None:
-        raise ValueError("モデル応答から有効なJSONを抽出できませんでした。")
-    spec = Spec.from_dict(spec_dict)
-    if not spec.video:
-        spec.video = default_video_file
+def stream_response_text(
+    cfg: ProviderConfig, video_file_name: str, prompt: str, stats: Optional[LLMCallStats] = None
+) -> Iterator[str]:
+    """generate_response_text のストリーミング版（生成された断片を順に返す。リトライは最初の断片を受け取るまで）。"""
+    if cfg.provider == "gemini":
+        if not cfg.api_key:
+            raise RuntimeError("Gemini 用 API キーがありません")
+        client = create_gemini_client(cfg.api_key)
+        return _stream_with_video_part(client, cfg, video_file_name, prompt, stats)
+    client = create_openai_compatible_client(cfg.api_key or "", cfg.base_url, cfg.provider)
+    sheets = sample_for_prompt(video_file_name)
+    return scheduled_stream(
+        cfg.provider,
+        cfg.model_name,
+        lambda: stream_response_text_openai(client, prompt, cfg.model_name, sheets),
+        stats,
+    )
+
+
+def _extract_json_from_text(text: str):
+    # 全文 / コードフェンス / 前後に説明文付き のいずれも 1 回の前方走査で抽出（文字列中の生改行も修復）
+    return extract_json_object(text)
+
+
+def parse_screenshot_policy(policy_json: str) -> Optional[OutputOptions]:
+    """screenshot_policy_json（例: {"max_width": 1280, "format": "webp", "quality": 80}）を OutputOptions にする。"""
+    if not policy_json:
+        return None
     try:
-        out_dir = Path(spec.output_dir)
-        out_dir.mkdir(parents=True, exist_ok=True)
-        md_path = out_dir / spec.markdown_output
-        md_path.write_text(spec.body_markdown or "", encoding="utf-8")
-    except Exception as e:
-        print(f"Markdown 保存でエラー: {e}", file=sys.stderr)
-    if not Path(spec.video).exists():
-        print(f"動画ファイルが見つかりません: {spec.video}", file=sys.stderr)
-        return
-    with redirect_stdout(sys.stderr):
-        extract_screenshots(spec.video, spec.output_dir, spec.screenshots or [])
+        policy_obj = json.loads(policy_json)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"screenshot_policy_json が JSON として不正です: {e}")
+    if not isinstance(policy_obj, dict):
+        raise ValueError("screenshot_policy_json はオブジェクトで指定してください")
+    return OutputOptions.from_dict(policy_obj)
 
 
 async def _safe_ctx_log(ctx: Optional[Context], level: str, message: str) -> None:
@@ -324,8 +372,39 @@ async def _safe_ctx_log(ctx: Optional[Context], level: str, message: str) -> Non
         return
 
 
-@mcp.tool
-async def build_manual_from_video(
+# ===== ステージ別の同時実行数制限 =====
+# LLM / ffmpeg / PDF の各ステージは CapacityLimiter でスレッド実行数を制限する。
+# 上限は環境変数で変更可能（MOVIE2MANUAL_LLM_CONCURRENCY 等）。
+STAGE_CONCURRENCY_ENV = {
+    "llm": ("MOVIE2MANUAL_LLM_CONCURRENCY", 2),
+    "ffmpeg": ("MOVIE2MANUAL_FFMPEG_CONCURRENCY", max(1, (os.cpu_count() or 2) // 2)),
+    "pdf": ("MOVIE2MANUAL_PDF_CONCURRENCY", 1),
+}
+STAGE_TOTAL = 4  # download → llm → ffmpeg → pdf
+_stage_limiters: Dict[str, anyio.CapacityLimiter] = {}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name) or default))
+    except ValueError:
+        return default
+
+
+def _stage_limiter(stage: str) -> anyio.CapacityLimiter:
+    # CapacityLimiter はイベントループ内でしか生成できないため遅延生成
+    limiter = _stage_limiters.get(stage)
+    if limiter is None:
+        env, default = STAGE_CONCURRENCY_ENV[stage]
+        limiter = anyio.CapacityLimiter(_env_int(env, default))
+        _stage_limiters[stage] = limiter
+    return limiter
+
+
+StageCallback = Callable[[str, int, str], Awaitable[None]]
+
+
+async def _build_manual(
     video_path: str = "",
     video_url: str = "",
     output_dir: str = "",
@@ -336,8 +415,28 @@ async def build_manual_from_video(
     safe_write: bool = False,
     export_pdf: bool = False,
     pdf_output: str = "",
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    stream: bool = False,
+    snap_times: bool = False,
+    dedupe: str = "off",
+    dedupe_distance: int = DEFAULT_DEDUPE_DISTANCE,
+    chunk_minutes: float = 0.0,
+    chunk_workers: int = DEFAULT_CHUNK_WORKERS,
+    hedge: bool = False,
     ctx: Context = None,
+    on_stage: Optional[StageCallback] = None,
 ) -> Dict[str, Any]:
+    async def stage(name: str, step: int, message: str) -> None:
+        if ctx is not None:
+            await _safe_ctx_log(ctx, "info", message)
+            try:
+                await ctx.report_progress(progress=step, total=STAGE_TOTAL)
+            except Exception:
+                pass
+        if on_stage is not None:
+            await on_stage(name, step, message)
+
     if ctx is not None:
         await _safe_ctx_log(ctx, "info", "build_manual_from_video: start")
 
@@ -345,127 +444,458 @@ async def build_manual_from_video(
     local_video: Optional[str] = video_path or None
     downloaded_tmp: Optional[str] = None
     if not local_video and video_url:
+        await stage("download", 0, "downloading video from URL...")
+        download = await _download_video(video_url, ctx)
+        local_video = download.path
+        # ETag でキャッシュされたファイルは次回の再利用のため残す
+        if not download.persistent:
+            downloaded_tmp = local_video
+
+    # 以降で失敗・キャンセル（JobManager.cancel）されても、URL から取得した一時ファイルは必ず消す
+    try:
+        if not local_video or not Path(local_video).exists():
+            raise ValueError("video_path か video_url のいずれかを指定してください（存在すること）")
+
+        # 2) Provider 設定の取得（必要なら一時的に LLM_PROVIDER を上書き）
+        with _override_env("LLM_PROVIDER", (model_provider or os.environ.get("LLM_PROVIDER"))):
+            cfg = get_provider_config()
+
+        # screenshot_policy（任意）: 画像の出力形式・縮小幅・品質と dedupe は LLM を呼ぶ前に検証する
+        output = parse_screenshot_policy(screenshot_policy_json)
+        if dedupe not in DEDUPE_MODES:
+            raise ValueError(f"未対応の dedupe です: {dedupe}（{', '.join(DEDUPE_MODES)}）")
+
+        # 3) プロンプト（キャッシュのキー。場面検出のヒントはキャッシュに無かった場合だけ generate 内で付ける）
+        prompt = base_prompt(local_video)
+
+        # 4) LLM 呼び出し（同じ動画・プロンプト・モデルの応答はキャッシュから返す）
+        label = "Gemini" if cfg.provider == "gemini" else "OpenAI-compatible"
+        await stage("llm", 1, f"calling {label} model: {cfg.model_name}")
+        early: Dict[ExtractedKey, str] = {}
+        llm_stats = LLMCallStats()
+
+        # MOVIE2MANUAL_PROXY が有効なら Gemini には縮小したプロキシ動画を送る（抽出は元動画から）
+        proxy = proxy_settings_from_env() if cfg.provider == "gemini" else None
+
+        # LLM_FALLBACK_PROVIDERS があれば失敗時に順に切り替え、hedge なら p95 超過時にフォールバック先へも並行して送る
+        chain = provider_chain(cfg)
+        hedge = hedge or hedging_enabled()
+
+        # フォールバック先が答えた応答は先頭の provider/model のキャッシュとして保存しない
+        fallback_answers: List[ProviderConfig] = []
+
+        def ask(providers: List[ProviderConfig], llm_video: str, llm_prompt: str) -> str:
+            text, answered = generate_with_fallback(
+                providers,
+                lambda c: generate_response_text(c, llm_video, llm_prompt, llm_stats),
+                hedge=hedge,
+                stats=llm_stats,
+            )
+            if answered is not cfg:
+                fallback_answers.append(answered)
+            return text
+
+        def analyse_segment(segment: Segment) -> str:
+            segment_prompt = build_prompt(segment.path, local_video, segment.start, segment.end)
+            return ask(chain, segment.path, segment_prompt + segment_prompt_note(segment))
+
+        def generate() -> str:
+            llm_video = llm_video_for(local_video, proxy)
+            started = time.perf_counter()
+            try:
+                if chunk_minutes > 0:
+                    # 長い動画は分割して並行に解析し、区間ごとの spec をまとめる
+                    text = generate_chunked(
+                        llm_video, analyse_segment, chunk_minutes * 60, chunk_workers, spec_video=local_video
+                    )
+                    if text is not None:
+                        return text
+                # 場面検出のヒントはキャッシュに無かった場合だけ付ける（検出結果も動画ごとにキャッシュ）
+                full_prompt = build_prompt(local_video)
+                if not stream:
+                    return ask(chain, llm_video, full_prompt)
+                # ストリーミング中に確定したスクリーンショットから抽出を始める（LLM と ffmpeg を重ねる）
+                try:
+                    text, extracted = generate_with_early_extraction(
+                        stream_response_text(cfg, llm_video, full_prompt, llm_stats),
+                        local_video,
+                        snap=snap_times,
+                        output=output,
+                        output_dir=output_dir,
+                    )
+                except Exception as e:
+                    # ストリーミングは先頭のプロバイダのみ。失敗したら残りのプロバイダへ通常の呼び出しで切り替える
+                    if len(chain) < 2:
+                        raise
+                    print(f"ストリーミング呼び出しに失敗しました: {e}", file=sys.stderr)
+                    return ask(chain[1:], llm_video, full_prompt)
+                early.update(extracted)
+                return text
+            finally:
+                print(
+                    f"LLM 呼び出し: {time.perf_counter() - started:.1f}s"
+                    f"（入力動画 {Path(llm_video).stat().st_size / 1024 / 1024:.1f} MB）",
+                    file=sys.stderr,
+                )
+
+        # 同期 SDK 呼び出し・動画ハッシュ計算はワーカースレッドで実行し、イベントループを塞がない
+        resp_text = await anyio.to_thread.run_sync(
+            lambda: cached_generate(
+                ResponseCache() if use_cache else None,
+                local_video,
+                prompt,
+                cfg.provider,
+                cfg.model_name,
+                generate,
+                refresh=refresh_cache,
+                variant=generation_variant(proxy, chunk_minutes, cfg.provider),
+                cacheable=lambda: not fallback_answers,
+            ),
+            limiter=_stage_limiter("llm"),
+        )
+
         if ctx is not None:
-            await _safe_ctx_log(ctx, "info", "downloading video from URL...")
-        local_video = _download_to_tmp(video_url)
-        downloaded_tmp = local_video
+            await _safe_ctx_log(ctx, "info", "LLM response received. Parsing spec...")
 
-    if not local_video or not Path(local_video).exists():
-        raise ValueError("video_path か video_url のいずれかを指定してください（存在すること）")
+        # 5) Spec 抽出・正規化
+        spec_dict = _extract_json_from_text(resp_text)
+        if spec_dict is None:
+            raise ValueError("モデル応答から有効なJSONを抽出できませんでした。")
 
-    # 2) Provider 設定の取得（必要なら一時的に LLM_PROVIDER を上書き）
-    with _override_env("LLM_PROVIDER", (model_provider or os.environ.get("LLM_PROVIDER"))):
-        cfg = get_provider_config()
+        spec = Spec.from_dict(spec_dict)
+        if not spec.video:
+            spec.video = local_video
 
-    # 3) プロンプト生成
-    prompt = build_prompt(local_video)
+        # 出力ディレクトリ
+        out_dir = Path((output_dir or spec.output_dir or "./manual_assets"))
+        out_dir.mkdir(parents=True, exist_ok=True)
 
-    # 4) LLM 呼び出し
-    if cfg.provider == "gemini":
-        if not cfg.api_key:
-            raise RuntimeError("Gemini 用 API キーがありません")
-        if ctx is not None:
-            await _safe_ctx_log(ctx, "info", f"calling Gemini model: {cfg.model_name}")
-        client = create_gemini_client(cfg.api_key)
-        resp_text = generate_response_text_gemini(client, local_video, prompt, cfg.model_name)
-    else:
-        if ctx is not None:
-            await _safe_ctx_log(ctx, "info", f"calling OpenAI-compatible model: {cfg.model_name}")
-        client = create_openai_compatible_client(cfg.api_key or "", cfg.base_url)
-        resp_text = generate_response_text_openai(client, prompt, cfg.model_name)
+        # 6) Manifest（チェックポイント）: LLM 応答・spec・各ステージは handle_response_and_extract 以降で記録される
+        manifest_path = out_dir / CHECKPOINT_FILE
+        manifest_spec = spec_record(replace(spec, output_dir=str(out_dir)), output)
+
+        # 7) Markdown 保存 + 画像抽出（既存関数で実行）
+        await stage("ffmpeg", 2, "writing markdown and extracting screenshots...")
+        merged = await anyio.to_thread.run_sync(
+            lambda: handle_response_and_extract(
+                resp_text,
+                local_video,
+                already_extracted=early,
+                snap=snap_times,
+                dedupe=dedupe,
+                dedupe_distance=dedupe_distance,
+                output=output,
+                output_dir=str(out_dir),
+                checkpoint=True,
+            ),
+            limiter=_stage_limiter("ffmpeg"),
+        )
 
-    if ctx is not None:
-        await _safe_ctx_log(ctx, "info", "LLM response received. Parsing spec...")
+        # 8) 結果整形 + （任意）PDF 出力
+        markdown_path = str((out_dir / spec.markdown_output).resolve())
+        pdf_path: Optional[str] = None
+        if export_pdf:
+            await stage("pdf", 3, "rendering PDF...")
+            try:
+                md_path = Path(markdown_path)
+                if not md_path.exists():
+                    raise FileNotFoundError(f"Markdown が見つかりません（PDF 変換元）: {md_path}")
+                if pdf_output:
+                    pdf_target = Path(pdf_output)
+                else:
+                    pdf_target = md_path.with_suffix(".pdf")
+                ckpt = Checkpoint(out_dir)
+                pdf_inputs = {"markdown": file_sha256(md_path), "images": ckpt.frame_hashes(), "pdf": str(pdf_target)}
+                if ckpt.output_current("pdf", pdf_target, pdf_inputs):
+                    if ctx is not None:
+                        await _safe_ctx_log(ctx, "info", f"PDF は前回から変更がないため変換を省略します: {pdf_target}")
+                else:
+                    await anyio.to_thread.run_sync(
+                        convert_markdown_to_pdf, str(md_path), str(pdf_target), limiter=_stage_limiter("pdf")
+                    )
+                    ckpt.record_output("pdf", pdf_target, pdf_inputs)
+                pdf_path = str(pdf_target.resolve())
+                if ctx is not None:
+                    await _safe_ctx_log(ctx, "info", f"PDF 出力: {pdf_path}")
+            except Exception as e:
+                if ctx is not None:
+                    await _safe_ctx_log(ctx, "error", f"PDF 変換でエラー: {e}")
+        image_paths: List[str] = [
+            str((out_dir / name).resolve())
+            for name in (output_filename(s.filename, output) for s in (spec.screenshots or []))
+            if dedupe != "merge" or name not in merged
+        ]
+        warnings: List[str] = [f"{dup} は {keep} とほぼ同じ画面です" for dup, keep in merged.items()]
+
+        await stage("done", STAGE_TOTAL, "build_manual_from_video: done")
+
+        return {
+            "conversational_summary": f"手順書を生成し、{len(image_paths)} 枚のスクリーンショットを抽出しました。",
+            "spec": manifest_spec,
+            "manifest_path": str(manifest_path.resolve()),
+            "markdown_path": markdown_path,
+            "pdf_path": pdf_path,
+            "image_paths": image_paths,
+            "warnings": warnings,
+            "llm": llm_stats.as_dict(),
+        }
+    finally:
+        if downloaded_tmp and Path(downloaded_tmp).exists():
+            try:
+                os.remove(downloaded_tmp)
+            except Exception:
+                pass
 
-    # 5) Spec 抽出・正規化
-    spec_dict = _extract_json_from_text(resp_text)
-    if spec_dict is None:
-        raise ValueError("モデル応答から有効なJSONを抽出できませんでした。")
 
-    spec = Spec.from_dict(spec_dict)
-    if not spec.video:
-        spec.video = local_video
+# build_manual_from_video / submit_manual_job が共通で受け取る引数名
+BUILD_PARAM_NAMES = (
+    "video_path", "video_url", "output_dir", "title_hint", "author", "model_provider",
+    "screenshot_policy_json", "safe_write", "export_pdf", "pdf_output", "use_cache", "refresh_cache",
+    "stream", "snap_times", "dedupe", "dedupe_distance", "chunk_minutes", "chunk_workers",
+    "hedge",
+)
 
-    # screenshot_policy（任意）を JSON 文字列で受け取り、必要であれば spec に反映（現状未使用）
-    try:
-        if screenshot_policy_json:
-            policy_obj = json.loads(screenshot_policy_json)
-            if isinstance(policy_obj, dict):
-                pass
-    except Exception:
-        pass
 
-    # 出力ディレクトリ
-    out_dir = Path((output_dir or spec.output_dir or "./manual_assets"))
-    out_dir.mkdir(parents=True, exist_ok=True)
+def _build_kwargs(values: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in values.items() if k in BUILD_PARAM_NAMES}
 
-    # 6) Manifest を保存
-    manifest_path = out_dir / "manifest.json"
-    try:
-        manifest_obj = {
-            "spec": {
-                "video": spec.video,
-                "output_dir": str(out_dir),
-                "markdown_output": spec.markdown_output,
-                "title": spec.title,
-                "author": spec.author,
-                "body_markdown": spec.body_markdown,
-                "screenshots": [
-                    {"time": s.time, "filename": s.filename, "caption": getattr(s, "caption", None)}
-                    for s in (spec.screenshots or [])
-                ],
-            }
+
+@mcp.tool
+async def build_manual_from_video(
+    video_path: str = "",
+    video_url: str = "",
+    output_dir: str = "",
+    title_hint: str = "",
+    author: str = "",
+    model_provider: str = "",
+    screenshot_policy_json: str = "",
+    safe_write: bool = False,
+    export_pdf: bool = False,
+    pdf_output: str = "",
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    stream: bool = False,
+    snap_times: bool = False,
+    dedupe: str = "off",
+    dedupe_distance: int = DEFAULT_DEDUPE_DISTANCE,
+    chunk_minutes: float = 0.0,
+    chunk_workers: int = DEFAULT_CHUNK_WORKERS,
+    hedge: bool = False,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    return await _build_manual(**_build_kwargs(locals()), ctx=ctx)
+
+
+# ===== ジョブキュー =====
+JOB_STATES = ("queued", "running", "succeeded", "failed", "cancelled")
+
+
+@dataclass
+class Job:
+    job_id: str
+    params: Dict[str, Any]
+    status: str = "queued"
+    stage: str = "queued"
+    progress: int = 0
+    message: str = ""
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    ctx: Optional[Context] = None
+    task: Optional["asyncio.Task[Any]"] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "total": STAGE_TOTAL,
+            "message": self.message,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
         }
-        manifest_path.write_text(json.dumps(manifest_obj, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception as e:
-        if ctx is not None:
-            await _safe_ctx_log(ctx, "error", f"manifest write error: {e}")
 
-    # 7) Markdown 保存 + 画像抽出（既存関数で実行）
-    if ctx is not None:
-        await _safe_ctx_log(ctx, "info", "writing markdown and extracting screenshots...")
-    handle_response_and_extract(resp_text, local_video)
 
-    # 8) 結果整形 + （任意）PDF 出力
-    markdown_path = str((out_dir / spec.markdown_output).resolve())
-    pdf_path: Optional[str] = None
-    if export_pdf:
+class JobManager:
+    """プロセス内の有界 FIFO キューと固定数のワーカーでマニュアル生成ジョブを実行する。
+
+    ワーカー数（同時に走るジョブ数）とは別に、各ステージ（LLM / ffmpeg / PDF）の
+    同時実行数は _stage_limiter で制限されるため、大量投入時もプロバイダや CPU を溢れさせない。
+    """
+
+    def __init__(self, workers: int, max_queued: int, max_finished: int = 1000) -> None:
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.jobs: Dict[str, Job] = {}
+        self._queue: Optional["asyncio.Queue[Job]"] = None
+        self._worker_tasks: List["asyncio.Task[Any]"] = []
+
+    def _ensure_workers(self) -> "asyncio.Queue[Job]":
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+            for _ in range(self.workers):
+                self._worker_tasks.append(asyncio.get_running_loop().create_task(self._worker()))
+        return self._queue
+
+    def submit(self, params: Dict[str, Any], ctx: Optional[Context]) -> Job:
+        queue = self._ensure_workers()
+        job = Job(job_id=uuid.uuid4().hex, params=params, ctx=ctx)
         try:
-            md_path = Path(markdown_path)
-            if not md_path.exists():
-                raise FileNotFoundError(f"Markdown が見つかりません（PDF 変換元）: {md_path}")
-            if pdf_output:
-                pdf_target = Path(pdf_output)
-            else:
-                pdf_target = md_path.with_suffix(".pdf")
-            convert_markdown_to_pdf(str(md_path), str(pdf_target))
-            pdf_path = str(pdf_target.resolve())
-            if ctx is not None:
-                await _safe_ctx_log(ctx, "info", f"PDF 出力: {pdf_path}")
-        except Exception as e:
-            if ctx is not None:
-                await _safe_ctx_log(ctx, "error", f"PDF 変換でエラー: {e}")
-    image_paths: List[str] = [str((out_dir / s.filename).resolve()) for s in (spec.screenshots or [])]
-    warnings: List[str] = []
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise RuntimeError(f"ジョブキューが満杯です（上限 {self.max_queued} 件）。時間をおいて再投入してください。")
+        self.jobs[job.job_id] = job
+        self._trim_finished()
+        return job
+
+    def queue_position(self, job: Job) -> Optional[int]:
+        if job.status != "queued":
+            return None
+        queued = [j for j in self.jobs.values() if j.status == "queued"]
+        return queued.index(job) + 1
+
+    def cancel(self, job_id: str) -> Job:
+        job = self.jobs[job_id]
+        if job.status == "queued":
+            # キューからは取り除かず、ワーカーが取り出した時点で読み飛ばす
+            self._finish(job, "cancelled")
+        elif job.status == "running" and job.task is not None:
+            job.task.cancel()
+        return job
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.stage = status
+        job.error = error
+        job.finished_at = time.time()
+        job.done.set()
+
+    def _trim_finished(self) -> None:
+        finished = [j for j in self.jobs.values() if j.finished_at is not None]
+        for job in sorted(finished, key=lambda j: j.finished_at or 0)[: max(0, len(finished) - self.max_finished)]:
+            self.jobs.pop(job.job_id, None)
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+                job.task = asyncio.get_running_loop().create_task(self._run(job))
+                try:
+                    await job.task
+                except asyncio.CancelledError:
+                    if not job.task.cancelled():
+                        raise  # ワーカー自体のキャンセル（サーバー終了）
+                    self._finish(job, "cancelled")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        async def on_stage(name: str, step: int, message: str) -> None:
+            job.stage = name
+            job.progress = step
+            job.message = message
 
-    if downloaded_tmp and Path(downloaded_tmp).exists():
         try:
-            os.remove(downloaded_tmp)
-        except Exception:
-            pass
+            job.result = await _build_manual(**job.params, ctx=job.ctx, on_stage=on_stage)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._finish(job, "failed", error=str(e))
+            await _safe_ctx_log(job.ctx, "error", f"job {job.job_id} failed: {e}")
+            return
+        self._finish(job, "succeeded")
 
-    if ctx is not None:
-        await _safe_ctx_log(ctx, "info", "build_manual_from_video: done")
-
-    return {
-        "conversational_summary": f"手順書を生成し、{len(image_paths)} 枚のスクリーンショットを抽出しました。",
-        "spec": manifest_obj["spec"],
-        "manifest_path": str(manifest_path.resolve()),
-        "markdown_path": markdown_path,
-        "pdf_path": pdf_path,
-        "image_paths": image_paths,
-        "warnings": warnings,
-    }
+
+job_manager = JobManager(
+    workers=_env_int("MOVIE2MANUAL_JOB_WORKERS", 4),
+    max_queued=_env_int("MOVIE2MANUAL_JOB_QUEUE_SIZE", 100),
+)
+
+
+@mcp.tool
+async def submit_manual_job(
+    video_path: str = "",
+    video_url: str = "",
+    output_dir: str = "",
+    title_hint: str = "",
+    author: str = "",
+    model_provider: str = "",
+    screenshot_policy_json: str = "",
+    safe_write: bool = False,
+    export_pdf: bool = False,
+    pdf_output: str = "",
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    stream: bool = False,
+    snap_times: bool = False,
+    dedupe: str = "off",
+    dedupe_distance: int = DEFAULT_DEDUPE_DISTANCE,
+    chunk_minutes: float = 0.0,
+    chunk_workers: int = DEFAULT_CHUNK_WORKERS,
+    hedge: bool = False,
+    wait: bool = False,
+    ctx: Context = None,
+) -> Dict[str, Any]:
+    """build_manual_from_video をジョブとしてキューに投入する。
+
+    wait=false なら job_id を即座に返す（進捗は get_job_status で確認）。
+    wait=true なら完了まで待ち、その間の進捗を ctx.info / progress 通知で送る。
+    """
+    job = job_manager.submit(_build_kwargs(locals()), ctx)
+    await _safe_ctx_log(ctx, "info", f"job {job.job_id} queued (position {job_manager.queue_position(job)})")
+    if wait:
+        await job.done.wait()
+    status = job.to_dict()
+    status["queue_position"] = job_manager.queue_position(job)
+    return status
+
+
+@mcp.tool
+def get_job_status(job_id: str) -> Dict[str, Any]:
+    job = job_manager.jobs.get(job_id)
+    if job is None:
+        raise ValueError(f"ジョブが見つかりません: {job_id}")
+    status = job.to_dict()
+    status["queue_position"] = job_manager.queue_position(job)
+    return status
+
+
+@mcp.tool
+def cancel_job(job_id: str) -> Dict[str, Any]:
+    if job_id not in job_manager.jobs:
+        raise ValueError(f"ジョブが見つかりません: {job_id}")
+    return job_manager.cancel(job_id).to_dict()
+
+
+@mcp.tool
+def list_jobs(status: str = "") -> List[Dict[str, Any]]:
+    if status and status not in JOB_STATES:
+        raise ValueError(f"未対応の status です: {status}（{', '.join(JOB_STATES)}）")
+    jobs = sorted(job_manager.jobs.values(), key=lambda j: j.created_at)
+    return [
+        {k: v for k, v in j.to_dict().items() if k != "result"}
+        for j in jobs
+        if not status or j.status == status
+    ]
+
+
+@mcp.tool
+def refresh_llm_clients(provider: str = "") -> Dict[str, Any]:
+    """共有している LLM クライアント（接続プール）を破棄し、次の呼び出しで作り直させる（API キー更新時など）。"""
+    return {"refreshed": refresh_clients(provider or None)}
 
 
 @mcp.tool
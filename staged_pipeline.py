@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# ステージ間キューの既定の長さ（上流が速すぎる場合はここで待たせ、中間結果を溜め込まない）
+DEFAULT_QUEUE_SIZE = 2
+
+# (ステージ名, 処理, ワーカー数)。処理は item を受け取り、結果は item 自体に書き込む
+Stage = Tuple[str, Callable[[Any], None], int]
+
+# on_done(item, 失敗したステージ名 or None, 例外 or None)
+DoneCallback = Callable[[Any, Optional[str], Optional[BaseException]], None]
+
+_STOP = object()
+
+
+@dataclass
+class StageMetrics:
+    name: str
+    workers: int
+    queue_size: int
+    processed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0  # 処理に要した時間の合計（全ワーカー）
+    wait_seconds: float = 0.0  # 入力キューで待った時間の合計
+    queue_depth: int = 0  # 入力キューの現在の長さ
+    max_queue_depth: int = 0
+    first_started: float = 0.0
+    last_finished: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        done = self.processed + self.failed
+        span = self.last_finished - self.first_started if done else 0.0
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "items_per_minute": round(done / span * 60, 2) if span > 0 else None,
+            "avg_seconds": round(self.busy_seconds / done, 3) if done else None,
+            "avg_wait_seconds": round(self.wait_seconds / done, 3) if done else None,
+            "utilization": round(self.busy_seconds / (span * self.workers), 3) if span > 0 else None,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_size": self.queue_size,
+        }
+
+
+class StagedPipeline:
+    """ステージごとに独立したワーカー数を持ち、ステージ間を長さ制限付きキューでつなぐパイプライン。
+
+    item はステージ順に流れ、各ステージは空いているワーカーから次の item を取るため、
+    item N+1 の LLM 呼び出し・item N の抽出・item N-1 の PDF 変換が同時に進む。
+    下流のキューが満杯なら上流のワーカーは待つ（中間結果がメモリに溜まり続けない）。
+    ステージで例外が出た item はそこで打ち切って on_done に渡し、他の item の処理は続ける。
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = DEFAULT_QUEUE_SIZE):
+        if not stages:
+            raise ValueError("ステージが 1 つもありません")
+        self.stages = [(name, fn, max(1, workers)) for name, fn, workers in stages]
+        size = max(1, queue_size)
+        self._queues: List["queue.Queue[Any]"] = [queue.Queue(maxsize=size) for _ in self.stages]
+        self._metrics = [StageMetrics(name, workers, size) for name, _, workers in self.stages]
+        self._lock = threading.Lock()
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        """ステージごとのスループット・待ち時間・キュー長（実行中に呼んでもよい）。"""
+        with self._lock:
+            for m, q in zip(self._metrics, self._queues):
+                m.queue_depth = q.qsize()
+            return [m.as_dict() for m in self._metrics]
+
+    def _put(self, index: int, item: Any) -> None:
+        q = self._queues[index]
+        q.put((item, time.perf_counter()))
+        with self._lock:
+            m = self._metrics[index]
+            m.max_queue_depth = max(m.max_queue_depth, q.qsize())
+
+    def run(self, items: Iterable[Any], on_done: DoneCallback) -> None:
+        """items をすべて流し終えるまで待つ。on_done は item ごとに 1 回、ロックを取った状態で呼ばれる。"""
+        done_lock = threading.Lock()
+        alive = [workers for _, _, workers in self.stages]
+
+        def finish(item: Any, stage: Optional[str], error: Optional[BaseException]) -> None:
+            with done_lock:
+                try:
+                    on_done(item, stage, error)
+                except Exception as e:
+                    print(f"完了処理に失敗しました: {e}", file=sys.stderr)
+
+        def worker(index: int) -> None:
+            name, fn, _ = self.stages[index]
+            m = self._metrics[index]
+            while True:
+                entry = self._queues[index].get()
+                if entry is _STOP:
+                    break
+                item, enqueued = entry
+                started = time.perf_counter()
+                error: Optional[BaseException] = None
+                try:
+                    fn(item)
+                except Exception as e:
+                    error = e
+                finished = time.perf_counter()
+                with self._lock:
+                    m.first_started = m.first_started or started
+                    m.last_finished = finished
+                    m.busy_seconds += finished - started
+                    m.wait_seconds += started - enqueued
+                    if error is None:
+                        m.processed += 1
+                    else:
+                        m.failed += 1
+                if error is not None:
+                    print(f"[{name}] {error}", file=sys.stderr)
+                    finish(item, name, error)
+                elif index + 1 < len(self.stages):
+                    self._put(index + 1, item)
+                else:
+                    finish(item, None, None)
+            # 最後に抜けたワーカーが下流ステージへ終了を伝える
+            with self._lock:
+                alive[index] -= 1
+                last = alive[index] == 0
+            if last and index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1][2]):
+                    self._queues[index + 1].put(_STOP)
+
+        threads = [
+            threading.Thread(target=worker, args=(i,), name=f"{name}-{n}", daemon=True)
+            for i, (name, _, workers) in enumerate(self.stages)
+            for n in range(workers)
+        ]
+        for t in threads:
+            t.start()
+        try:
+            for item in items:
+                self._put(0, item)
+        finally:
+            for _ in range(self.stages[0][2]):
+                self._queues[0].put(_STOP)
+            for t in threads:
+                t.join()
+
+
+def format_metrics(metrics: List[Dict[str, Any]]) -> str:
+    """metrics() の結果を 1 ステージ 1 行の人が読む形式にする。"""
+    lines = []
+    for m in metrics:
+        rate = m["items_per_minute"]
+        util = m["utilization"]
+        lines.append(
+            f"{m['stage']:>8}: {m['processed']} 件成功 / {m['failed']} 件失敗, "
+            f"{'-' if rate is None else f'{rate:.2f}'} 件/分, "
+            f"平均 {m['avg_seconds'] or 0:.1f}s（待ち {m['avg_wait_seconds'] or 0:.1f}s）, "
+            f"稼働率 {'-' if util is None else f'{util * 100:.0f}%'}, "
+            f"キュー最大 {m['max_queue_depth']}/{m['queue_size']}（ワーカー {m['workers']}）"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from extract_screenshot import OutputOptions, ScreenshotSpec, extract_screenshots, format_timecode
+from frame_snap import snap_screenshots
+from json_extract import StreamingSpecParser
+
+
+ExtractedKey = Tuple[str, str, str]
+
+
+def extracted_key(output_dir: Union[str, Path], shot: ScreenshotSpec) -> ExtractedKey:
+    """先行抽出済みかどうかの照合キー（出力先・ファイル名・時刻が最終 spec と一致するか）。"""
+    return (str(Path(output_dir)), shot.filename, format_timecode(shot.time))
+
+
+def generate_with_early_extraction(
+    chunks: Iterable[str],
+    default_video_file: str,
+    max_workers: int = 2,
+    snap: bool = False,
+    output: Optional[OutputOptions] = None,
+    output_dir: str = "",
+) -> Tuple[str, Dict[ExtractedKey, str]]:
+    """ストリーミング応答を読みながら、完成した screenshots[] の要素から順に ffmpeg 抽出を始める。
+
+    video / output_dir が応答中に確定してから抽出を開始し（確定前の要素は保留）、
+    LLM の生成と静止画抽出を重ねて実行する。戻り値は (応答全文, {抽出に成功した要素のキー: 実際に抽出した時刻})。
+    失敗した要素は含めないため、最終 spec に対する通常の抽出でやり直される。
+    snap=True なら各要素の時刻を frame_snap.snap_screenshots で補正してから抽出する
+    （要素は 1 つずつ確定するため、補正も 1 要素ずつ行う）。キーは補正前の時刻・出力形式適用前のファイル名で、値は補正後の時刻で記録する。
+    output_dir を指定すると応答中の output_dir より優先する（バッチモードの出力先・MCP の output_dir。最終処理と同じ場所に書く）。
+    """
+    parser = StreamingSpecParser()
+    pending: List[ScreenshotSpec] = []
+    futures: List[Tuple[ExtractedKey, "Future[str]"]] = []
+    done: Dict[ExtractedKey, str] = {}
+
+    def extract_one(video: str, output_dir: str, shot: ScreenshotSpec) -> str:
+        shots = snap_screenshots(video, [shot]) if snap else [shot]
+        extract_screenshots(video, output_dir, shots, output=output)
+        return shots[0].time
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+
+        def submit_ready() -> None:
+            if "video" not in parser.fields or ("output_dir" not in parser.fields and not output_dir):
+                return
+            video = parser.fields["video"] or default_video_file
+            target_dir = output_dir or parser.fields["output_dir"] or "./manual_assets"
+            if not isinstance(video, str) or not Path(video).exists():
+                pending.clear()  # 動画が見つからない場合は最終処理側でエラーを報告する
+                return
+            while pending:
+                shot = pending.pop(0)
+                future = pool.submit(extract_one, video, target_dir, shot)
+                futures.append((extracted_key(target_dir, shot), future))
+
+        for chunk in chunks:
+            for element in parser.feed(chunk or ""):
+                try:
+                    pending.append(ScreenshotSpec(**element))
+                except TypeError:
+                    continue  # 余計なキー等は最終 spec の検証に任せる
+            submit_ready()
+
+    # with を抜けた時点で全ての抽出が完了している
+    for key, future in futures:
+        exc = future.exception()
+        if exc is None:
+            done[key] = future.result()
+        else:
+            print(f"先行抽出に失敗しました（最終処理で再試行します）: {exc}", file=sys.stderr)
+    return parser.text, done
@@ -3,22 +3,24 @@ import json
 import tempfile
 import zipfile
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 import streamlit as st
 
 from extract_screenshot import extract_screenshots
 from main import (
+    ProviderConfig,
     Spec,
     _extract_json_from_text,
+    base_prompt,
     build_prompt,
-    create_gemini_client,
-    create_openai_compatible_client,
-    generate_response_text_gemini,
-    generate_response_text_openai,
+    generate_response_text,
     get_provider_config,
+    provider_chain,
 )
 from pdf_export import convert_markdown_to_pdf
+from provider_fallback import generate_with_fallback, hedging_enabled
+from response_cache import ResponseCache, cached_generate, generation_variant
 
 
 def _sanitize_dir_name(raw: Optional[str]) -> Path:
@@ -34,17 +36,34 @@ def _sanitize_filename(raw: Optional[str], default: str) -> str:
     return name or default
 
 
-def _run_generation(video_path: Path, work_dir: Path, export_pdf: bool) -> dict:
+def _run_generation(
+    video_path: Path, work_dir: Path, export_pdf: bool, use_cache: bool = True, hedge: bool = False
+) -> dict:
     cfg = get_provider_config()
-    prompt = build_prompt(str(video_path))
-    if cfg.provider == "gemini":
-        if not cfg.api_key:
-            raise RuntimeError("Gemini 用 API キーが設定されていません")
-        client = create_gemini_client(cfg.api_key)
-        response_text = generate_response_text_gemini(client, str(video_path), prompt, cfg.model_name)
-    else:
-        client = create_openai_compatible_client(cfg.api_key or "", cfg.base_url)
-        response_text = generate_response_text_openai(client, prompt, cfg.model_name)
+    chain = provider_chain(cfg)
+    # キャッシュのキーはヒントなしのプロンプト（場面検出のヒントはキャッシュに無かった場合だけ付ける）
+    prompt = base_prompt(str(video_path))
+    answered: List[ProviderConfig] = []
+
+    def generate() -> str:
+        full_prompt = build_prompt(str(video_path))
+        text, used = generate_with_fallback(
+            chain, lambda c: generate_response_text(c, str(video_path), full_prompt), hedge=hedge
+        )
+        answered.append(used)
+        return text
+
+    response_text = cached_generate(
+        ResponseCache() if use_cache else None,
+        str(video_path),
+        prompt,
+        cfg.provider,
+        cfg.model_name,
+        generate,
+        # フォールバック先が答えた応答は先頭の provider/model のキャッシュとして保存しない
+        variant=generation_variant(provider=cfg.provider),
+        cacheable=lambda: all(c is cfg for c in answered),
+    )
 
     spec_dict = _extract_json_from_text(response_text)
     if spec_dict is None:
@@ -99,6 +118,11 @@ def main() -> None:
     
     uploaded = st.file_uploader("動画ファイルを選択", type=["mp4"])
     export_pdf = st.checkbox("PDF も生成する", value=False)
+    use_cache = st.checkbox("同じ動画の LLM 応答を再利用する（キャッシュ）", value=True)
+    hedge = st.checkbox(
+        "応答が遅いときはフォールバック先の LLM にも並行して送る（LLM_FALLBACK_PROVIDERS 設定時）",
+        value=hedging_enabled(),
+    )
 
     if st.button("マニュアルを生成", type="primary"):
         if not uploaded:
@@ -112,7 +136,7 @@ def main() -> None:
                 video_path.write_bytes(uploaded.getvalue())
 
                 try:
-                    result = _run_generation(video_path, tmpdir_path, export_pdf)
+                    result = _run_generation(video_path, tmpdir_path, export_pdf, use_cache=use_cache, hedge=hedge)
                 except Exception as exc:  # noqa: BLE001
                     st.error(f"生成に失敗しました: {exc}")
                     return
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# テスト対象のモジュールはリポジトリ直下にあるため、ルートを import 解決に追加
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+@pytest.fixture
+def offset_video(tmp_path):
+    """start_time が 0 でない動画（MPEG-TS は先頭に遅延があり、さらに 5 秒ずらす）。testsrc はフレームごとに絵が変わる。"""
+    path = tmp_path / "offset.ts"
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "testsrc=size=160x120:rate=10:duration=4",
+            "-output_ts_offset", "5", str(path),
+        ],
+        check=True,
+    )
+    return str(path)
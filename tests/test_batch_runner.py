@@ -0,0 +1,16 @@
+import time
+
+from batch_runner import BatchJob, run_batch
+
+STAGE_SECONDS = 0.2
+
+
+def test_seconds_exclude_queue_wait():
+    jobs = [BatchJob(video=f"video{i}.mp4") for i in range(4)]
+    results = []
+    # 1 ワーカーのステージに 4 本を流すと、後ろの動画ほど長くキューで待つ
+    stages = [("llm", lambda job: time.sleep(STAGE_SECONDS), 1)]
+    assert run_batch(jobs, stages, results.append) == 0
+    assert len(results) == 4
+    for job in results:
+        assert job.result()["seconds"] < STAGE_SECONDS * 2
@@ -0,0 +1,19 @@
+import shutil
+
+import pytest
+
+from extract_screenshot import ScreenshotSpec, extract_screenshots, probe_start_time
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg が必要")
+
+
+def test_batch_matches_seek_with_nonzero_start_time(offset_video, tmp_path):
+    assert probe_start_time(offset_video) > 1.0
+    shots = [
+        ScreenshotSpec(time="00:00:02.500", filename="a.png"),
+        ScreenshotSpec(time="00:00:03.200", filename="b.png"),
+    ]
+    extract_screenshots(offset_video, str(tmp_path / "seek"), shots, method="seek")
+    extract_screenshots(offset_video, str(tmp_path / "batch"), shots, method="batch")
+    for s in shots:
+        assert (tmp_path / "batch" / s.filename).read_bytes() == (tmp_path / "seek" / s.filename).read_bytes()
@@ -0,0 +1,71 @@
+import pytest
+
+pytest.importorskip("google.genai")
+
+import gemini_files  # noqa: E402
+from gemini_files import video_part  # noqa: E402
+from google.genai import types  # noqa: E402
+
+
+class StubFiles:
+    """Files API の代わり。get が processing 回 PROCESSING を返したあと ACTIVE になる。"""
+
+    def __init__(self, processing: int = 2):
+        self.processing = processing
+        self.calls = []
+
+    def _file(self, state):
+        return types.File(name="files/abc", uri="https://example.com/files/abc", mime_type="video/mp4", state=state)
+
+    def upload(self, file, config=None):
+        self.calls.append(("upload", file))
+        return self._file(types.FileState.PROCESSING)
+
+    def get(self, name):
+        self.calls.append(("get", name))
+        self.processing -= 1
+        return self._file(types.FileState.PROCESSING if self.processing > 0 else types.FileState.ACTIVE)
+
+    def delete(self, name):
+        self.calls.append(("delete", name))
+
+
+class StubClient:
+    def __init__(self, files):
+        self.files = files
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"\0" * 1024)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def no_poll_wait(monkeypatch):
+    monkeypatch.setattr(gemini_files.time, "sleep", lambda seconds: None)
+
+
+def test_large_video_is_uploaded_polled_and_deleted(video):
+    files = StubFiles(processing=2)
+    with video_part(StubClient(files), video, max_inline_bytes=512) as part:
+        assert part.file_data.file_uri == "https://example.com/files/abc"
+        assert part.inline_data is None
+        assert [c[0] for c in files.calls] == ["upload", "get", "get"]
+    assert files.calls[-1] == ("delete", "files/abc")
+
+
+def test_uploaded_file_is_deleted_when_request_fails(video):
+    files = StubFiles(processing=1)
+    with pytest.raises(RuntimeError):
+        with video_part(StubClient(files), video, max_inline_bytes=0):
+            raise RuntimeError("generate_content failed")
+    assert files.calls[-1] == ("delete", "files/abc")
+
+
+def test_small_video_is_sent_inline(video):
+    files = StubFiles()
+    with video_part(StubClient(files), video, max_inline_bytes=4096) as part:
+        assert part.inline_data.data == video.read_bytes()
+    assert files.calls == []
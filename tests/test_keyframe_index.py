@@ -0,0 +1,34 @@
+import json
+import shutil
+
+import pytest
+
+import extract_screenshot
+from extract_screenshot import file_sha256, load_keyframe_index
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg が必要")
+def test_keyframe_index_is_relative_to_start_time(offset_video, tmp_path):
+    keyframes = load_keyframe_index(offset_video, cache_dir=tmp_path)
+    assert keyframes[0] == pytest.approx(0.0, abs=0.05)
+    assert keyframes[-1] < 4.0
+    index = json.loads((tmp_path / f"{file_sha256(offset_video)}.json").read_text(encoding="utf-8"))
+    assert index["relative"] is True
+
+
+def test_absolute_index_is_rebuilt(monkeypatch, tmp_path):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"video")
+    (tmp_path / f"{file_sha256(video)}.json").write_text(json.dumps({"keyframes": [5.0, 7.0]}), encoding="utf-8")
+    monkeypatch.setattr(extract_screenshot, "probe_keyframes", lambda v: [0.0, 2.0])
+    assert load_keyframe_index(str(video), cache_dir=tmp_path) == [0.0, 2.0]
+
+
+def test_sha256_memo_is_bounded(monkeypatch, tmp_path):
+    monkeypatch.setattr(extract_screenshot, "SHA256_MEMO_LIMIT", 2)
+    monkeypatch.setattr(extract_screenshot, "_SHA256_MEMO", extract_screenshot.OrderedDict())
+    for i in range(3):
+        path = tmp_path / f"{i}.bin"
+        path.write_bytes(bytes([i]))
+        file_sha256(path)
+    assert len(extract_screenshot._SHA256_MEMO) == 2
@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from response_cache import ResponseCache, cached_generate, generation_variant
+
+
+def _variant_key(monkeypatch, budget: str, provider: str = "openai") -> str:
+    monkeypatch.setenv("MOVIE2MANUAL_FRAME_TOKEN_BUDGET", budget)
+    return ResponseCache.make_key("sha", "prompt", provider, "model", generation_variant(provider=provider))
+
+
+def test_frame_budget_changes_cache_key(monkeypatch):
+    monkeypatch.delenv("MOVIE2MANUAL_SCENE_HINTS", raising=False)
+    text_only = _variant_key(monkeypatch, "0")
+    small = _variant_key(monkeypatch, "2000")
+    large = _variant_key(monkeypatch, "8000")
+    assert len({text_only, small, large}) == 3
+
+
+def test_frame_budget_ignored_for_gemini(monkeypatch):
+    monkeypatch.delenv("MOVIE2MANUAL_SCENE_HINTS", raising=False)
+    assert _variant_key(monkeypatch, "0", "gemini") == _variant_key(monkeypatch, "2000", "gemini")
+
+
+def test_enabling_frames_misses_text_only_entry(monkeypatch, tmp_path):
+    monkeypatch.delenv("MOVIE2MANUAL_SCENE_HINTS", raising=False)
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"video")
+    cache = ResponseCache(cache_dir=tmp_path / "cache")
+    answers = iter(["text-only", "with-frames"])
+
+    def ask() -> str:
+        return cached_generate(
+            cache, str(video), "prompt", "openai", "model", lambda: next(answers),
+            variant=generation_variant(provider="openai"),
+        )
+
+    monkeypatch.setenv("MOVIE2MANUAL_FRAME_TOKEN_BUDGET", "0")
+    assert ask() == "text-only"
+    assert ask() == "text-only"
+    monkeypatch.setenv("MOVIE2MANUAL_FRAME_TOKEN_BUDGET", "4000")
+    assert ask() == "with-frames"
+
+
+def test_concurrent_puts_of_same_key(tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path / "cache")
+    key = ResponseCache.make_key("sha", "prompt", "openai", "model")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: cache.put(key, {"text": f"answer{i}", "created_at": time.time()}), range(64)))
+    assert cache.get(key)["text"].startswith("answer")
+    assert not list((tmp_path / "cache").glob("*.tmp"))
@@ -0,0 +1,78 @@
+import functools
+import json
+import time
+
+import pytest
+
+anyio = pytest.importorskip("anyio")
+pytest.importorskip("fastmcp")
+pytest.importorskip("google.genai")
+pytest.importorskip("openai")
+
+import server.main as srv  # noqa: E402
+from video_download import DownloadResult  # noqa: E402
+
+RESPONSE = json.dumps({"output_dir": "", "markdown_output": "manual.md", "screenshots": []})
+# ブロッキングする LLM 呼び出しの模擬時間（health_check はこの間も応答すること）
+BUILD_SECONDS = 2.0
+
+
+def test_downloaded_video_removed_when_build_fails(monkeypatch, tmp_path):
+    video = tmp_path / "download.mp4"
+    video.write_bytes(b"\0" * 1024)
+
+    async def fake_download(url, ctx):
+        return DownloadResult(path=str(video), size=1024, from_cache=False, persistent=False)
+
+    def fail_extract(*args, **kwargs):
+        raise RuntimeError("ffmpeg failed")
+
+    monkeypatch.setenv("LLM_PROVIDER", "ollama")
+    monkeypatch.setattr(srv, "_download_video", fake_download)
+    monkeypatch.setattr(srv, "generate_response_text", lambda *args, **kwargs: RESPONSE)
+    monkeypatch.setattr(srv, "handle_response_and_extract", fail_extract)
+    build = functools.partial(
+        srv._build_manual, video_url="https://example.com/video.mp4", output_dir=str(tmp_path / "out"), use_cache=False
+    )
+    with pytest.raises(RuntimeError):
+        anyio.run(build)
+    assert not video.exists()
+
+
+def test_health_check_responds_during_blocking_build(monkeypatch, tmp_path):
+    from fastmcp import Client
+
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"\0" * 1024)
+
+    def slow_generate(*args, **kwargs):
+        time.sleep(BUILD_SECONDS)
+        return RESPONSE
+
+    monkeypatch.setenv("LLM_PROVIDER", "ollama")
+    monkeypatch.setattr(srv, "generate_response_text", slow_generate)
+    monkeypatch.setattr(srv, "handle_response_and_extract", lambda *args, **kwargs: {})
+
+    async def scenario():
+        latencies = []
+        finished = []
+        async with Client(srv.mcp) as client:
+
+            async def build():
+                arguments = {"video_path": str(video), "output_dir": str(tmp_path / "out"), "use_cache": False}
+                await client.call_tool("build_manual_from_video", arguments)
+                finished.append(time.perf_counter())
+
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(build)
+                await anyio.sleep(0.2)  # ビルドが LLM 呼び出しに入るまで待つ
+                for _ in range(5):
+                    started = time.perf_counter()
+                    await client.call_tool("health_check", {})
+                    latencies.append(time.perf_counter() - started)
+                pinged = time.perf_counter()
+        return latencies, pinged, finished
+
+    latencies, pinged, finished = anyio.run(scenario)
+    assert finished and pinged < finished[0]  # 全ての health_check がビルド中に返った
+    assert max(latencies) < BUILD_SECONDS / 4
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import hashlib
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+from extract_screenshot import default_cache_dir
+
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024 * 1024  # 4GB
+DEFAULT_TIMEOUT = 60.0  # 接続・各チャンク読み込みのタイムアウト（秒）
+DEFAULT_MAX_RETRIES = 3
+# ETag でキャッシュした動画: 最終利用から 7 日で失効、合計 8GB を超えたら最終利用の古いものから削除
+DEFAULT_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_CACHE_MAX_BYTES = 8 * 1024 * 1024 * 1024
+
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+@dataclass
+class DownloadResult:
+    path: str
+    size: int
+    from_cache: bool  # 既存のキャッシュ（ETag 一致）をそのまま使った
+    persistent: bool  # キャッシュディレクトリ内のファイル（呼び出し側で削除しない）
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        print(f"{name} が不正です（既定値を使用）: {raw}", file=sys.stderr)
+        return default
+
+
+def _url_suffix(url: str) -> str:
+    return os.path.splitext(url.split("?")[0].split("#")[0])[1] or ".mp4"
+
+
+def _open(url: str, headers: Dict[str, str], timeout: float):
+    req = urllib.request.Request(url, headers={"User-Agent": "movie2manual", **headers})
+    return urllib.request.urlopen(req, timeout=timeout)
+
+
+def evict_download_cache(
+    cache_root: Path,
+    ttl_seconds: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+    keep: str = "",
+) -> None:
+    """キャッシュした動画のうち TTL 切れを削除し、合計サイズが上限を超える分を最終利用の古い順に削除する。
+
+    1 エントリは URL のハッシュを名前にした動画と .json（ETag）の組。keep（今回使うエントリのキー）は削除しない。
+    上限は MOVIE2MANUAL_DOWNLOAD_CACHE_TTL（秒）/ MOVIE2MANUAL_DOWNLOAD_CACHE_MAX_MB で変更できる。
+    """
+    if ttl_seconds is None:
+        ttl_seconds = _env_float("MOVIE2MANUAL_DOWNLOAD_CACHE_TTL", DEFAULT_CACHE_TTL_SECONDS)
+    if max_bytes is None:
+        max_bytes = int(
+            _env_float("MOVIE2MANUAL_DOWNLOAD_CACHE_MAX_MB", DEFAULT_CACHE_MAX_BYTES / 1024 / 1024) * 1024 * 1024
+        )
+    if not cache_root.exists():
+        return
+    now = time.time()
+    groups: Dict[str, list] = {}
+    for path in cache_root.iterdir():
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if path.name.endswith(".part"):
+            # 中断したプロセスが残した途中ファイル（ダウンロード中のものは TTL 内なので残る）
+            if ttl_seconds > 0 and now - st.st_mtime > ttl_seconds:
+                path.unlink(missing_ok=True)
+            continue
+        groups.setdefault(path.name.split(".", 1)[0], []).append((path, st))
+    entries = []
+    for key, files in groups.items():
+        if key == keep:
+            continue
+        last_used = max(st.st_mtime for _, st in files)
+        size = sum(st.st_size for _, st in files)
+        if ttl_seconds > 0 and now - last_used > ttl_seconds:
+            for path, _ in files:
+                path.unlink(missing_ok=True)
+            continue
+        entries.append((last_used, size, [path for path, _ in files]))
+    kept_size = sum(st.st_size for _, st in groups.get(keep, []))
+    total = kept_size + sum(size for _, size, _ in entries)
+    for _, size, paths in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        for path in paths:
+            path.unlink(missing_ok=True)
+        total -= size
+
+
+def download_video(
+    url: str,
+    max_bytes: Optional[int] = None,
+    timeout: Optional[float] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    progress: Optional[ProgressCallback] = None,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> DownloadResult:
+    """URL の動画を固定長チャンクでストリーミング保存する。
+
+    - サイズ上限（max_bytes / MOVIE2MANUAL_DOWNLOAD_MAX_MB）を Content-Length と受信量の両方で検査
+    - 接続が途中で切れた場合は HTTP Range（If-Range: ETag）で続きから再開（最大 max_retries 回）
+    - ETag を返すサーバーでは URL+ETag でキャッシュし、If-None-Match で 304 なら再取得しない
+      （キャッシュは evict_download_cache で TTL と合計サイズの上限を超えた分を削除する）
+    - progress(受信済みバイト数, 総バイト数 or None) をチャンクごとに呼ぶ
+    """
+    if max_bytes is None:
+        max_bytes = int(_env_float("MOVIE2MANUAL_DOWNLOAD_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024) * 1024 * 1024)
+    if timeout is None:
+        timeout = _env_float("MOVIE2MANUAL_DOWNLOAD_TIMEOUT", DEFAULT_TIMEOUT)
+
+    cache_root = Path(cache_dir) if cache_dir else default_cache_dir() / "downloads"
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    meta_path = cache_root / f"{key}.json"
+    cached_path = cache_root / f"{key}{_url_suffix(url)}"
+
+    meta: Dict[str, object] = {}
+    if meta_path.exists() and cached_path.exists():
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except ValueError:
+            meta = {}
+
+    headers: Dict[str, str] = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = str(meta["etag"])
+    try:
+        resp = _open(url, headers, timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            size = cached_path.stat().st_size
+            print(f"ダウンロード済みの動画を再利用します（ETag 一致）: {url}", file=sys.stderr)
+            # 最終利用時刻を mtime に記録（削除の順序に使う）
+            try:
+                os.utime(cached_path)
+            except OSError:
+                pass
+            evict_download_cache(cache_root, keep=key)
+            return DownloadResult(path=str(cached_path), size=size, from_cache=True, persistent=True)
+        raise
+
+    etag = resp.headers.get("ETag")
+    length = resp.headers.get("Content-Length")
+    total = int(length) if length and length.isdigit() else None
+    if total is not None and total > max_bytes:
+        resp.close()
+        raise ValueError(f"動画サイズが上限を超えています: {total} bytes > {max_bytes} bytes")
+
+    if etag:
+        cache_root.mkdir(parents=True, exist_ok=True)
+        target = cached_path
+    else:
+        fd, tmp_path = tempfile.mkstemp(prefix="movie2manual_", suffix=_url_suffix(url))
+        os.close(fd)
+        target = Path(tmp_path)
+    # 同じ URL の同時ダウンロードで衝突しないよう、途中ファイル名は呼び出しごとに分ける
+    partial = target.with_name(f"{target.name}.{uuid.uuid4().hex[:8]}.part")
+
+    received = 0
+    retries = 0
+    try:
+        with partial.open("wb") as out:
+            while True:
+                try:
+                    if resp is None:
+                        # 続きから再開する（接続に失敗した場合もリトライ 1 回として数える）
+                        range_headers = {"Range": f"bytes={received}-"}
+                        if etag:
+                            range_headers["If-Range"] = etag
+                        resp = _open(url, range_headers, timeout)
+                        if resp.status != 206:
+                            # Range 非対応または内容が変わった: 先頭から取り直す
+                            out.seek(0)
+                            out.truncate()
+                            received = 0
+                    with resp:
+                        while True:
+                            chunk = resp.read(chunk_size)
+                            if not chunk:
+                                break
+                            received += len(chunk)
+                            if received > max_bytes:
+                                raise ValueError(f"動画サイズが上限を超えています: > {max_bytes} bytes")
+                            out.write(chunk)
+                            if progress is not None:
+                                progress(received, total)
+                    if total is not None and received < total:
+                        raise http.client.IncompleteRead(b"", total - received)
+                    break
+                except (OSError, http.client.HTTPException, socket.timeout) as e:
+                    resp = None
+                    retries += 1
+                    if retries > max_retries:
+                        raise
+                    print(f"ダウンロードが中断されました（{e}）。{received} bytes から再開します（{retries}/{max_retries}）", file=sys.stderr)
+        os.replace(partial, target)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        if not etag:
+            target.unlink(missing_ok=True)
+        raise
+
+    if etag:
+        meta_path.write_text(json.dumps({"url": url, "etag": etag, "size": received}), encoding="utf-8")
+        evict_download_cache(cache_root, keep=key)
+    return DownloadResult(path=str(target), size=received, from_cache=False, persistent=bool(etag))
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import json
+import subprocess
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # type: ignore
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("numpy が見つかりません。'pip install numpy' を実行してください。")
+    return np
+
+
+@dataclass
+class VideoInfo:
+    width: int
+    height: int
+    duration: float
+    fps: float
+
+
+def probe_video(video: str) -> VideoInfo:
+    """ffprobe で映像ストリームの解像度・長さ・フレームレートを取得する。"""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,avg_frame_rate:format=duration",
+        "-of", "json", video,
+    ]
+    completed = subprocess.run(cmd, check=False, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"ffprobe で動画情報を取得できませんでした: {completed.stderr.strip()}")
+    info = json.loads(completed.stdout or "{}")
+    stream = (info.get("streams") or [{}])[0]
+    num, _, den = str(stream.get("avg_frame_rate", "0/1")).partition("/")
+    fps = float(num) / float(den) if den and float(den) else 0.0
+    return VideoInfo(
+        width=int(stream.get("width") or 0),
+        height=int(stream.get("height") or 0),
+        duration=float((info.get("format") or {}).get("duration") or 0.0),
+        fps=fps,
+    )
+
+
+def scaled_size(info: VideoInfo, width: int) -> Tuple[int, int]:
+    """縦横比を保って幅 width に縮小したサイズ（偶数に丸める）。"""
+    if not info.width or not info.height:
+        return width, max(2, width * 9 // 16 // 2 * 2)
+    height = max(2, int(round(width * info.height / info.width / 2)) * 2)
+    return width, height
+
+
+def iter_frame_blocks(
+    video: str,
+    sample_fps: float,
+    width: int,
+    height: int,
+    gray: bool = True,
+    block_size: int = 64,
+    start: float = 0.0,
+    duration: Optional[float] = None,
+) -> Iterator[Tuple["np.ndarray", "np.ndarray"]]:
+    """ffmpeg で 1 回だけデコードし、縮小フレームをパイプ経由で (時刻[N], フレーム[N,H,W(,3)]) のブロック単位で返す。
+
+    fps フィルタで sample_fps に間引き、scale で width x height に縮小した rawvideo を読むため、
+    ディスクへの書き出しも PNG のデコードも発生しない。時刻は start + 番号 / sample_fps。
+    """
+    numpy = require_numpy()
+    channels = 1 if gray else 3
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin"]
+    if start > 0:
+        cmd += ["-ss", f"{start:.3f}"]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += [
+        "-i", video,
+        "-an", "-sn",
+        "-vf", f"fps={sample_fps},scale={width}:{height}:flags=area",
+        "-pix_fmt", "gray" if gray else "rgb24",
+        "-f", "rawvideo", "pipe:1",
+    ]
+    frame_bytes = width * height * channels
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    index = 0
+    exhausted = False
+    try:
+        assert proc.stdout is not None
+        while True:
+            data = proc.stdout.read(frame_bytes * block_size)
+            n = len(data) // frame_bytes
+            if n == 0:
+                break
+            frames = numpy.frombuffer(data, dtype=numpy.uint8, count=n * frame_bytes)
+            shape = (n, height, width) if gray else (n, height, width, 3)
+            times = start + (index + numpy.arange(n)) / sample_fps
+            yield times, frames.reshape(shape)
+            index += n
+        exhausted = True
+    finally:
+        # 途中で打ち切られた（ジェネレーターが閉じられた）場合は ffmpeg を止める
+        if proc.poll() is None and not exhausted:
+            proc.kill()
+        proc.stdout.close()  # type: ignore[union-attr]
+        err = proc.stderr.read() if proc.stderr is not None else b""
+        proc.wait()
+    if proc.returncode != 0 and index == 0:
+        raise RuntimeError(f"ffmpeg でフレームを読み込めませんでした: {err.decode(errors='replace').strip()}")
+
+
+def frame_differences(frames: "np.ndarray", previous: Optional["np.ndarray"] = None) -> "np.ndarray":
+    """連続フレーム間の平均絶対差（0〜255）をまとめて計算する。先頭は previous との差（なければ inf）。"""
+    numpy = require_numpy()
+    x = frames.astype(numpy.int16)
+    axes = tuple(range(1, x.ndim))
+    diffs = numpy.empty(len(x), dtype=numpy.float32)
+    if len(x) > 1:
+        diffs[1:] = numpy.abs(x[1:] - x[:-1]).mean(axis=axes)
+    diffs[0] = numpy.abs(x[0] - previous.astype(numpy.int16)).mean() if previous is not None else numpy.inf
+    return diffs
+
+
+def frame_ssim(frames: "np.ndarray", previous: Optional["np.ndarray"] = None, window: int = 8) -> "np.ndarray":
+    """連続するグレースケールフレーム間の SSIM（重なりなし window x window 窓の平均）をまとめて計算する。
+
+    先頭は previous との SSIM（なければ 0）。窓ごとの平均・分散・共分散を reshape で一括計算する。
+    """
+    numpy = require_numpy()
+    x = frames.astype(numpy.float32)
+    if previous is not None:
+        x = numpy.concatenate([previous.astype(numpy.float32)[None], x])
+    n, h, w = x.shape
+    h, w = h // window * window, w // window * window
+    blocks = x[:, :h, :w].reshape(n, h // window, window, w // window, window)
+    mu = blocks.mean(axis=(2, 4))
+    sq = (blocks * blocks).mean(axis=(2, 4))
+    a, b = blocks[:-1], blocks[1:]
+    mu_a, mu_b = mu[:-1], mu[1:]
+    var_a = sq[:-1] - mu_a * mu_a
+    var_b = sq[1:] - mu_b * mu_b
+    cov = (a * b).mean(axis=(2, 4)) - mu_a * mu_b
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    ssim = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    scores = ssim.mean(axis=(1, 2))
+    if previous is None:
+        scores = numpy.concatenate([numpy.zeros(1, dtype=numpy.float32), scores])
+    return scores
+
+
+def iter_frame_windows(
+    video: str,
+    starts: List[float],
+    count: int,
+    sample_fps: float,
+    width: int,
+    height: int,
+) -> Iterator[Tuple["np.ndarray", "np.ndarray"]]:
+    """複数の短い区間を 1 回の ffmpeg 起動でまとめてデコードし、区間ごとに (時刻[K], フレーム[K,H,W]) を返す。
+
+    区間ごとに同じ動画を -ss 付きの別入力として開き（各入力は直前のキーフレームから読むだけで、
+    区間の間はデコードしない）、fps / scale / trim で count コマに揃えてから concat で 1 本の
+    グレースケール rawvideo にまとめる。区間の順に count コマずつ読めば区間とフレームが対応する。
+    動画末尾で count コマに満たない区間は、読めた分だけを返して終了する。
+    """
+    numpy = require_numpy()
+    if not starts:
+        return
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin"]
+    span = (count + 1) / sample_fps
+    for start in starts:
+        if start > 0:
+            cmd += ["-ss", f"{start:.3f}"]
+        cmd += ["-t", f"{span:.3f}", "-i", video]
+    graph = [
+        f"[{i}:v]fps={sample_fps},scale={width}:{height}:flags=area,format=gray,"
+        f"trim=end_frame={count},setpts=PTS-STARTPTS[w{i}]"
+        for i in range(len(starts))
+    ]
+    graph.append("".join(f"[w{i}]" for i in range(len(starts))) + f"concat=n={len(starts)}:v=1:a=0[out]")
+    cmd += ["-filter_complex", ";".join(graph), "-map", "[out]", "-an", "-sn", "-f", "rawvideo", "pipe:1"]
+
+    frame_bytes = width * height
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    read_any = False
+    exhausted = False
+    try:
+        assert proc.stdout is not None
+        for start in starts:
+            data = proc.stdout.read(frame_bytes * count)
+            n = len(data) // frame_bytes
+            if n == 0:
+                break
+            read_any = True
+            frames = numpy.frombuffer(data, dtype=numpy.uint8, count=n * frame_bytes)
+            yield start + numpy.arange(n) / sample_fps, frames.reshape(n, height, width)
+            if n < count:
+                break
+        exhausted = True
+    finally:
+        if proc.poll() is None and not exhausted:
+            proc.kill()
+        proc.stdout.close()  # type: ignore[union-attr]
+        err = proc.stderr.read() if proc.stderr is not None else b""
+        proc.wait()
+    if proc.returncode != 0 and not read_any:
+        raise RuntimeError(f"ffmpeg で区間フレームを読み込めませんでした: {err.decode(errors='replace').strip()}")
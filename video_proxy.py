@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+from extract_screenshot import default_cache_dir, ensure_dir, file_sha256, run, which
+
+
+# LLM に送るプロキシ動画の既定値: 幅 960px・2fps・H.264 CRF 32・モノラル 32kbps（画面収録の文字が読める程度）
+DEFAULT_PROXY_WIDTH = 960
+DEFAULT_PROXY_FPS = 2.0
+DEFAULT_PROXY_CRF = 32
+
+
+@dataclass
+class ProxySettings:
+    width: int = DEFAULT_PROXY_WIDTH
+    fps: float = DEFAULT_PROXY_FPS
+    crf: int = DEFAULT_PROXY_CRF
+    audio: bool = True
+
+    def tag(self) -> str:
+        """キャッシュのファイル名・応答キャッシュのキーに使う設定の識別子。"""
+        return f"w{self.width}_fps{self.fps:g}_crf{self.crf}_{'a' if self.audio else 'na'}"
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    raw = (os.getenv(name) or "").strip().lower()
+    if not raw:
+        return default
+    return raw not in ("0", "false", "no", "off")
+
+
+def proxy_settings_from_env() -> Optional[ProxySettings]:
+    """MOVIE2MANUAL_PROXY が有効ならプロキシ設定を返す（無効なら None）。
+
+    MOVIE2MANUAL_PROXY_WIDTH / _FPS / _CRF / _AUDIO で既定値を上書きできる。
+    """
+    if not _env_flag("MOVIE2MANUAL_PROXY", False):
+        return None
+    settings = ProxySettings(audio=_env_flag("MOVIE2MANUAL_PROXY_AUDIO", True))
+    for name, attr, cast in (
+        ("MOVIE2MANUAL_PROXY_WIDTH", "width", int),
+        ("MOVIE2MANUAL_PROXY_FPS", "fps", float),
+        ("MOVIE2MANUAL_PROXY_CRF", "crf", int),
+    ):
+        raw = os.getenv(name)
+        if raw is None or raw.strip() == "":
+            continue
+        try:
+            setattr(settings, attr, cast(raw))
+        except ValueError:
+            print(f"{name} が不正です（既定値を使用）: {raw}", file=sys.stderr)
+    return settings
+
+
+def build_proxy(
+    video: Union[str, Path],
+    settings: ProxySettings,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> Path:
+    """LLM 送信用の低解像度・低 fps のプロキシ動画を作り、パスを返す。
+
+    元動画内容の SHA-256 と設定の組でキャッシュし（default_cache_dir() / "proxies"）、2 回目以降は変換を省略する。
+    縮小は元の幅を超えない。スクリーンショット抽出には使わない（常に元動画から抽出する）。
+    """
+    if which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg が見つかりません。インストールしてください。")
+    proxy_dir = Path(cache_dir) if cache_dir else default_cache_dir() / "proxies"
+    proxy_path = proxy_dir / f"{file_sha256(video)}_{settings.tag()}.mp4"
+    original_size = Path(video).stat().st_size
+    if proxy_path.exists():
+        print(
+            f"プロキシ動画を再利用します: {original_size / 1024 / 1024:.1f} MB -> "
+            f"{proxy_path.stat().st_size / 1024 / 1024:.1f} MB",
+            file=sys.stderr,
+        )
+        return proxy_path
+
+    ensure_dir(proxy_dir)
+    # 同じ動画のプロキシを複数スレッド（MCP の同時ジョブ・バッチ）が作っても一時ファイルが衝突しないようにする
+    tmp = proxy_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp.mp4")
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-i", str(video),
+        "-vf", f"fps={settings.fps:g},scale=w=min({settings.width}\\,iw):h=-2",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", str(settings.crf), "-pix_fmt", "yuv420p",
+        # 10 秒ごとにキーフレーム（長尺動画の分割はキーフレーム位置でしか切れないため）
+        "-g", str(max(1, int(round(settings.fps * 10)))),
+    ]
+    cmd += ["-c:a", "aac", "-ac", "1", "-b:a", "32k"] if settings.audio else ["-an"]
+    cmd += ["-movflags", "+faststart", str(tmp)]
+    started = time.perf_counter()
+    code = run(cmd)
+    if code != 0 or not tmp.exists():
+        tmp.unlink(missing_ok=True)
+        raise RuntimeError(f"プロキシ動画の作成に失敗しました: exit code {code}")
+    os.replace(tmp, proxy_path)
+    print(
+        f"プロキシ動画を作成しました（{time.perf_counter() - started:.1f}s）: "
+        f"{original_size / 1024 / 1024:.1f} MB -> {proxy_path.stat().st_size / 1024 / 1024:.1f} MB",
+        file=sys.stderr,
+    )
+    return proxy_path
+
+
+def llm_video_for(video: str, settings: Optional[ProxySettings]) -> str:
+    """LLM に送る動画のパス（プロキシ無効、または作成に失敗した場合は元動画）。"""
+    if settings is None:
+        return video
+    try:
+        return str(build_proxy(video, settings))
+    except Exception as e:
+        print(f"プロキシ動画を使わずに元動画を送信します: {e}", file=sys.stderr)
+        return video